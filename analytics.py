@@ -0,0 +1,242 @@
+"""
+Precomputed placement aggregates for the dashboard.
+
+Two small summary tables (created by schema migration 4) hold everything
+the dashboard charts need:
+
+    placement_summary        one row per (program_id, grad_term) cohort
+    employer_cohort_summary  one row per (grad_term, employer_id)
+
+They are refreshed incrementally, inside the same transaction as the
+write: the helpers take a snapshot of what the affected students count for
+before the write, another one after, and add the difference to the summary
+rows. That costs a handful of indexed lookups per student, however big the
+cohort is. refresh_cohorts() / rebuild_summaries() recompute from scratch
+(used by the migration and by dedupe merges); refresh_changed() recomputes
+only the cohorts touched since a change_log position (used after bulk
+imports, see changelog.py).
+
+All functions take an open connection; the caller owns the transaction.
+"""
+
+
+from collections import Counter
+
+import changelog
+
+PLACEMENT_COUNTS = ("students", "alumni", "with_internship", "placed", "from_internship")
+
+
+# ---------- INCREMENTAL (PER STUDENT) ----------
+
+def snapshot_students(conn, student_ids):
+    """
+    What each student currently adds to the summaries:
+    {student_id: ((program_id, grad_term), placement Counter, employer Counter)}.
+    Students that don't exist yet are left out.
+    """
+    snapshot = {}
+    for student_id in set(student_ids):
+        row = conn.execute(
+            """
+            SELECT program_id, grad_term, status IS 'Alumni',
+                   EXISTS (SELECT 1 FROM internships WHERE student_id = :id),
+                   EXISTS (SELECT 1 FROM jobs WHERE student_id = :id),
+                   EXISTS (SELECT 1 FROM jobs WHERE student_id = :id
+                           AND source_internship_id IS NOT NULL)
+            FROM students WHERE student_id = :id;
+            """,
+            {"id": student_id},
+        ).fetchone()
+        if row is None:
+            continue
+
+        placement = Counter(dict(zip(PLACEMENT_COUNTS, (1,) + tuple(row[2:]))))
+        employers = Counter()
+        for (employer_id,) in conn.execute(
+            "SELECT employer_id FROM jobs WHERE student_id = ?;", (student_id,)
+        ):
+            employers[(employer_id, "hires")] += 1
+        for (employer_id,) in conn.execute(
+            "SELECT employer_id FROM internships WHERE student_id = ?;", (student_id,)
+        ):
+            employers[(employer_id, "interns")] += 1
+        snapshot[student_id] = ((row[0], row[1]), placement, employers)
+    return snapshot
+
+
+def _add_placement(conn, program_id, grad_term, counts, sign):
+    params = [sign * counts.get(name, 0) for name in PLACEMENT_COUNTS]
+    cur = conn.execute(
+        f"""
+        UPDATE placement_summary
+        SET {", ".join(f"{name} = {name} + ?" for name in PLACEMENT_COUNTS)}
+        WHERE program_id = ? AND grad_term IS ?;
+        """,
+        params + [program_id, grad_term],
+    )
+    if cur.rowcount == 0 and sign > 0:
+        conn.execute(
+            """
+            INSERT INTO placement_summary
+            (program_id, grad_term, students, alumni, with_internship, placed, from_internship)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            [program_id, grad_term] + params,
+        )
+    conn.execute(
+        "DELETE FROM placement_summary WHERE program_id = ? AND grad_term IS ? AND students <= 0;",
+        (program_id, grad_term),
+    )
+
+
+def _add_employer(conn, grad_term, employer_id, hires, interns):
+    cur = conn.execute(
+        """
+        UPDATE employer_cohort_summary
+        SET hires = hires + ?, interns = interns + ?
+        WHERE grad_term IS ? AND employer_id = ?;
+        """,
+        (hires, interns, grad_term, employer_id),
+    )
+    if cur.rowcount == 0 and (hires > 0 or interns > 0):
+        conn.execute(
+            """
+            INSERT INTO employer_cohort_summary (grad_term, employer_id, hires, interns)
+            VALUES (?, ?, ?, ?);
+            """,
+            (grad_term, employer_id, hires, interns),
+        )
+    conn.execute(
+        """
+        DELETE FROM employer_cohort_summary
+        WHERE grad_term IS ? AND employer_id = ? AND hires <= 0 AND interns <= 0;
+        """,
+        (grad_term, employer_id),
+    )
+
+
+def apply_changes(conn, before, after):
+    """Add (after - before) for every student in either snapshot to the summaries."""
+    for student_id in before.keys() | after.keys():
+        old = before.get(student_id)
+        new = after.get(student_id)
+        if old == new:
+            continue
+        for snap, sign in ((old, -1), (new, 1)):
+            if snap is None:
+                continue
+            (program_id, grad_term), placement, employers = snap
+            _add_placement(conn, program_id, grad_term, placement, sign)
+            for (employer_id, kind), count in employers.items():
+                hires = count if kind == "hires" else 0
+                interns = count if kind == "interns" else 0
+                _add_employer(conn, grad_term, employer_id, sign * hires, sign * interns)
+
+
+# ---------- FULL RECOMPUTE ----------
+
+def refresh_cohorts(conn, cohorts):
+    """
+    Recompute the summary rows for the given (program_id, grad_term)
+    cohorts. grad_term may be None.
+    """
+    cohorts = set(cohorts)
+    for program_id, grad_term in cohorts:
+        conn.execute(
+            "DELETE FROM placement_summary WHERE program_id = ? AND grad_term IS ?;",
+            (program_id, grad_term),
+        )
+        conn.execute(
+            """
+            INSERT INTO placement_summary
+            (program_id, grad_term, students, alumni, with_internship, placed, from_internship)
+            SELECT
+                s.program_id,
+                s.grad_term,
+                COUNT(*),
+                -- CASE rather than SUM(<boolean>) so this also runs on Postgres.
+                SUM(CASE WHEN s.status = 'Alumni' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN EXISTS (
+                    SELECT 1 FROM internships i WHERE i.student_id = s.student_id
+                ) THEN 1 ELSE 0 END),
+                SUM(CASE WHEN EXISTS (
+                    SELECT 1 FROM jobs j WHERE j.student_id = s.student_id
+                ) THEN 1 ELSE 0 END),
+                SUM(CASE WHEN EXISTS (
+                    SELECT 1 FROM jobs j
+                    WHERE j.student_id = s.student_id
+                      AND j.source_internship_id IS NOT NULL
+                ) THEN 1 ELSE 0 END)
+            FROM students s
+            WHERE s.program_id = ? AND s.grad_term IS ?
+            GROUP BY s.program_id, s.grad_term;
+            """,
+            (program_id, grad_term),
+        )
+
+    # Top employers are per graduating term, across programs.
+    for grad_term in {term for _, term in cohorts}:
+        conn.execute(
+            "DELETE FROM employer_cohort_summary WHERE grad_term IS ?;",
+            (grad_term,),
+        )
+        conn.execute(
+            """
+            INSERT INTO employer_cohort_summary (grad_term, employer_id, hires, interns)
+            SELECT ?, employer_id, SUM(hires), SUM(interns)
+            FROM (
+                SELECT j.employer_id, 1 AS hires, 0 AS interns
+                FROM jobs j JOIN students s ON s.student_id = j.student_id
+                WHERE s.grad_term IS ?
+                UNION ALL
+                SELECT i.employer_id, 0, 1
+                FROM internships i JOIN students s ON s.student_id = i.student_id
+                WHERE s.grad_term IS ?
+            ) AS events
+            GROUP BY employer_id;
+            """,
+            (grad_term, grad_term, grad_term),
+        )
+
+
+def cohorts_for_students(conn, student_ids):
+    """The (program_id, grad_term) cohorts the given students belong to."""
+    cohorts = set()
+    student_ids = list(student_ids)
+    # Stay well under SQLite's bound-parameter limit.
+    for start in range(0, len(student_ids), 500):
+        chunk = student_ids[start:start + 500]
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT program_id, grad_term FROM students
+            WHERE student_id IN ({", ".join("?" * len(chunk))});
+            """,
+            chunk,
+        ).fetchall()
+        cohorts.update((r[0], r[1]) for r in rows)
+    return cohorts
+
+
+def refresh_changed(conn, since_id):
+    """
+    Bring the summaries up to date with everything in change_log after
+    since_id by recomputing only the affected cohorts. Falls back to
+    rebuild_summaries() when a change can't be traced to a cohort.
+    Returns the number of cohorts refreshed, or None after a full rebuild.
+    """
+    student_ids, complete = changelog.affected_students(conn, since_id)
+    if not complete:
+        rebuild_summaries(conn)
+        return None
+    cohorts = cohorts_for_students(conn, student_ids)
+    refresh_cohorts(conn, cohorts)
+    return len(cohorts)
+
+
+def rebuild_summaries(conn):
+    """Recompute every summary row from the fact tables."""
+    conn.execute("DELETE FROM placement_summary;")
+    conn.execute("DELETE FROM employer_cohort_summary;")
+    cohorts = conn.execute("SELECT DISTINCT program_id, grad_term FROM students;").fetchall()
+    refresh_cohorts(conn, [(r[0], r[1]) for r in cohorts])
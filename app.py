@@ -1,18 +1,60 @@
+import os
+import queue
+import threading
+
 import streamlit as st
+import tenants
+import writer
 from db import (
-    add_program,
-    add_student,
-    add_employer,
-    add_internship,
-    add_job,
+    get_employers,
+    get_internships_for_student,
+    get_programs,
+    save_journey,
+    search_employers,
+    warm_up,
 )
+from validation import FORM, KnownIds, validate
 
 # ---------- PAGE SETUP ----------
 st.set_page_config(page_title="ESB Alumni & Student Journey", layout="wide")
 
-# ---------- GLOBAL STYLES ----------
-st.markdown(
+# Optional Prometheus endpoint for the db.py metrics (once per process).
+if os.environ.get("ESB_METRICS_PORT"):
+    import metrics
+
+    metrics.start_metrics_server(int(os.environ["ESB_METRICS_PORT"]))
+
+
+@st.cache_resource
+def warm_database():
+    """
+    Open the database and load its caches once per server process, in the
+    background so the first page does not wait for it (see db.warm_up).
     """
+    thread = threading.Thread(target=warm_up, name="esb-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+warm_database()
+
+# Fragments rerun only their own part of the page. Older Streamlit versions
+# call it experimental_fragment; without either we just run the function.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+
+def polling_fragment(seconds):
+    """A fragment that reruns on its own every `seconds` (plain function on old Streamlit)."""
+    if hasattr(st, "fragment"):
+        return st.fragment(run_every=seconds)
+    return lambda f: f
+
+
+# ---------- GLOBAL STYLES ----------
+@st.cache_resource
+def global_css():
+    """The style block, built once per server process."""
+    return """
     <style>
         body {
             background: radial-gradient(circle at top left, #1f1c2c, #0b0c10);
@@ -76,9 +118,10 @@ st.markdown(
             margin-bottom: 0.8rem;
         }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
+
+
+st.markdown(global_css(), unsafe_allow_html=True)
 
 # ---------- STATE ----------
 if "step" not in st.session_state:
@@ -97,22 +140,11 @@ if "has_job" not in st.session_state:
 
 step = st.session_state.step
 
-# ---------- HEADER ----------
-def render_header():
-    st.markdown(
-        """
-        <div class="center-container">
-          <div class="card" style="margin-top: 18px;">
-            <h2>🎓 ESB Alumni & Student Journey Survey</h2>
-            <p class="subtitle">
-                A simple 3-step form to capture <b>student profile</b>, <b>internships</b>, and <b>first jobs</b>
-                for the Eberhardt School of Business.
-            </p>
-            <div class="step-chip-row">
-        """,
-        unsafe_allow_html=True,
-    )
 
+# ---------- HEADER ----------
+@st.cache_data(show_spinner=False)
+def header_html(active_step):
+    """Header card with the step chips; one cached string per step."""
     chips = [
         ("Step 1 · Student Info", 1),
         ("Step 2 · Internship", 2),
@@ -120,28 +152,164 @@ def render_header():
     ]
     chip_html = ""
     for label, num in chips:
-        cls = "step-chip active" if num == st.session_state.step else "step-chip"
+        cls = "step-chip active" if num == active_step else "step-chip"
         chip_html += f'<div class="{cls}">{label}</div>'
 
-    st.markdown(chip_html, unsafe_allow_html=True)
-
-    st.markdown(
-        """
-            </div>
+    return f"""
+        <div class="center-container">
+          <div class="card" style="margin-top: 18px;">
+            <h2>🎓 ESB Alumni & Student Journey Survey</h2>
+            <p class="subtitle">
+                A simple 3-step form to capture <b>student profile</b>, <b>internships</b>, and <b>first jobs</b>
+                for the Eberhardt School of Business.
+            </p>
+            <div class="step-chip-row">{chip_html}</div>
           </div>
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
+
+
+def render_header():
+    st.markdown(header_html(st.session_state.step), unsafe_allow_html=True)
 
 
 render_header()
 
+
+# ---------- VALIDATING ----------
+def known_ids(student, internship=None):
+    """
+    KnownIds for the form's reference checks, from the cached programs and
+    employers of the student's school and the student's own internships
+    (plus the one of this submission, which isn't saved yet).
+    """
+    known = KnownIds()
+    with tenants.use_tenant(tenants.tenant_for_program(student.get("program_id"))):
+        known.seed("programs", "program_id", [p.program_id for p in get_programs()])
+        known.seed("employers", "employer_id", [e.employer_id for e in get_employers()])
+        internships = [i.internship_id for i in get_internships_for_student(student.get("student_id"))]
+    if internship:
+        internships.append(internship.get("internship_id"))
+    known.seed("internships", "internship_id", internships)
+    return known
+
+
+# ---------- SAVING ----------
+def submit_journey(student, internship, job):
+    """
+    Save the journey. With ESB_ASYNC_WRITES=1 it goes to the background
+    writer and the ticket is returned straight away; otherwise (or when the
+    writer's queue is full or not running, or another process owns the
+    school's writer) it is saved here and None is returned.
+    The ticket is (tenant, id): each school has its own writer.
+    """
+    if writer.ASYNC_WRITES:
+        tenant = tenants.tenant_for_program(student["program_id"])
+        try:
+            background = writer.get_writer(tenant)
+            if background.alive:
+                return tenant, background.submit(student, internship, job)
+        except queue.Full:
+            pass  # writer is backed up: save in this session instead
+        except writer.SpoolInUse:
+            pass  # another process writes this school in the background
+        except writer.WriterStopped:
+            pass  # its thread stopped between the check and the submit
+    save_journey(student, internship, job)
+    return None
+
+
+@polling_fragment(1)
+def submission_status():
+    """
+    Status of the last background-saved submission of this session, while
+    it is queued. Once it is saved or failed the ticket is dropped and the
+    whole page reruns, so the fragment stops polling the writer.
+    """
+    ticket = st.session_state.get("last_ticket")
+    if not ticket:
+        return
+    tenant, ticket_id = ticket
+    status = writer.get_writer(tenant).status(ticket_id)
+    if status["state"] == "queued":
+        st.info("⏳ Saving your last submission…")
+        return
+    del st.session_state["last_ticket"]
+    st.session_state.last_result = status
+    st.rerun()
+
+
+def submission_result(status):
+    """How the last background-saved submission ended (shown once)."""
+    if status["state"] == "saved":
+        st.success("Your last submission is saved in the ESB database.")
+    elif status["state"] == "failed":
+        st.error(f"Your last submission could not be saved: {status['error']}")
+
+
+if st.session_state.get("last_ticket"):
+    submission_status()
+elif st.session_state.get("last_result"):
+    submission_result(st.session_state.pop("last_result"))
+
+
+# ---------- EMPLOYER TYPEAHEAD ----------
+@fragment
+def employer_picker(label, key, program_id=None):
+    """
+    Let the user pick an employer that is already in the database, so the
+    same company is not saved again under a new ID. Runs as a fragment:
+    typing in the search box reruns only this block, not the whole page.
+    The choice is kept in st.session_state[f"{key}_picked"] (None when the
+    user is entering a new employer). Searches the school of `program_id`.
+    """
+    picked = None
+    query = st.text_input(
+        f"Search existing employers ({label})",
+        key=f"{key}_search",
+        placeholder="Start typing a company name, e.g. Goo…",
+    )
+    if len(query.strip()) >= 2:
+        matches = search_employers(query, limit=8, program_id=program_id)
+        if matches:
+            choice = st.selectbox(
+                "Pick an existing employer",
+                list(range(len(matches) + 1)),
+                format_func=lambda i: (
+                    "— New employer (enter details below) —"
+                    if i == 0
+                    else f"{matches[i - 1].employer_name} ({matches[i - 1].employer_id})"
+                ),
+                key=f"{key}_pick",
+            )
+            if choice:
+                picked = matches[choice - 1]
+        else:
+            st.caption("No existing employer matches – enter it as a new employer below.")
+
+    st.session_state[f"{key}_picked"] = picked
+    if picked:
+        name = picked.employer_name or picked.employer_id
+        st.success(f"Using existing employer **{name}** ({picked.employer_id}).")
+
+
+def picked_employer(key):
+    return st.session_state.get(f"{key}_picked")
+
+
+def show_errors(message, errors):
+    st.error(message)
+    for e in errors:
+        st.write(f"• {e}")
+
+
 st.markdown('<div class="center-container">', unsafe_allow_html=True)
 
 # =========================================================
 # STEP 1 – STUDENT INFO
 # =========================================================
+# Each step is an st.form: typing in its fields costs no reruns at all,
+# the page only reruns when a button is pressed.
 if step == 1:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<p class="section-title">Step 1 · About you</p>', unsafe_allow_html=True)
@@ -151,69 +319,58 @@ if step == 1:
         unsafe_allow_html=True,
     )
 
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        status_type = st.radio(
-            "Current status",
-            ["Still studying (current student)", "Graduated (alumni)"],
-        )
-    with col2:
-        student_id = st.text_input("University Student ID")
-        first_name = st.text_input("First Name")
-        last_name = st.text_input("Last Name")
-    with col3:
-        program_id = st.text_input("Program ID", placeholder="e.g., MSBA, MBA")
-        program_name = st.text_input("Program Name", placeholder="MS in Business Analytics")
-        entry_term = st.text_input("Entry Term", placeholder="e.g., Fall 2024")
-
-    col4, col5 = st.columns(2)
-    with col4:
-        grad_term = st.text_input("Graduation Term (if graduated)", placeholder="e.g., Spring 2026")
-        citizenship = st.text_input("Citizenship Country")
-    with col5:
-        email = st.text_input("Email (Pacific / personal)")
-        linkedin = st.text_input("LinkedIn URL (optional)")
-
-    status_value = "Current" if "Still" in status_type else "Alumni"
+    with st.form("step1_form"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            status_type = st.radio(
+                "Current status",
+                ["Still studying (current student)", "Graduated (alumni)"],
+            )
+        with col2:
+            student_id = st.text_input("University Student ID")
+            first_name = st.text_input("First Name")
+            last_name = st.text_input("Last Name")
+        with col3:
+            program_id = st.text_input("Program ID", placeholder="e.g., MSBA, MBA")
+            program_name = st.text_input("Program Name", placeholder="MS in Business Analytics")
+            entry_term = st.text_input("Entry Term", placeholder="e.g., Fall 2024")
+
+        col4, col5 = st.columns(2)
+        with col4:
+            grad_term = st.text_input("Graduation Term (if graduated)", placeholder="e.g., Spring 2026")
+            citizenship = st.text_input("Citizenship Country")
+        with col5:
+            email = st.text_input("Email (Pacific / personal)")
+            linkedin = st.text_input("LinkedIn URL (optional)")
+
+        col_btn1, col_btn2 = st.columns([1, 4])
+        with col_btn1:
+            next_clicked = st.form_submit_button("Next ➜")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-    col_btn1, col_btn2 = st.columns([1, 4])
-    with col_btn1:
-        next_clicked = st.button("Next ➜")
-
     if next_clicked:
-        errors = []
-        if not student_id.strip():
-            errors.append("Student ID is required.")
-        if not first_name.strip():
-            errors.append("First name is required.")
-        if not last_name.strip():
-            errors.append("Last name is required.")
-        if not program_id.strip():
-            errors.append("Program ID is required.")
-        if not program_name.strip():
-            errors.append("Program name is required.")
+        status_value = "Current" if "Still" in status_type else "Alumni"
+        student_data = {
+            "status_type": status_type,
+            "status_value": status_value,
+            "student_id": student_id.strip(),
+            "first_name": first_name.strip(),
+            "last_name": last_name.strip(),
+            "program_id": program_id.strip(),
+            "program_name": program_name.strip(),
+            "entry_term": entry_term.strip(),
+            "grad_term": grad_term.strip(),
+            "citizenship": citizenship.strip(),
+            "email": email.strip(),
+            "linkedin": linkedin.strip(),
+        }
+        errors = validate("student", student_data, FORM, known=known_ids(student_data))
 
         if errors:
-            st.error("Please fix the following before continuing:")
-            for e in errors:
-                st.write(f"• {e}")
+            show_errors("Please fix the following before continuing:", errors)
         else:
-            st.session_state.student = {
-                "status_type": status_type,
-                "status_value": status_value,
-                "student_id": student_id.strip(),
-                "first_name": first_name.strip(),
-                "last_name": last_name.strip(),
-                "program_id": program_id.strip(),
-                "program_name": program_name.strip(),
-                "entry_term": entry_term.strip(),
-                "grad_term": grad_term.strip(),
-                "citizenship": citizenship.strip(),
-                "email": email.strip(),
-                "linkedin": linkedin.strip(),
-            }
+            st.session_state.student = student_data
             st.session_state.step = 2
             st.rerun()
 
@@ -229,6 +386,7 @@ elif step == 2:
         unsafe_allow_html=True,
     )
 
+    # Outside the form: it decides which fields are shown.
     has_internship = st.radio(
         "Did you complete at least one internship during your program?",
         ["No", "Yes"],
@@ -236,59 +394,47 @@ elif step == 2:
         index=0 if st.session_state.has_internship == "No" else 1,
     )
 
-    internship_data = None
     if has_internship == "Yes":
         st.write(" You selected **Yes** – please fill your main internship details below.")
-
-        ic1, ic2, ic3 = st.columns(3)
-        with ic1:
-            internship_id = st.text_input("Internship ID", placeholder="INT001")
-            internship_title = st.text_input("Internship Title", placeholder="Data Analyst Intern")
-        with ic2:
-            internship_employer_id = st.text_input("Internship Employer ID", placeholder="EMP001")
-            internship_employer_name = st.text_input("Internship Employer Name", placeholder="Company name")
-            internship_mode = st.selectbox("Internship Mode", ["Virtual", "In-Person", "Hybrid"])
-        with ic3:
-            internship_city = st.text_input("City")
-            internship_state = st.text_input("State")
-            internship_country = st.text_input("Country")
-
-        ic4, ic5, ic6 = st.columns(3)
-        with ic4:
-            internship_start = st.text_input("Start Date (YYYY-MM-DD)")
-        with ic5:
-            internship_end = st.text_input("End Date (YYYY-MM-DD)")
-        with ic6:
-            internship_related = st.checkbox("Related to your program of study?", value=True)
-
-        internship_industry = st.text_input("Employer Industry (optional)", placeholder="e.g., Tech, Finance")
-        internship_website = st.text_input("Employer Website (optional)")
-
-        internship_data = {
-            "internship_id": internship_id.strip(),
-            "title": internship_title.strip(),
-            "employer_id": internship_employer_id.strip(),
-            "employer_name": internship_employer_name.strip(),
-            "mode": internship_mode,
-            "city": internship_city.strip(),
-            "state": internship_state.strip(),
-            "country": internship_country.strip(),
-            "start_date": internship_start.strip(),
-            "end_date": internship_end.strip(),
-            "is_related": internship_related,
-            "industry": internship_industry.strip(),
-            "website": internship_website.strip(),
-        }
+        employer_picker("internship", "internship_employer", program_id=st.session_state.student.get("program_id"))
     else:
         st.info("If you did **not** do an internship, leave this as No and click Next.")
 
-    st.markdown("</div>", unsafe_allow_html=True)
+    with st.form("step2_form"):
+        if has_internship == "Yes":
+            ic1, ic2, ic3 = st.columns(3)
+            with ic1:
+                internship_id = st.text_input("Internship ID", placeholder="INT001")
+                internship_title = st.text_input("Internship Title", placeholder="Data Analyst Intern")
+            with ic2:
+                internship_employer_id = st.text_input(
+                    "Internship Employer ID", placeholder="EMP001 (blank if picked above)"
+                )
+                internship_employer_name = st.text_input("Internship Employer Name", placeholder="Company name")
+                internship_mode = st.selectbox("Internship Mode", ["Virtual", "In-Person", "Hybrid"])
+            with ic3:
+                internship_city = st.text_input("City")
+                internship_state = st.text_input("State")
+                internship_country = st.text_input("Country")
+
+            ic4, ic5, ic6 = st.columns(3)
+            with ic4:
+                internship_start = st.text_input("Start Date (YYYY-MM-DD)")
+            with ic5:
+                internship_end = st.text_input("End Date (YYYY-MM-DD)")
+            with ic6:
+                internship_related = st.checkbox("Related to your program of study?", value=True)
+
+            internship_industry = st.text_input("Employer Industry (optional)", placeholder="e.g., Tech, Finance")
+            internship_website = st.text_input("Employer Website (optional)")
+
+        col_back, col_next = st.columns([1, 1])
+        with col_back:
+            back_clicked = st.form_submit_button("⬅ Back")
+        with col_next:
+            next_clicked = st.form_submit_button("Next ➜")
 
-    col_back, col_next = st.columns([1, 1])
-    with col_back:
-        back_clicked = st.button("⬅ Back", key="back_step2")
-    with col_next:
-        next_clicked = st.button("Next ➜", key="next_step2")
+    st.markdown("</div>", unsafe_allow_html=True)
 
     if back_clicked:
         st.session_state.step = 1
@@ -297,18 +443,29 @@ elif step == 2:
     if next_clicked:
         st.session_state.has_internship = has_internship
         if has_internship == "Yes":
-            errors = []
-            if not internship_data["internship_id"]:
-                errors.append("Internship ID is required.")
-            if not internship_data["employer_id"]:
-                errors.append("Internship Employer ID is required.")
-            if not internship_data["title"]:
-                errors.append("Internship Title is required.")
+            employer = picked_employer("internship_employer")
+            internship_data = {
+                "internship_id": internship_id.strip(),
+                "title": internship_title.strip(),
+                "employer_id": employer.employer_id if employer else internship_employer_id.strip(),
+                "employer_name": (
+                    (employer.employer_name or "") if employer else internship_employer_name.strip()
+                ),
+                "mode": internship_mode,
+                "city": internship_city.strip(),
+                "state": internship_state.strip(),
+                "country": internship_country.strip(),
+                "start_date": internship_start.strip(),
+                "end_date": internship_end.strip(),
+                "is_related": internship_related,
+                "industry": internship_industry.strip(),
+                "website": internship_website.strip(),
+            }
+            known = known_ids(st.session_state.student)
+            errors = validate("internship", internship_data, FORM, known=known)
 
             if errors:
-                st.error("Please fix the following before continuing:")
-                for e in errors:
-                    st.write(f"• {e}")
+                show_errors("Please fix the following before continuing:", errors)
             else:
                 st.session_state.internship = internship_data
                 st.session_state.step = 3
@@ -336,214 +493,137 @@ elif step == 3:
         horizontal=True,
         index=0 if st.session_state.has_job == "No" else 1,
     )
-
-    job_data = None
-    source_internship_id = None
+    had_internship = st.session_state.has_internship == "Yes" and st.session_state.internship
 
     if has_job == "Yes":
         st.write("You selected **Yes** – please enter your job details below.")
+        employer_picker("job", "job_employer", program_id=st.session_state.student.get("program_id"))
+    else:
+        st.info("If you don’t have a job yet, keep this as No and submit your record.")
 
-        jc1, jc2, jc3 = st.columns(3)
-        with jc1:
-            job_id = st.text_input("Job ID", placeholder="JOB001")
-            job_title = st.text_input("Job Title", placeholder="Data Analyst")
-        with jc2:
-            job_employer_id = st.text_input("Job Employer ID", placeholder="EMP002 or same as internship")
-            job_employer_name = st.text_input("Job Employer Name")
-            job_level = st.text_input("Job Level", placeholder="Intern, Entry-Level, etc.")
-        with jc3:
-            job_type = st.text_input("Job Type / Role", placeholder="Business Analyst, Data Scientist, etc.")
-            employment_status = st.text_input("Employment Status", value="Employed")
-
-        jc4, jc5, jc6 = st.columns(3)
-        with jc4:
-            job_city = st.text_input("Job City")
-        with jc5:
-            job_state = st.text_input("Job State")
-        with jc6:
-            job_country = st.text_input("Job Country")
-
-        jc7, jc8, jc9 = st.columns(3)
-        with jc7:
-            job_start = st.text_input("Job Start Date (YYYY-MM-DD)")
-        with jc8:
-            job_end = st.text_input("Job End Date (YYYY-MM-DD, blank if current)")
-        with jc9:
-            job_sequence = st.number_input(
-                "Job Sequence (1 = first job)", min_value=1, value=1, step=1
-            )
+    with st.form("step3_form"):
+        if has_job == "Yes":
+            jc1, jc2, jc3 = st.columns(3)
+            with jc1:
+                job_id = st.text_input("Job ID", placeholder="JOB001")
+                job_title = st.text_input("Job Title", placeholder="Data Analyst")
+            with jc2:
+                job_employer_id = st.text_input(
+                    "Job Employer ID", placeholder="EMP002 or same as internship (blank if picked above)"
+                )
+                job_employer_name = st.text_input("Job Employer Name")
+                job_level = st.text_input("Job Level", placeholder="Intern, Entry-Level, etc.")
+            with jc3:
+                job_type = st.text_input("Job Type / Role", placeholder="Business Analyst, Data Scientist, etc.")
+                employment_status = st.text_input("Employment Status", value="Employed")
+
+            jc4, jc5, jc6 = st.columns(3)
+            with jc4:
+                job_city = st.text_input("Job City")
+            with jc5:
+                job_state = st.text_input("Job State")
+            with jc6:
+                job_country = st.text_input("Job Country")
+
+            jc7, jc8, jc9 = st.columns(3)
+            with jc7:
+                job_start = st.text_input("Job Start Date (YYYY-MM-DD)")
+            with jc8:
+                job_end = st.text_input("Job End Date (YYYY-MM-DD, blank if current)")
+            with jc9:
+                job_sequence = st.number_input(
+                    "Job Sequence (1 = first job)", min_value=1, value=1, step=1
+                )
 
-        if st.session_state.has_internship == "Yes" and st.session_state.internship:
-            came_from_internship = st.checkbox("Did this job come from your internship?", value=False)
-            if came_from_internship:
-                default_int_id = st.session_state.internship["internship_id"]
+            if had_internship:
+                came_from_internship = st.checkbox("Did this job come from your internship?", value=False)
                 source_internship_id = st.text_input(
-                    "Which internship ID does it come from?",
-                    value=default_int_id,
+                    "Which internship ID does it come from? (used only if the box above is ticked)",
+                    value=st.session_state.internship["internship_id"],
                 )
-        else:
-            source_internship_id = None
-
-        job_industry = st.text_input("Job Employer Industry (optional)")
-        job_website = st.text_input("Job Employer Website (optional)")
-
-        job_data = {
-            "job_id": job_id.strip(),
-            "title": job_title.strip(),
-            "employer_id": job_employer_id.strip(),
-            "employer_name": job_employer_name.strip(),
-            "job_level": job_level.strip(),
-            "job_type": job_type.strip(),
-            "employment_status": employment_status.strip(),
-            "city": job_city.strip(),
-            "state": job_state.strip(),
-            "country": job_country.strip(),
-            "start_date": job_start.strip(),
-            "end_date": job_end.strip(),
-            "sequence": int(job_sequence),
-            "source_internship_id": source_internship_id.strip() if source_internship_id else None,
-            "industry": job_industry.strip(),
-            "website": job_website.strip(),
-        }
 
-    else:
-        st.info("If you don’t have a job yet, keep this as No and submit your record.")
+            job_industry = st.text_input("Job Employer Industry (optional)")
+            job_website = st.text_input("Job Employer Website (optional)")
 
-    st.markdown("</div>", unsafe_allow_html=True)
+        col_back, col_submit = st.columns([1, 2])
+        with col_back:
+            back_clicked = st.form_submit_button("⬅ Back")
+        with col_submit:
+            submit_clicked = st.form_submit_button(" Submit to ESB Database")
 
-    col_back, col_submit = st.columns([1, 2])
-    with col_back:
-        back_clicked = st.button("⬅ Back", key="back_step3")
-    with col_submit:
-        submit_clicked = st.button(" Submit to ESB Database", key="submit_step3")
+    st.markdown("</div>", unsafe_allow_html=True)
 
     if back_clicked:
         st.session_state.step = 2
         st.rerun()
 
     if submit_clicked:
+        job_data = None
+        if has_job == "Yes":
+            employer = picked_employer("job_employer")
+            source = None
+            if had_internship and came_from_internship and source_internship_id.strip():
+                source = source_internship_id.strip()
+            job_data = {
+                "job_id": job_id.strip(),
+                "title": job_title.strip(),
+                "employer_id": employer.employer_id if employer else job_employer_id.strip(),
+                "employer_name": (employer.employer_name or "") if employer else job_employer_name.strip(),
+                "job_level": job_level.strip(),
+                "job_type": job_type.strip(),
+                "employment_status": employment_status.strip(),
+                "city": job_city.strip(),
+                "state": job_state.strip(),
+                "country": job_country.strip(),
+                "start_date": job_start.strip(),
+                "end_date": job_end.strip(),
+                "sequence": int(job_sequence),
+                "source_internship_id": source,
+                "industry": job_industry.strip(),
+                "website": job_website.strip(),
+            }
+
         st.session_state.has_job = has_job
-        st.session_state.job = job_data if has_job == "Yes" else None
+        st.session_state.job = job_data
 
         student = st.session_state.student
         internship = st.session_state.internship
         job = st.session_state.job
 
         errors = []
+        known = known_ids(student, internship if st.session_state.has_internship == "Yes" else None)
 
-        required_student_fields = [
-            "student_id", "first_name", "last_name", "program_id", "program_name"
-        ]
-        for f in required_student_fields:
-            if not student.get(f):
-                errors.append(f"Missing student field: {f} (go back to Step 1).")
+        for e in validate("student", student, FORM, known=known):
+            errors.append(f"{e} (go back to Step 1)")
 
         if st.session_state.has_internship == "Yes":
             if not internship:
                 errors.append("Internship data missing (Step 2).")
             else:
-                if not internship["internship_id"]:
-                    errors.append("Internship ID is required.")
-                if not internship["employer_id"]:
-                    errors.append("Internship Employer ID is required.")
-                if not internship["title"]:
-                    errors.append("Internship Title is required.")
+                errors.extend(validate("internship", internship, FORM, known=known))
 
         if st.session_state.has_job == "Yes":
             if not job:
                 errors.append("Job data missing (Step 3).")
             else:
-                if not job["job_id"]:
-                    errors.append("Job ID is required.")
-                if not job["employer_id"]:
-                    errors.append("Job Employer ID is required.")
-                if not job["title"]:
-                    errors.append("Job Title is required.")
+                errors.extend(validate("job", job, FORM, known=known))
 
         if errors:
-            st.error("Please fix the following before we can save to the database:")
-            for e in errors:
-                st.write(f"• {e}")
+            show_errors("Please fix the following before we can save to the database:", errors)
         else:
             try:
-                # 1) Program
-                add_program(
-                    student["program_id"],
-                    student["program_name"],
-                    None,
-                    "Eberhardt School of Business",
-                )
-
-                # 2) Student
-                add_student(
-                    student["student_id"],
-                    student["program_id"],
-                    student["first_name"],
-                    student["last_name"],
-                    student["email"],
-                    student["entry_term"],
-                    student["grad_term"],
-                    student["status_value"],
-                    student["citizenship"],
-                    student["linkedin"],
+                ticket = submit_journey(
+                    student,
+                    internship if st.session_state.has_internship == "Yes" else None,
+                    job if st.session_state.has_job == "Yes" else None,
                 )
+                st.session_state.last_ticket = ticket
+                st.session_state.pop("last_result", None)
 
-                # 3) Internship (optional)
-                if st.session_state.has_internship == "Yes" and internship:
-                    add_employer(
-                        internship["employer_id"],
-                        internship["employer_name"],
-                        internship["industry"],
-                        internship["city"],
-                        internship["state"],
-                        internship["country"],
-                        internship["website"],
-                    )
-
-                    add_internship(
-                        internship["internship_id"],
-                        student["student_id"],
-                        internship["employer_id"],
-                        internship["title"],
-                        internship["mode"],
-                        internship["city"],
-                        internship["state"],
-                        internship["country"],
-                        internship["start_date"],
-                        internship["end_date"],
-                        internship["is_related"],
-                    )
-
-                # 4) Job (optional)
-                if st.session_state.has_job == "Yes" and job:
-                    add_employer(
-                        job["employer_id"],
-                        job["employer_name"],
-                        job["industry"],
-                        job["city"],
-                        job["state"],
-                        job["country"],
-                        job["website"],
-                    )
-
-                    add_job(
-                        job["job_id"],
-                        student["student_id"],
-                        job["employer_id"],
-                        job["title"],
-                        job["job_level"],
-                        job["job_type"],
-                        job["employment_status"],
-                        job["city"],
-                        job["state"],
-                        job["country"],
-                        job["start_date"],
-                        job["end_date"] or None,
-                        job["sequence"],
-                        job["source_internship_id"],
-                    )
-
-                st.success("Record saved to ESB database. Thank you for submitting your journey!")
+                if ticket:
+                    st.success("Thank you for submitting your journey! It is being saved to the ESB database.")
+                else:
+                    st.success("Record saved to ESB database. Thank you for submitting your journey!")
 
                 # Reset for a new entry
                 st.session_state.step = 1
@@ -552,6 +632,8 @@ elif step == 3:
                 st.session_state.has_internship = "No"
                 st.session_state.job = None
                 st.session_state.has_job = "No"
+                for key in ("internship_employer_picked", "job_employer_picked"):
+                    st.session_state.pop(key, None)
 
             except Exception as e:
                 st.error(f"Something went wrong while saving: {e}")
@@ -0,0 +1,546 @@
+"""
+Benchmarks for the db.py read and write paths.
+
+Builds a throwaway database filled with synthetic programs, students,
+employers, internships, jobs and organizations at a chosen scale, then
+times every get_* / add_* helper, the full Step 3 submission (both the
+old six-call sequence and save_journey) and concurrent writers,
+compares the memory of 100k rows as sqlite3.Row, dict and models.Student
+records, and times batch validation (validation.py) of 100k rows per
+record kind, reference checks included. Results are printed as JSON with p50/p95/p99 latency (ms) and
+throughput (ops/sec) so runs can be compared between releases.
+
+    python bench.py --scale 1k
+    python bench.py --scale 100k --iterations 500 --threads 8 --out results.json
+    python bench.py --scale 1M --db /data/bench_1m.db   # reuse a seeded file
+
+The data is generated from a fixed seed, so runs are reproducible.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+from itertools import count, islice
+from pathlib import Path
+
+import analytics
+import db
+import models
+import validation
+from importer import COLUMNS
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+PROGRAMS = [
+    ("MSBA", "MS in Business Analytics", "Graduate"),
+    ("MBA", "Master of Business Administration", "Graduate"),
+    ("MSF", "MS in Finance", "Graduate"),
+    ("MACC", "Master of Accountancy", "Graduate"),
+    ("BSBA", "BS in Business Administration", "Undergraduate"),
+    ("MSFM", "MS in Food Marketing", "Graduate"),
+]
+TERMS = [f"{season} {year}" for year in range(2015, 2027) for season in ("Spring", "Fall")]
+INDUSTRIES = ["Tech", "Finance", "Consulting", "Healthcare", "Retail", "Energy", "Government"]
+CITIES = [
+    ("Stockton", "CA"), ("San Francisco", "CA"), ("Sacramento", "CA"), ("Seattle", "WA"),
+    ("Austin", "TX"), ("New York", "NY"), ("Chicago", "IL"), ("Denver", "CO"),
+]
+WORDS = [
+    "Blue", "River", "Summit", "Pacific", "Golden", "Delta", "Harbor", "Oak", "Union",
+    "Valley", "Bright", "Atlas", "Pioneer", "Cedar", "Metro", "North", "Crest", "Sierra",
+]
+SUFFIXES = ["Inc", "LLC", "Group", "Partners", "Labs", "Corp", "Co"]
+ORG_TYPES = ["Club", "Honor Society", "Student Government", "Professional"]
+
+
+# ---------- SYNTHETIC DATA ----------
+
+def _day(rng, start_year, end_year):
+    start = date(start_year, 1, 1)
+    return start + timedelta(days=rng.randrange((end_year - start_year) * 365))
+
+
+def sizes(students):
+    """Row counts for every table at a given number of students."""
+    return {
+        "students": students,
+        "employers": max(students // 10, 10),
+        "organizations": max(students // 500, 5),
+        # roughly 60% of students intern, 70% get a job, 40% join a club
+        "internships": int(students * 0.6),
+        "jobs": int(students * 0.7),
+        "student_organizations": int(students * 0.4),
+    }
+
+
+def gen_programs():
+    for program_id, name, level in PROGRAMS:
+        yield (program_id, name, level, "Eberhardt School of Business")
+
+
+def gen_employers(n, rng):
+    for i in range(n):
+        city, state = rng.choice(CITIES)
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SUFFIXES)}"
+        yield (f"E{i:07d}", name, rng.choice(INDUSTRIES), city, state, "USA",
+               f"https://example.com/e{i}")
+
+
+def gen_students(n, rng):
+    for i in range(n):
+        entry = rng.randrange(len(TERMS) - 4)
+        yield (
+            f"S{i:08d}", rng.choice(PROGRAMS)[0], f"First{rng.randrange(5000)}",
+            f"Last{rng.randrange(20000)}", f"s{i}@u.pacific.edu", TERMS[entry],
+            TERMS[entry + rng.choice((2, 3, 4))], rng.choice(("Alumni", "Alumni", "Current")),
+            rng.choice(("USA", "USA", "USA", "India", "China", "Mexico")), None,
+        )
+
+
+def gen_internships(n, n_students, n_employers, rng):
+    for i in range(n):
+        start = _day(rng, 2015, 2026)
+        city, state = rng.choice(CITIES)
+        yield (
+            f"I{i:08d}", f"S{i % n_students:08d}", f"E{rng.randrange(n_employers):07d}",
+            "Analyst Intern", rng.choice(("Virtual", "In-Person", "Hybrid")), city, state,
+            "USA", start.isoformat(), (start + timedelta(days=80)).isoformat(),
+            rng.random() < 0.8,
+        )
+
+
+def gen_jobs(n, n_students, n_employers, n_internships, rng):
+    for i in range(n):
+        start = _day(rng, 2016, 2027)
+        city, state = rng.choice(CITIES)
+        student = i % n_students
+        # Internships are numbered after students, so student k owns I<k>.
+        source = f"I{student:08d}" if student < n_internships and rng.random() < 0.3 else None
+        yield (
+            f"J{i:08d}", f"S{student:08d}", f"E{rng.randrange(n_employers):07d}",
+            "Business Analyst", "Entry-Level", "Analyst", "Employed", city, state, "USA",
+            start.isoformat(), None, 1 + i // n_students, source,
+        )
+
+
+def gen_organizations(n, rng):
+    for i in range(n):
+        yield (f"O{i:05d}", f"{rng.choice(WORDS)} Society {i}", rng.choice(ORG_TYPES))
+
+
+def gen_student_orgs(n, n_students, n_orgs, rng):
+    for i in range(n):
+        yield (f"SO{i:08d}", f"S{i % n_students:08d}", f"O{rng.randrange(n_orgs):05d}",
+               "Member", None, None)
+
+
+SEED_SQL = {
+    "programs": "INSERT INTO programs VALUES (?, ?, ?, ?);",
+    "employers": "INSERT INTO employers VALUES (?, ?, ?, ?, ?, ?, ?);",
+    "students": "INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+    "internships": "INSERT INTO internships VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+    "jobs": "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+    "organizations": "INSERT INTO organizations VALUES (?, ?, ?);",
+    "student_organizations": "INSERT INTO student_organizations VALUES (?, ?, ?, ?, ?, ?);",
+}
+
+
+def seed(n_students, seed_value=42, out=sys.stderr):
+    """Fill the current pool's database with synthetic rows."""
+    rng = random.Random(seed_value)
+    n = sizes(n_students)
+    tables = [
+        ("programs", gen_programs()),
+        ("employers", gen_employers(n["employers"], rng)),
+        ("students", gen_students(n_students, rng)),
+        ("internships", gen_internships(n["internships"], n_students, n["employers"], rng)),
+        ("jobs", gen_jobs(n["jobs"], n_students, n["employers"], n["internships"], rng)),
+        ("organizations", gen_organizations(n["organizations"], rng)),
+        ("student_organizations",
+         gen_student_orgs(n["student_organizations"], n_students, n["organizations"], rng)),
+    ]
+    with db.get_conn() as conn:
+        for table, rows in tables:
+            started = time.perf_counter()
+            total = 0
+            while True:
+                chunk = list(islice(rows, 20_000))
+                if not chunk:
+                    break
+                conn.executemany(SEED_SQL[table], chunk)
+                conn.commit()
+                total += len(chunk)
+            print(f"seeded {total:,} {table} in {time.perf_counter() - started:.1f}s", file=out)
+        analytics.rebuild_summaries(conn)
+        conn.commit()
+    db.invalidate_reference_cache()
+
+
+def make_journey(tag, rng, n_employers):
+    """One Streamlit-shaped submission (student, internship, job dicts)."""
+    city, state = rng.choice(CITIES)
+    student = {
+        "status_value": "Alumni", "student_id": f"B{tag}", "first_name": "Bench",
+        "last_name": f"Mark{tag}", "program_id": rng.choice(PROGRAMS)[0],
+        "program_name": "Benchmark Program", "entry_term": "Fall 2024",
+        "grad_term": "Spring 2026", "citizenship": "USA", "email": f"b{tag}@u.pacific.edu",
+        "linkedin": "",
+    }
+    internship = {
+        "internship_id": f"BI{tag}", "title": "Data Analyst Intern",
+        "employer_id": f"E{rng.randrange(n_employers):07d}", "employer_name": "Bench Employer",
+        "mode": "Hybrid", "city": city, "state": state, "country": "USA",
+        "start_date": "2025-06-01", "end_date": "2025-08-15", "is_related": True,
+        "industry": "Tech", "website": "",
+    }
+    job = {
+        "job_id": f"BJ{tag}", "title": "Data Analyst", "employer_id": internship["employer_id"],
+        "employer_name": "Bench Employer", "job_level": "Entry-Level", "job_type": "Analyst",
+        "employment_status": "Employed", "city": city, "state": state, "country": "USA",
+        "start_date": "2026-01-15", "end_date": "", "sequence": 1,
+        "source_internship_id": f"BI{tag}", "industry": "Tech", "website": "",
+    }
+    return student, internship, job
+
+
+# ---------- TIMING ----------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, wall_seconds=None):
+    """Latencies in seconds -> stats in ms plus throughput."""
+    ms = sorted(x * 1000 for x in latencies)
+    wall = wall_seconds if wall_seconds is not None else sum(latencies)
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+        "max_ms": round(ms[-1], 4) if ms else 0.0,
+        "ops_per_sec": round(len(ms) / wall, 1) if wall else 0.0,
+    }
+
+
+def time_calls(func, iterations):
+    """Call func(i) `iterations` times and summarize the latencies."""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def bench_reads(n, iterations, rng):
+    students = [f"S{rng.randrange(n['students']):08d}" for _ in range(iterations)]
+
+    def uncached(helper):
+        def call(_):
+            db.invalidate_reference_cache()
+            helper()
+        return call
+
+    # Full listings load every row, so time fewer of them at large scale.
+    listing_iterations = max(3, min(iterations, 2_000_000 // max(n["students"], 1)))
+    return {
+        "get_programs": time_calls(lambda _: db.get_programs(), iterations),
+        "get_programs (uncached)": time_calls(uncached(db.get_programs), iterations),
+        "get_organizations": time_calls(lambda _: db.get_organizations(), iterations),
+        "get_employers": time_calls(lambda _: db.get_employers(), iterations),
+        "get_employers (uncached)": time_calls(uncached(db.get_employers), listing_iterations),
+        "get_students": time_calls(lambda _: db.get_students(), listing_iterations),
+        "get_internships_for_student": time_calls(
+            lambda i: db.get_internships_for_student(students[i]), iterations
+        ),
+        "search_employers": time_calls(
+            lambda i: db.search_employers(WORDS[i % len(WORDS)][:3]), iterations
+        ),
+        "get_students_page": time_calls(lambda _: db.get_students_page(limit=50), iterations),
+        "get_placement_summary": time_calls(lambda _: db.get_placement_summary(), iterations),
+        "get_top_employers": time_calls(lambda _: db.get_top_employers("Spring 2024"), iterations),
+    }
+
+
+def bench_memory(rows, seed_value=42):
+    """
+    Memory for `rows` full student rows held as sqlite3.Row, as dicts and
+    as models.Student records, measured with tracemalloc. The rows come
+    from an in-memory database so the numbers don't depend on --scale.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        """
+        CREATE TABLE students (
+            student_id TEXT PRIMARY KEY, program_id TEXT, first_name TEXT, last_name TEXT,
+            email TEXT, entry_term TEXT, grad_term TEXT, status TEXT,
+            citizenship_country TEXT, linkedin_url TEXT
+        );
+        """
+    )
+    conn.executemany(
+        "INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+        gen_students(rows, random.Random(seed_value)),
+    )
+    sql = "SELECT * FROM students;"
+
+    def as_rows():
+        cur = conn.cursor()
+        cur.row_factory = sqlite3.Row
+        return cur.execute(sql).fetchall()
+
+    def as_dicts():
+        return [dict(row) for row in as_rows()]
+
+    def as_records():
+        cur = conn.cursor()
+        cur.row_factory = models.row_factory(models.Student)
+        return cur.execute(sql).fetchall()
+
+    results = {}
+    for name, load in (("sqlite3.Row", as_rows), ("dict", as_dicts), ("Student", as_records)):
+        started = time.perf_counter()
+        tracemalloc.start()
+        loaded = load()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            "rows": len(loaded),
+            "load_ms": round((time.perf_counter() - started) * 1000, 1),
+            "mb": round(current / 1e6, 1),
+            "peak_mb": round(peak / 1e6, 1),
+            "bytes_per_row": round(current / len(loaded)),
+        }
+        del loaded
+    conn.close()
+    return results
+
+
+def bench_validation(n, rows, seed_value=42):
+    """
+    Batch-validate `rows` synthetic rows of every kind (as the importer
+    sees them) against the seeded database; rows/sec per kind.
+    """
+    rng = random.Random(seed_value)
+    generated = {
+        "employer": gen_employers(n["employers"], rng),
+        "student": gen_students(n["students"], rng),
+        "internship": gen_internships(n["internships"], n["students"], n["employers"], rng),
+        "job": gen_jobs(n["jobs"], n["students"], n["employers"], n["internships"], rng),
+    }
+    results = {}
+    known = validation.KnownIds()
+    for kind, source in generated.items():
+        records = [dict(zip(COLUMNS[kind], row)) for row in islice(source, rows)]
+        # Repeat the scale's rows until there are enough.
+        records = [dict(records[i % len(records)]) for i in range(rows)]
+        if kind == "student":
+            for record in records:
+                record["program_name"] = "Benchmark Program"
+        check = validation.validator(kind)
+        check.check_many(records[:1], known)  # load the ID sets outside the timing
+        started = time.perf_counter()
+        failed = check.check_many(records, known)
+        elapsed = time.perf_counter() - started
+        results[kind] = {
+            "rows": rows,
+            "rejected": len(failed),
+            "ms": round(elapsed * 1000, 1),
+            "rows_per_sec": round(rows / elapsed),
+        }
+    return results
+
+
+def bench_writes(n, iterations, rng, run_id):
+    tags = count()
+
+    def tag():
+        return f"{run_id}_{next(tags)}"
+
+    def add_program(_):
+        db.add_program(f"P{tag()}", "Bench Program", "Graduate", "ESB")
+
+    def add_employer(_):
+        db.add_employer(f"BE{tag()}", "Bench Employer", "Tech", "Stockton", "CA", "USA", "")
+
+    def add_organization(_):
+        db.add_organization(f"BO{tag()}", "Bench Org", "Club")
+
+    # Students to hang internships/jobs on.
+    owners = []
+
+    def add_student(_):
+        student_id = f"BS{tag()}"
+        db.add_student(student_id, "MSBA", "Bench", "Student", "b@u.pacific.edu",
+                       "Fall 2024", "Spring 2026", "Current", "USA", "")
+        owners.append(student_id)
+
+    def add_internship(i):
+        db.add_internship(f"BI{tag()}", owners[i % len(owners)], "E0000000", "Intern",
+                          "Virtual", "Stockton", "CA", "USA", "2025-06-01", "2025-08-01", True)
+
+    def add_job(i):
+        db.add_job(f"BJ{tag()}", owners[i % len(owners)], "E0000000", "Analyst", "Entry-Level",
+                   "Analyst", "Employed", "Stockton", "CA", "USA", "2026-01-01", None, 1, None)
+
+    def six_calls(_):
+        # Step 3 submit as it used to be: six separately committed inserts.
+        student, internship, job = make_journey(tag(), rng, n["employers"])
+        db.add_program(student["program_id"], student["program_name"], None, "ESB")
+        db.add_student(student["student_id"], student["program_id"], student["first_name"],
+                       student["last_name"], student["email"], student["entry_term"],
+                       student["grad_term"], student["status_value"], student["citizenship"],
+                       student["linkedin"])
+        db.add_employer(internship["employer_id"], internship["employer_name"], "Tech",
+                        None, None, None, None)
+        db.add_internship(internship["internship_id"], student["student_id"],
+                          internship["employer_id"], internship["title"], internship["mode"],
+                          None, None, None, internship["start_date"], internship["end_date"],
+                          True)
+        db.add_employer(job["employer_id"], job["employer_name"], "Tech", None, None, None, None)
+        db.add_job(job["job_id"], student["student_id"], job["employer_id"], job["title"],
+                   job["job_level"], job["job_type"], job["employment_status"], None, None,
+                   None, job["start_date"], None, 1, job["source_internship_id"])
+
+    def save_journey(_):
+        db.save_journey(*make_journey(tag(), rng, n["employers"]))
+
+    results = {}
+    for name, func in [
+        ("add_program", add_program),
+        ("add_employer", add_employer),
+        ("add_organization", add_organization),
+        ("add_student", add_student),
+        ("add_internship", add_internship),
+        ("add_job", add_job),
+        ("step3_submit (six add_* calls)", six_calls),
+        ("step3_submit (save_journey)", save_journey),
+    ]:
+        results[name] = time_calls(func, iterations)
+    return results
+
+
+def bench_concurrent(n, threads, per_thread, run_id):
+    """`threads` writers each saving `per_thread` journeys at the same time."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def writer(w):
+        rng = random.Random(w)
+        mine = []
+        barrier.wait()
+        for i in range(per_thread):
+            journey = make_journey(f"{run_id}_c{w}_{i}", rng, n["employers"])
+            t0 = time.perf_counter()
+            try:
+                db.save_journey(*journey)
+            except sqlite3.Error as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=writer, args=(w,)) for w in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    stats = summarize(latencies, time.perf_counter() - started)
+    stats["threads"] = threads
+    stats["errors"] = len(errors)
+    return stats
+
+
+def run(scale, iterations, threads, db_path=None, seed_value=42, memory_rows=100_000,
+        out=sys.stderr):
+    n_students = SCALES[scale]
+    n = sizes(n_students)
+    run_id = f"{int(time.time())}"
+    rng = random.Random(seed_value)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(db_path) if db_path else Path(tmp) / f"bench_{scale}.db"
+        fresh = not path.exists()
+        db.init_pool(path, size=max(db.POOL_SIZE, threads))
+        if fresh:
+            seed(n_students, seed_value, out)
+        else:
+            print(f"reusing seeded database {path}", file=out)
+
+        results = {
+            "meta": {
+                "scale": scale,
+                "rows": n,
+                "iterations": iterations,
+                "threads": threads,
+                "seed": seed_value,
+                "profile": db.get_pool().profile,
+                "pool_size": db.get_pool().size,
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        }
+        print("timing reads...", file=out)
+        results["reads"] = bench_reads(n, iterations, rng)
+        print("timing writes...", file=out)
+        results["writes"] = bench_writes(n, iterations, rng, run_id)
+        print(f"timing {threads} concurrent writers...", file=out)
+        results["concurrent"] = {
+            "save_journey x1": bench_concurrent(n, 1, iterations, run_id + "a"),
+            f"save_journey x{threads}": bench_concurrent(
+                n, threads, max(1, iterations // threads), run_id + "b"
+            ),
+        }
+        print(f"measuring memory for {memory_rows:,} rows...", file=out)
+        results["memory"] = bench_memory(memory_rows, seed_value)
+        print(f"validating {memory_rows:,} rows per kind...", file=out)
+        results["validation"] = bench_validation(n, memory_rows, seed_value)
+        results["meta"]["reference_cache"] = db.reference_cache_stats()
+        db.get_pool().close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the db.py read/write paths.")
+    parser.add_argument("--scale", choices=list(SCALES), default="1k")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="keep the seeded database here (reused if it exists)")
+    parser.add_argument("--out", help="write the JSON results to this file")
+    parser.add_argument("--memory-rows", type=int, default=100_000,
+                        help="rows held in memory for the row-representation comparison")
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.iterations, args.threads, args.db, args.seed, args.memory_rows)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
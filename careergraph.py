@@ -0,0 +1,488 @@
+"""
+Career-path graph: which employers lead to which.
+
+Every student's career is a series of steps between employers, each an
+edge weighted by how many students took it. A job that records the
+internship it came from (jobs.source_internship_id) steps from that
+internship's employer. Otherwise a stint steps from the one before it:
+internships by start_date, then jobs by job_sequence. Stints with
+neither a date nor a sequence have no known place in that order and only
+join the graph through a recorded source internship.
+
+A step to the same employer (a return offer after an internship, another
+job there) is a self-loop. It is counted apart, by stayed(), and kept out
+of the walks below, so no career goes round in circles. That makes
+questions like
+
+    "which employers feed alumni into employer X?"     feeders(X)
+    "where do people go after their job at Y?"         destinations(Y)
+    "the most common 3-step careers starting at Y"     top_paths(Y, 3)
+
+a walk over a few adjacency lists instead of recursive SQL.
+
+Employer IDs are interned to small integers. Edges are kept in CSR form
+(compressed sparse rows, in both directions): for employer n, its
+neighbours are indices[indptr[n]:indptr[n + 1]] with the matching
+weights, all in compact `array` arrays. Changes since the last build go
+into a small overlay that is merged into the arrays once it grows past
+COMPACT_AFTER edges.
+
+refresh() keeps the graph current from the change log (see
+changelog.py): only students whose internships or jobs changed are read
+again. get_graph() refreshes on every call, so writes made through
+add_internship / add_job / save_journey show up on the next query.
+
+    python careergraph.py E123            # feeders, destinations, top paths
+    python careergraph.py E123 --hops 2 --snapshot
+"""
+
+import argparse
+import heapq
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+import backends
+import changelog
+import db
+import tenants
+
+# Rows read from the cursor at a time while building.
+BATCH = 10000
+# Students per "WHERE student_id IN (...)" when refreshing.
+REFRESH_CHUNK = 500
+# Overlay edges kept before they are merged into the CSR arrays.
+COMPACT_AFTER = 10000
+
+_STINTS_SQL = """
+    SELECT student_id, 'internships', internship_id, employer_id, 0 AS kind,
+           COALESCE(start_date, '') AS started, 0 AS sequence, NULL AS source
+    FROM internships {where}
+    UNION ALL
+    SELECT student_id, 'jobs', job_id, employer_id, 1 AS kind,
+           COALESCE(start_date, ''), COALESCE(job_sequence, 0), source_internship_id
+    FROM jobs {where}
+    ORDER BY 1, 5, 7, 6, 3
+"""
+
+
+class Interner:
+    """Maps string IDs to 0, 1, 2, ... and back."""
+
+    def __init__(self):
+        self.ids = []
+        self._numbers = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def number(self, value):
+        """The number of `value`, adding it if it is new."""
+        n = self._numbers.get(value)
+        if n is None:
+            n = self._numbers[value] = len(self.ids)
+            self.ids.append(value)
+        return n
+
+    def get(self, value):
+        return self._numbers.get(value)
+
+
+class CSR:
+    """Weighted adjacency lists of nodes 0..n-1 in three flat arrays."""
+
+    def __init__(self, n, edges):
+        """edges: {(source, target): weight}."""
+        counts = array("l", bytes(array("l").itemsize * (n + 1)))
+        for source, _target in edges:
+            counts[source + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.indptr = counts
+        self.indices = array("l", bytes(array("l").itemsize * len(edges)))
+        self.weights = array("l", self.indices)
+        fill = array("l", counts)
+        for (source, target), weight in sorted(edges.items()):
+            at = fill[source]
+            self.indices[at] = target
+            self.weights[at] = weight
+            fill[source] = at + 1
+
+    def row(self, node):
+        """{target: weight} of one node."""
+        if node + 1 >= len(self.indptr):
+            return {}
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return dict(zip(self.indices[start:end], self.weights[start:end]))
+
+    def edges(self):
+        for node in range(len(self.indptr) - 1):
+            for target, weight in self.row(node).items():
+                yield (node, target), weight
+
+
+def _steps(stints):
+    """
+    The (source, target) employer steps of one student's stints, given in
+    order as (table, row_id, employer, ordered, source_internship_id).
+    """
+    internships = {row_id: employer for table, row_id, employer, _o, _s in stints
+                   if table == "internships"}
+    steps = []
+    previous = None
+    for _table, _row_id, employer, ordered, source in stints:
+        if source is not None and source in internships:
+            steps.append((internships[source], employer))
+        elif ordered and previous is not None:
+            steps.append((previous, employer))
+        if ordered:
+            previous = employer
+    return tuple(steps)
+
+
+class CareerGraph:
+    """The employer-to-employer career graph of one tenant."""
+
+    def __init__(self, tenant=None):
+        self.tenant = tenant or tenants.current_tenant()
+        self.employers = Interner()
+        self.change_id = None
+        self._position = changelog.Position("careergraph")
+        self._steps = {}      # student_id -> tuple of (source, target) employer numbers
+        self._owners = {}     # (table, row_id) -> student_id
+        self._forward = CSR(0, {})
+        self._backward = CSR(0, {})
+        # Weight changes since the last compaction, by source and by target.
+        self._overlay = defaultdict(Counter)
+        self._overlay_back = defaultdict(Counter)
+        self._overlay_size = 0
+        self._lock = threading.RLock()
+
+    # ----- building -----
+
+    def _read_steps(self, conn, student_ids=None):
+        """({student_id: steps}, {(table, row_id): student_id}) from the database."""
+        if student_ids is None:
+            sql, params = _STINTS_SQL.format(where=""), ()
+        else:
+            marks = ", ".join("?" * len(student_ids))
+            sql = _STINTS_SQL.format(where=f"WHERE student_id IN ({marks})")
+            params = list(student_ids) * 2
+        stints = defaultdict(list)
+        owners = {}
+        number = self.employers.number
+        for batch in backends.get_backend().stream(conn, sql, params, BATCH):
+            for student_id, table, row_id, employer_id, kind, started, sequence, source in batch:
+                owners[(table, row_id)] = student_id
+                ordered = bool(started) or (kind == 1 and bool(sequence))
+                stints[student_id].append((table, row_id, number(employer_id), ordered, source))
+        steps = {student_id: _steps(rows) for student_id, rows in stints.items()}
+        return {student_id: s for student_id, s in steps.items() if s}, owners
+
+    def build(self):
+        """Read every internship and job and build the graph from scratch. Returns self."""
+        with self._lock, tenants.use_tenant(self.tenant):
+            with db.get_read_conn() as conn:
+                # Position first: anything written while we read is applied
+                # again by the next refresh(), which is harmless.
+                change_id = changelog.last_change_id(conn)
+                self.employers = Interner()
+                self._steps, self._owners = self._read_steps(conn)
+            edges = Counter()
+            for steps in self._steps.values():
+                edges.update(steps)
+            self._clear_overlay()
+            self._install(edges)
+            self.change_id = change_id
+            self._position.report(change_id)
+        return self
+
+    def _install(self, edges):
+        n = len(self.employers)
+        self._forward = CSR(n, edges)
+        self._backward = CSR(n, {(target, source): w for (source, target), w in edges.items()})
+
+    def _clear_overlay(self):
+        self._overlay.clear()
+        self._overlay_back.clear()
+        self._overlay_size = 0
+
+    def _change(self, source, target, change):
+        self._overlay[source][target] += change
+        self._overlay_back[target][source] += change
+        self._overlay_size += 1
+
+    def _compact(self):
+        edges = Counter(dict(self._forward.edges()))
+        for source, row in self._overlay.items():
+            for target, change in row.items():
+                edges[(source, target)] += change
+        self._clear_overlay()
+        self._install({edge: w for edge, w in edges.items() if w > 0})
+
+    def refresh(self):
+        """
+        Apply what changed since the last build: the paths of students with
+        new, changed or deleted internships and jobs are read again and
+        their edges swapped. Returns the number of students updated.
+        """
+        if self.change_id is None:
+            self.build()
+            return len(self._steps)
+        with self._lock, tenants.use_tenant(self.tenant):
+            with db.get_read_conn() as conn:
+                change_id = changelog.last_change_id(conn)
+                current = change_id >= self.change_id and changelog.covers(conn, self.change_id)
+                if current and change_id > self.change_id:
+                    students = set()
+                    rows = {"internships": set(), "jobs": set()}
+                    for _id, table, row_id, op, _columns in changelog.changes_since(conn, self.change_id):
+                        if table in rows:
+                            rows[table].add(row_id)
+                            # The student it belonged to (it may have moved or gone).
+                            owner = self._owners.pop((table, row_id), None)
+                            if owner is not None:
+                                students.add(owner)
+                        elif table == "students" and op == "delete":
+                            students.add(row_id)
+                    students |= self._current_students(conn, rows)
+                    self._update(conn, sorted(students))
+                    self.change_id = change_id
+                else:
+                    students = ()
+            if current:
+                self._position.report(change_id)
+                return len(students)
+        # The change log went backwards (another database) or was pruned
+        # past our position. Start over.
+        self.build()
+        return len(self._steps)
+
+    def _current_students(self, conn, rows):
+        students = set()
+        for table, key in (("internships", "internship_id"), ("jobs", "job_id")):
+            ids = sorted(rows[table])
+            for start in range(0, len(ids), REFRESH_CHUNK):
+                chunk = ids[start:start + REFRESH_CHUNK]
+                marks = ", ".join("?" * len(chunk))
+                students.update(
+                    row[0] for row in
+                    conn.execute(f"SELECT student_id FROM {table} WHERE {key} IN ({marks});", chunk)
+                )
+        return students
+
+    def _update(self, conn, student_ids):
+        for start in range(0, len(student_ids), REFRESH_CHUNK):
+            chunk = student_ids[start:start + REFRESH_CHUNK]
+            steps, owners = self._read_steps(conn, chunk)
+            self._owners.update(owners)
+            for student_id in chunk:
+                old = self._steps.pop(student_id, ())
+                new = steps.get(student_id, ())
+                if new:
+                    self._steps[student_id] = new
+                for source, target in old:
+                    self._change(source, target, -1)
+                for source, target in new:
+                    self._change(source, target, 1)
+        if self._overlay_size > COMPACT_AFTER:
+            self._compact()
+
+    # ----- queries -----
+
+    def _node(self, employer_id):
+        node = self.employers.get(employer_id)
+        if node is None:
+            raise KeyError(f"Employer {employer_id!r} is not on anybody's career path.")
+        return node
+
+    def _row(self, node, reverse=False, stays=False):
+        """{neighbour: weight} of a node, without its self-loop unless stays=True."""
+        row = (self._backward if reverse else self._forward).row(node)
+        changes = (self._overlay_back if reverse else self._overlay).get(node)
+        if changes:
+            for target, change in changes.items():
+                row[target] = row.get(target, 0) + change
+            row = {target: w for target, w in row.items() if w > 0}
+        if not stays:
+            row.pop(node, None)
+        return row
+
+    def stayed(self, employer_id):
+        """Steps that stayed at `employer_id`: return offers and further jobs there."""
+        with self._lock:
+            node = self._node(employer_id)
+            return self._row(node, stays=True).get(node, 0)
+
+    def neighbors(self, employer_id, reverse=False):
+        """[(employer_id, students)] one step after (or before, reverse=True) an employer."""
+        with self._lock:
+            row = self._row(self._node(employer_id), reverse)
+            ids = self.employers.ids
+            return sorted(((ids[n], w) for n, w in row.items()), key=lambda p: (-p[1], p[0]))
+
+    def reachable(self, employer_id, hops=2, reverse=False):
+        """{employer_id: fewest steps} of employers within `hops` steps."""
+        with self._lock:
+            start = self._node(employer_id)
+            seen = {start: 0}
+            frontier = [start]
+            for hop in range(1, hops + 1):
+                following = []
+                for node in frontier:
+                    for target in self._row(node, reverse):
+                        if target not in seen:
+                            seen[target] = hop
+                            following.append(target)
+                frontier = following
+            del seen[start]
+            ids = self.employers.ids
+            return {ids[n]: hop for n, hop in seen.items()}
+
+    def _flow(self, employer_id, hops, reverse, k):
+        """
+        Spread a share of 1 from an employer along the edges, split by edge
+        weight, for `hops` steps; the top-k employers by share received.
+        """
+        with self._lock:
+            start = self._node(employer_id)
+            received = Counter()
+            level = {start: 1.0}
+            for _hop in range(hops):
+                following = Counter()
+                for node, share in level.items():
+                    row = self._row(node, reverse)
+                    total = sum(row.values())
+                    for target, weight in row.items():
+                        following[target] += share * weight / total
+                received.update(following)
+                level = following
+            # Round trips (A -> B -> A) do not make an employer its own feeder.
+            received.pop(start, None)
+            ids = self.employers.ids
+            return [(ids[n], round(share, 6)) for n, share in received.most_common(k)]
+
+    def feeders(self, employer_id, k=10, hops=1):
+        """
+        Employers that lead into `employer_id`, with the share of its
+        incoming career steps they account for (within `hops` steps back).
+        """
+        return self._flow(employer_id, hops, True, k)
+
+    def destinations(self, employer_id, k=10, hops=1):
+        """Where careers go next after `employer_id`, with the share of students (per hop)."""
+        return self._flow(employer_id, hops, False, k)
+
+    def transition_matrix(self, employer_ids=None, top=20, normalize=False):
+        """
+        (employer_ids, rows): rows[i][j] is how many students went from
+        employer i to employer j (the diagonal: stayed()), for the given
+        employers or the `top` busiest ones. normalize=True turns each row into shares of that
+        employer's outgoing steps (to anywhere).
+        """
+        with self._lock:
+            if employer_ids is None:
+                degree = Counter()
+                for node in range(len(self.employers)):
+                    degree[node] = (sum(self._row(node, stays=True).values())
+                                    + sum(self._row(node, True, stays=True).values()))
+                nodes = [n for n, _d in degree.most_common(top)]
+            else:
+                nodes = [self._node(e) for e in employer_ids]
+            position = {n: i for i, n in enumerate(nodes)}
+            rows = []
+            for node in nodes:
+                out = self._row(node, stays=True)
+                total = sum(out.values())
+                row = [0] * len(nodes)
+                for target, weight in out.items():
+                    if target in position:
+                        row[position[target]] = weight / total if normalize else weight
+                rows.append(row)
+            return [self.employers.ids[n] for n in nodes], rows
+
+    def top_paths(self, employer_id, length=3, k=5):
+        """
+        The k most likely careers of up to `length` steps starting at
+        `employer_id`, as [(probability, [employer_id, ...])]. Each step's
+        probability is its share of the current employer's outgoing steps
+        to other employers. A career never returns to an employer already
+        on it, and ends early where nobody moved on.
+        """
+        with self._lock:
+            start = self._node(employer_id)
+            heap = [(-1.0, (start,))]
+            found = []
+            while heap and len(found) < k:
+                negative, path = heapq.heappop(heap)
+                row = self._row(path[-1]) if len(path) <= length else {}
+                total = sum(row.values())
+                row = {target: w for target, w in row.items() if target not in path}
+                if not row:
+                    if len(path) > 1:
+                        found.append((-negative, path))
+                    continue
+                for target, weight in row.items():
+                    heapq.heappush(heap, (negative * weight / total, path + (target,)))
+            ids = self.employers.ids
+            return [(round(p, 6), [ids[n] for n in path]) for p, path in found]
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(tenant=None):
+    """The current tenant's CareerGraph: built on first use, refreshed on every call."""
+    tenant = tenant or tenants.current_tenant()
+    with _graphs_lock:
+        graph = _graphs.get(tenant)
+        if graph is None:
+            graph = _graphs[tenant] = CareerGraph(tenant)
+    graph.refresh()
+    return graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Career paths around one employer.")
+    parser.add_argument("employer_id")
+    parser.add_argument("--hops", type=int, default=1, help="steps for feeders/destinations")
+    parser.add_argument("--length", type=int, default=3, help="steps for top paths")
+    parser.add_argument("-k", type=int, default=10, help="results per question")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="read the analytics snapshot instead of the live database")
+    parser.add_argument("--tenant", help="school to work on (see tenants.py); default: the default school")
+    args = parser.parse_args(argv)
+
+    try:
+        with tenants.use_tenant(args.tenant or tenants.current_tenant()), db.use_snapshot(args.snapshot):
+            started = time.perf_counter()
+            graph = CareerGraph().build()
+            print(f"Built from {len(graph._steps):,} careers over {len(graph.employers):,} "
+                  f"employers in {time.perf_counter() - started:.2f}s")
+            names = {e.employer_id: e.employer_name for e in db.get_employers()}
+
+            def name(employer_id):
+                return names.get(employer_id) or employer_id
+
+            print(f"\nFeeders into {name(args.employer_id)}:")
+            for employer_id, share in graph.feeders(args.employer_id, args.k, args.hops):
+                print(f"  {share:6.1%}  {name(employer_id)}")
+            print(f"\nDestinations after {name(args.employer_id)}:")
+            for employer_id, share in graph.destinations(args.employer_id, args.k, args.hops):
+                print(f"  {share:6.1%}  {name(employer_id)}")
+            print(f"\nStayed at {name(args.employer_id)} (return offers, further jobs): "
+                  f"{graph.stayed(args.employer_id)}")
+            print("\nMost likely careers:")
+            for probability, path in graph.top_paths(args.employer_id, args.length, args.k):
+                print(f"  {probability:6.1%}  " + " -> ".join(name(e) for e in path))
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
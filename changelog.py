@@ -0,0 +1,237 @@
+"""
+Reading the change log (schema migration 7).
+
+Triggers append one row to change_log for every insert, update or delete
+on the fact and reference tables:
+
+    change_id  table_name  row_id  op      columns
+    1041       students    S123    update  grad_term,status
+    1042       jobs        J88     insert  NULL
+
+A consumer remembers the last change_id it has processed and later asks
+for what changed since then, instead of rescanning the tables:
+
+    since = changelog.last_change_id(conn)
+    ... writes ...
+    student_ids, complete = changelog.affected_students(conn, since)
+
+analytics.refresh_changed() and `export.py --since` are built on this.
+
+Retention: the readers that keep a position (columnar.JourneyFrames,
+careergraph.CareerGraph and the snapshot) record it in
+change_log_consumers, and prune() deletes the changes all of them have
+processed. The snapshot refresher prunes after every snapshot it takes;
+without snapshots (Postgres) run the CLI from cron:
+
+    python changelog.py                  # oldest / newest change, readers
+    python changelog.py --prune          # every school, or --tenant law
+
+A position older than what is left (an old `export.py --since`, a reader
+that stopped reporting) is no longer covered(), and its reader starts
+over from the tables.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Changes read per query, so a long backlog never has to fit in memory.
+BATCH = 5000
+# A reader that has not reported its position for this long (its process
+# went away) no longer holds changes back.
+CONSUMER_MAX_AGE = 24 * 3600.0
+
+# Student columns that move a student to another dashboard cohort.
+COHORT_COLUMNS = {"program_id", "grad_term"}
+
+
+def last_change_id(conn):
+    """The newest change_id (0 when nothing has changed yet)."""
+    return conn.execute("SELECT MAX(change_id) FROM change_log;").fetchone()[0] or 0
+
+
+def covers(conn, since_id):
+    """True when every change after since_id is still in change_log (none pruned)."""
+    oldest = conn.execute("SELECT MIN(change_id) FROM change_log;").fetchone()[0]
+    # After a gap in the ids (a rolled-back insert on Postgres) this may
+    # say False for nothing; that only costs the reader a rebuild.
+    return oldest is None or since_id >= oldest - 1
+
+
+def changes_since(conn, since_id):
+    """Yield (change_id, table_name, row_id, op, columns) after since_id, oldest first."""
+    while True:
+        rows = conn.execute(
+            """
+            SELECT change_id, table_name, row_id, op, columns FROM change_log
+            WHERE change_id > ?
+            ORDER BY change_id
+            LIMIT ?;
+            """,
+            (since_id, BATCH),
+        ).fetchall()
+        for row in rows:
+            yield tuple(row)
+        if len(rows) < BATCH:
+            return
+        since_id = rows[-1][0]
+
+
+def affected_students(conn, since_id):
+    """
+    The students whose journey changed after since_id: changed students,
+    the students of changed internships, jobs and memberships, and the
+    students of changed employers and programs.
+
+    Returns (student_ids, complete). complete is False when something can
+    no longer be traced to a student (a deleted internship or job, one
+    moved to another student, changes that were pruned) or a student
+    moved to another cohort, so aggregates must be rebuilt.
+    """
+    if not covers(conn, since_id):
+        return set(), False
+    keys = {table: set() for table in (
+        "students", "internships", "jobs", "student_organizations", "employers", "programs",
+    )}
+    complete = True
+    for _change_id, table, row_id, op, columns in changes_since(conn, since_id):
+        if table not in keys:
+            continue
+        if op == "delete" and table != "students":
+            complete = False
+        if op == "update" and table != "students" and "student_id" in (columns or "").split(","):
+            # Moved to another student: the old one's cohort changed too.
+            complete = False
+        if table == "students" and op != "insert" and (
+            op == "delete" or COHORT_COLUMNS & set((columns or "").split(","))
+        ):
+            complete = False
+        keys[table].add(row_id)
+
+    student_ids = set(keys["students"])
+    lookups = [
+        ("internships", "SELECT student_id FROM internships WHERE internship_id IN ({})"),
+        ("jobs", "SELECT student_id FROM jobs WHERE job_id IN ({})"),
+        ("student_organizations",
+         "SELECT student_id FROM student_organizations WHERE student_org_id IN ({})"),
+        ("employers",
+         "SELECT student_id FROM internships WHERE employer_id IN ({0}) "
+         "UNION SELECT student_id FROM jobs WHERE employer_id IN ({0})"),
+        ("programs", "SELECT student_id FROM students WHERE program_id IN ({})"),
+    ]
+    for table, sql in lookups:
+        ids = list(keys[table])
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ", ".join("?" * len(chunk))
+            params = chunk * sql.count("{")
+            student_ids.update(row[0] for row in conn.execute(sql.format(marks) + ";", params))
+    return student_ids, complete
+
+
+# ---------- RETENTION ----------
+
+def save_position(conn, consumer, change_id, now=None):
+    """Record that `consumer` has processed every change up to change_id (caller commits)."""
+    conn.execute(
+        """
+        INSERT INTO change_log_consumers (consumer, change_id, seen_at) VALUES (?, ?, ?)
+        ON CONFLICT (consumer) DO UPDATE SET
+            change_id = excluded.change_id,
+            seen_at = excluded.seen_at;
+        """,
+        (consumer, change_id, time.time() if now is None else now),
+    )
+
+
+def prune(conn, now=None):
+    """
+    Delete the changes every consumer has processed: up to the lowest
+    position reported in the last CONSUMER_MAX_AGE seconds, or all of
+    them when nobody reads the log. Consumers that stopped reporting are
+    forgotten. The newest change is always kept, so change_ids never
+    start over. Returns the number of changes deleted (caller commits).
+    """
+    now = time.time() if now is None else now
+    conn.execute("DELETE FROM change_log_consumers WHERE seen_at < ?;", (now - CONSUMER_MAX_AGE,))
+    lowest = conn.execute("SELECT MIN(change_id) FROM change_log_consumers;").fetchone()[0]
+    through = last_change_id(conn) - 1
+    if lowest is not None:
+        through = min(through, lowest)
+    return conn.execute("DELETE FROM change_log WHERE change_id <= ?;", (through,)).rowcount
+
+
+class Position:
+    """
+    A reader's position in the current tenant's change_log, reported to
+    change_log_consumers so that prune() keeps what it has not processed.
+    The same position is only reported again when the last report is
+    getting old.
+    """
+
+    def __init__(self, kind):
+        self.consumer = f"{kind}:{os.getpid()}:{id(self):x}"
+        self._reported = (None, 0.0)
+
+    def report(self, change_id):
+        now = time.time()
+        last_id, last_at = self._reported
+        if change_id == last_id and now - last_at < CONSUMER_MAX_AGE / 4:
+            return
+        import db
+
+        with db.get_conn() as conn:
+            save_position(conn, self.consumer, change_id, now)
+            conn.commit()
+        self._reported = (change_id, now)
+
+
+def status(conn):
+    """{"oldest", "newest", "consumers": [(consumer, change_id, seen_at)]}."""
+    oldest, newest = conn.execute("SELECT MIN(change_id), MAX(change_id) FROM change_log;").fetchone()
+    consumers = conn.execute(
+        "SELECT consumer, change_id, seen_at FROM change_log_consumers ORDER BY change_id;"
+    ).fetchall()
+    return {"oldest": oldest, "newest": newest, "consumers": [tuple(row) for row in consumers]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or prune the change log.")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete the changes every reader has processed")
+    parser.add_argument("--tenant", help="only this school (default: all)")
+    args = parser.parse_args(argv)
+
+    import backends
+    import db
+    import tenants
+
+    try:
+        names = [args.tenant] if args.tenant else tenants.names()
+        if args.tenant:
+            tenants.db_path(args.tenant)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+
+    now = time.time()
+    for name in names:
+        if backends.get_backend().name == "sqlite" and not tenants.db_path(name).exists():
+            continue
+        with tenants.use_tenant(name), db.get_conn() as conn:
+            if args.prune:
+                deleted = prune(conn)
+                conn.commit()
+                print(f"{name}: pruned {deleted:,} changes")
+            info = status(conn)
+        print(f"{name}: changes {info['oldest']} to {info['newest']}, "
+              f"{len(info['consumers'])} readers")
+        for consumer, change_id, seen_at in info["consumers"]:
+            print(f"  {consumer:<32} at {change_id}, {now - seen_at:,.0f} s ago")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,542 @@
+"""
+Columnar in-memory copy of the journey tables, for analysis.
+
+Questions like "median days from internship end to job start per
+program" or "share of jobs that came from an internship, by employer
+industry" touch every internship and job. Going through sqlite3.Row and
+parsing date strings row by row is slow, so this module loads students,
+internships, jobs and employers once into NumPy arrays:
+
+    ids          fixed-width string arrays ("" = missing)
+    dates        int64 days since 1970-01-01 (NO_DAY = missing), parsed once
+    categories   int32 codes into a per-column Dictionary (MISSING = -1)
+    numbers      float64 (NaN = missing)
+
+and answers questions with vectorized joins (lookup), group-bys and
+aggregates (aggregate):
+
+    frames = columnar.get_frames()          # loaded once per tenant
+    columnar.internship_to_job_days(frames)
+
+refresh() keeps a loaded copy current from the change log (see
+changelog.py): rows inserted, updated or deleted since the last load are
+replaced by key, nothing else is read again. Reads go through
+db.get_read_conn(), so inside db.use_snapshot() the analytics snapshot is
+used.
+
+Needs numpy (installed with streamlit).
+
+    python columnar.py                  # the built-in reports, with timings
+    python columnar.py --snapshot --tenant law
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import backends
+import changelog
+import db
+import tenants
+
+# Rows read from the cursor at a time while loading.
+BATCH = 10000
+# Keys per "WHERE key IN (...)" when refreshing changed rows.
+REFRESH_CHUNK = 500
+
+MISSING = -1
+NO_DAY = -(2 ** 63)  # numpy's NaT as int64
+
+# Column kinds.
+ID, CATEGORY, DATE, NUMBER = "id", "category", "date", "number"
+
+# table -> (key column, {column: kind}) for everything that is loaded.
+TABLES = {
+    "students": ("student_id", {
+        "student_id": ID,
+        "program_id": CATEGORY,
+        "entry_term": CATEGORY,
+        "grad_term": CATEGORY,
+        "status": CATEGORY,
+        "citizenship_country": CATEGORY,
+    }),
+    "employers": ("employer_id", {
+        "employer_id": ID,
+        "industry": CATEGORY,
+        "state": CATEGORY,
+        "country": CATEGORY,
+    }),
+    "internships": ("internship_id", {
+        "internship_id": ID,
+        "student_id": ID,
+        "employer_id": ID,
+        "mode": CATEGORY,
+        "country": CATEGORY,
+        "start_date": DATE,
+        "end_date": DATE,
+        "is_related_to_program": NUMBER,
+    }),
+    "jobs": ("job_id", {
+        "job_id": ID,
+        "student_id": ID,
+        "employer_id": ID,
+        "job_level": CATEGORY,
+        "job_type": CATEGORY,
+        "employment_status": CATEGORY,
+        "country": CATEGORY,
+        "start_date": DATE,
+        "end_date": DATE,
+        "job_sequence": NUMBER,
+        "source_internship_id": ID,
+    }),
+}
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Columnar analytics need numpy. Install it with: pip install numpy")
+    return numpy
+
+
+# ---------- COLUMNS ----------
+
+class Dictionary:
+    """The distinct values of a categorical column; a value's code is its position."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        return self._codes.get(value, MISSING)
+
+    def encode(self, values):
+        """int32 codes for `values`; new values are added, None and "" are MISSING."""
+        np = _import_numpy()
+        # Sort once in numpy, then look up each distinct value (few) in Python.
+        strings = np.array(["" if v is None else str(v) for v in values], dtype=str)
+        distinct, inverse = np.unique(strings, return_inverse=True)
+        codes = np.array([self._add(value) for value in distinct.tolist()], dtype=np.int32)
+        return codes[inverse.reshape(-1)] if len(codes) else np.empty(0, dtype=np.int32)
+
+    def _add(self, value):
+        if value == "":
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, codes):
+        """The values for `codes` (None for MISSING), as an object array."""
+        np = _import_numpy()
+        # MISSING (-1) picks the None appended at the end.
+        return np.array(self.values + [None], dtype=object)[codes]
+
+
+def parse_days(values):
+    """ISO dates (or datetimes) -> int64 days since 1970-01-01; anything else is NO_DAY."""
+    np = _import_numpy()
+    values = [v[:10] if isinstance(v, str) and v.strip() else None for v in values]
+    try:
+        days = np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        # Free-text dates from old surveys: parse one by one, skip the bad ones.
+        days = np.empty(len(values), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                days[i] = np.datetime64(value, "D")
+            except ValueError:
+                days[i] = np.datetime64("NaT")
+    return days.view(np.int64)
+
+
+def days_between(start, end):
+    """end - start in days (float64), NaN where either date is missing."""
+    np = _import_numpy()
+    gap = (end - start).astype(np.float64)
+    gap[(start == NO_DAY) | (end == NO_DAY)] = np.nan
+    return gap
+
+
+def _column(kind, values, dictionary=None):
+    np = _import_numpy()
+    if kind == ID:
+        return np.array(["" if v is None else str(v) for v in values], dtype=str)
+    if kind == CATEGORY:
+        return dictionary.encode(values)
+    if kind == DATE:
+        return parse_days(values)
+    return np.array([np.nan if v is None or v == "" else v for v in values], dtype=np.float64)
+
+
+def _missing_value(array):
+    kind = array.dtype.kind
+    if kind == "U":
+        return ""
+    if kind == "f":
+        return float("nan")
+    if array.dtype.itemsize == 8:
+        return NO_DAY
+    return MISSING
+
+
+# ---------- FRAMES ----------
+
+class Frame:
+    """
+    Equal-length numpy columns by name, plus the Dictionary of every
+    categorical column. Frames are never changed in place; take(),
+    filter() and concat() return new ones that share the dictionaries.
+    """
+
+    def __init__(self, columns, dictionaries=None):
+        lengths = {len(c) for c in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}.")
+        self.columns = columns
+        self.dictionaries = dictionaries or {}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def labels(self, name):
+        """A column as values: categories decoded, everything else as stored."""
+        dictionary = self.dictionaries.get(name)
+        return self.columns[name] if dictionary is None else dictionary.decode(self.columns[name])
+
+    def take(self, positions):
+        """The rows at `positions`; -1 gives a row of missing values (see lookup())."""
+        np = _import_numpy()
+        positions = np.asarray(positions, dtype=np.int64)
+        absent = positions < 0
+        columns = {}
+        for name, column in self.columns.items():
+            taken = column[np.where(absent, 0, positions)] if len(column) else \
+                np.full(len(positions), _missing_value(column), dtype=column.dtype)
+            if absent.any():
+                taken[absent] = _missing_value(column)
+            columns[name] = taken
+        return Frame(columns, self.dictionaries)
+
+    def filter(self, mask):
+        np = _import_numpy()
+        return self.take(np.flatnonzero(mask))
+
+    def with_columns(self, **columns):
+        """A frame with extra (derived) columns; `Frame` values bring their dictionaries."""
+        merged = dict(self.columns)
+        dictionaries = dict(self.dictionaries)
+        for name, column in columns.items():
+            if isinstance(column, tuple):  # (codes, Dictionary)
+                column, dictionaries[name] = column
+            merged[name] = column
+        return Frame(merged, dictionaries)
+
+    def concat(self, other):
+        np = _import_numpy()
+        return Frame(
+            {name: np.concatenate([column, other.columns[name]]) for name, column in self.columns.items()},
+            self.dictionaries,
+        )
+
+    def rows(self):
+        """The frame as a list of dicts (categories decoded), e.g. for st.dataframe."""
+        names = list(self.columns)
+        values = [self.labels(name).tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def lookup(keys, target_keys):
+    """
+    For every key, its position in target_keys (unique IDs), or -1 when it
+    is missing or unknown. This is the join: frame.take(lookup(...)).
+    """
+    np = _import_numpy()
+    order = np.argsort(target_keys, kind="stable")
+    ordered = target_keys[order]
+    at = np.searchsorted(ordered, keys)
+    at[at == len(ordered)] = 0
+    found = (keys != "") & (len(ordered) > 0)
+    if len(ordered):
+        found &= ordered[at] == keys
+    return np.where(found, order[at] if len(ordered) else 0, -1)
+
+
+# ---------- GROUP BY ----------
+
+AGGREGATES = ("count", "sum", "mean", "share", "median", "min", "max")
+
+
+def _group_ids(frame, by):
+    np = _import_numpy()
+    if not by:
+        return np.zeros(len(frame), dtype=np.int64), np.zeros((1, 0), dtype=np.int32)
+    stacked = np.stack([frame[name] for name in by], axis=1)
+    groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+    return inverse.reshape(-1), groups
+
+
+def _aggregate(func, groups, n_groups, values):
+    np = _import_numpy()
+    if func == "count" and values is None:
+        return np.bincount(groups, minlength=n_groups)
+    if values.dtype == np.int64:  # dates
+        values = np.where(values == NO_DAY, np.nan, values.astype(np.float64))
+    values = values.astype(np.float64, copy=False)
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    counts = np.bincount(groups, minlength=n_groups)
+    if func == "count":
+        return counts
+    if func == "sum":
+        return np.bincount(groups, weights=values, minlength=n_groups)
+
+    result = np.full(n_groups, np.nan)
+    has = counts > 0
+    if func in ("mean", "share"):
+        sums = np.bincount(groups, weights=values, minlength=n_groups)
+        result[has] = sums[has] / counts[has]
+        return result
+
+    # Order statistics: sort by (group, value), then index into each run.
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[has]
+    counts = counts[has]
+    if func == "min":
+        result[has] = ordered[starts]
+    elif func == "max":
+        result[has] = ordered[starts + counts - 1]
+    else:
+        result[has] = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    return result
+
+
+def aggregate(frame, by, **aggregations):
+    """
+    Group `frame` by categorical columns and aggregate, e.g.
+
+        aggregate(jobs, ["program_id"],
+                  jobs=("count", None),
+                  median_days=("median", gap))
+
+    Each aggregation is (function, values): one of AGGREGATES and a column
+    name or an array as long as the frame ("count" with None counts rows).
+    Missing values (NaN, NO_DAY) are left out. Returns a Frame with one row
+    per group, keys decoded by labels() / rows(), sorted by key code.
+    """
+    for name, (func, _values) in aggregations.items():
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {func!r} for {name}; use one of {AGGREGATES}.")
+    groups, keys = _group_ids(frame, by)
+    n_groups = len(keys)
+    columns = {name: keys[:, i] for i, name in enumerate(by)}
+    for name, (func, values) in aggregations.items():
+        if isinstance(values, str):
+            values = frame[values]
+        columns[name] = _aggregate(func, groups, n_groups, values)
+    return Frame(columns, {name: frame.dictionaries[name] for name in by})
+
+
+# ---------- LOADING ----------
+
+def _read(conn, table, where="", params=()):
+    key, kinds = TABLES[table]
+    sql = f"SELECT {', '.join(kinds)} FROM {table} {where};"
+    values = [[] for _ in kinds]
+    for batch in backends.get_backend().stream(conn, sql, params, BATCH):
+        if batch:
+            for column, batch_values in zip(values, zip(*batch)):
+                column.extend(batch_values)
+    return dict(zip(kinds, values))
+
+
+def _frame(table, raw, dictionaries):
+    _key, kinds = TABLES[table]
+    columns = {}
+    for name, kind in kinds.items():
+        columns[name] = _column(kind, raw[name], dictionaries.get(name))
+    return Frame(columns, dictionaries)
+
+
+class JourneyFrames:
+    """
+    The four journey tables of one tenant as Frames (frames.students,
+    frames.internships, frames.jobs, frames.employers).
+    """
+
+    def __init__(self, tenant=None):
+        self.tenant = tenant or tenants.current_tenant()
+        self.tables = {}
+        self.change_id = None
+        self._position = changelog.Position("columnar")
+        self._lock = threading.Lock()
+
+    def __getattr__(self, table):
+        try:
+            return self.__dict__["tables"][table]
+        except KeyError:
+            raise AttributeError(table)
+
+    def load(self):
+        """Read every table from scratch. Returns self."""
+        with self._lock, tenants.use_tenant(self.tenant):
+            with db.get_read_conn() as conn:
+                # Read the position first: a change made while loading is
+                # applied again by the next refresh(), which is harmless.
+                change_id = changelog.last_change_id(conn)
+                tables = {}
+                for table, (_key, kinds) in TABLES.items():
+                    dictionaries = {n: Dictionary() for n, kind in kinds.items() if kind == CATEGORY}
+                    tables[table] = _frame(table, _read(conn, table), dictionaries)
+            self.tables = tables
+            self.change_id = change_id
+            self._position.report(change_id)
+        return self
+
+    def refresh(self):
+        """
+        Apply what changed since the last load: changed rows are read again
+        by key and replace the old ones. Returns the number of rows read.
+        """
+        if self.change_id is None:
+            self.load()
+            return sum(len(frame) for frame in self.tables.values())
+        with self._lock, tenants.use_tenant(self.tenant):
+            with db.get_read_conn() as conn:
+                change_id = changelog.last_change_id(conn)
+                if change_id < self.change_id or not changelog.covers(conn, self.change_id):
+                    # Another database (e.g. restored), or the changes were pruned.
+                    changed = None
+                else:
+                    changed = {table: set() for table in TABLES}
+                    for _id, table, row_id, _op, _columns in changelog.changes_since(conn, self.change_id):
+                        if table in changed:
+                            changed[table].add(row_id)
+                if changed is not None:
+                    read = 0
+                    for table, keys in changed.items():
+                        if keys:
+                            self.tables[table], n = self._replace(conn, table, keys)
+                            read += n
+                    self.change_id = change_id
+            if changed is not None:
+                self._position.report(change_id)
+                return read
+        self.load()
+        return sum(len(frame) for frame in self.tables.values())
+
+    def _replace(self, conn, table, keys):
+        np = _import_numpy()
+        key, _kinds = TABLES[table]
+        frame = self.tables[table]
+        keys = sorted(keys)
+        kept = frame.filter(~np.isin(frame[key], np.array(keys, dtype=str)))
+        read = 0
+        for start in range(0, len(keys), REFRESH_CHUNK):
+            chunk = keys[start:start + REFRESH_CHUNK]
+            where = f"WHERE {key} IN ({', '.join('?' * len(chunk))})"
+            fresh = _frame(table, _read(conn, table, where, chunk), frame.dictionaries)
+            kept = kept.concat(fresh)
+            read += len(fresh)
+        return kept, read
+
+
+_frames = {}
+_frames_lock = threading.Lock()
+
+
+def get_frames(tenant=None):
+    """The current tenant's JourneyFrames: loaded on first use, refreshed on every call."""
+    tenant = tenant or tenants.current_tenant()
+    with _frames_lock:
+        frames = _frames.get(tenant)
+        if frames is None:
+            frames = _frames[tenant] = JourneyFrames(tenant)
+    frames.refresh()
+    return frames
+
+
+# ---------- REPORTS ----------
+
+def internship_to_job_days(frames):
+    """
+    Per program: jobs that came from an internship, and the median / mean
+    days from the internship's end_date to the job's start_date.
+    """
+    jobs, students = frames.jobs, frames.students
+    source = frames.internships.take(lookup(jobs["source_internship_id"], frames.internships["internship_id"]))
+    student = students.take(lookup(jobs["student_id"], students["student_id"]))
+    converted = jobs.with_columns(
+        program_id=(student["program_id"], students.dictionaries["program_id"]),
+        gap_days=days_between(source["end_date"], jobs["start_date"]),
+    ).filter(jobs["source_internship_id"] != "")
+    return aggregate(
+        converted, ["program_id"],
+        jobs=("count", None),
+        median_days=("median", "gap_days"),
+        mean_days=("mean", "gap_days"),
+    )
+
+
+def internship_share_by_industry(frames):
+    """Per employer industry: jobs, and the share of them that came from an internship."""
+    np = _import_numpy()
+    jobs, employers = frames.jobs, frames.employers
+    employer = employers.take(lookup(jobs["employer_id"], employers["employer_id"]))
+    tagged = jobs.with_columns(
+        industry=(employer["industry"], employers.dictionaries["industry"]),
+        from_internship=(jobs["source_internship_id"] != "").astype(np.float64),
+    )
+    return aggregate(
+        tagged, ["industry"],
+        jobs=("count", None),
+        from_internship=("share", "from_internship"),
+    )
+
+
+REPORTS = {
+    "internship-to-job days by program": internship_to_job_days,
+    "internship share by industry": internship_share_by_industry,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar journey analytics.")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="read the analytics snapshot instead of the live database")
+    parser.add_argument("--tenant", help="school to work on (see tenants.py); default: the default school")
+    args = parser.parse_args(argv)
+
+    try:
+        with tenants.use_tenant(args.tenant or tenants.current_tenant()), db.use_snapshot(args.snapshot):
+            started = time.perf_counter()
+            frames = JourneyFrames().load()
+            rows = sum(len(frame) for frame in frames.tables.values())
+            print(f"Loaded {rows:,} rows in {time.perf_counter() - started:.2f}s")
+            for title, report in REPORTS.items():
+                started = time.perf_counter()
+                result = report(frames)
+                print(f"\n{title} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+                for row in result.rows():
+                    print("  " + "  ".join(
+                        f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()
+                    ))
+    except (RuntimeError, KeyError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
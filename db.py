@@ -1,100 +1,1266 @@
+import base64
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
 import sqlite3
+import threading
+import time
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
 
+import analytics
+import backends
+import metrics
+import schema
+import tenants
+from cache import TTLCache
+from models import (
+    Employer, Internship, Job, Journey, Membership, Organization, PlacementSummary,
+    Program, Student, TopEmployer, row_factory,
+)
+
 # Base folder of this file
 BASE_DIR = Path(__file__).resolve().parent
-# Our SQLite file (must exist: esb.db)
-DB_PATH = BASE_DIR / "esb.db"
+# Our SQLite file (tables are created on first use, see schema.py).
+# Can be overridden with ESB_DB_PATH. With several schools (ESB_TENANTS,
+# see tenants.py) each one has its own file instead.
+DB_PATH = Path(os.environ.get("ESB_DB_PATH", BASE_DIR / "esb.db"))
+tenants.load_config(default_path=DB_PATH)
 
+# How many connections the pool keeps open at most.
+POOL_SIZE = int(os.environ.get("ESB_DB_POOL_SIZE", "5"))
+# Seconds to wait for a free connection before giving up.
+POOL_TIMEOUT = 30.0
 
-def get_conn():
-    """Open a new SQLite connection with foreign keys enabled."""
-    conn = sqlite3.connect(DB_PATH)
+# Pragmas applied to every new connection. "performance" is meant for
+# several survey sessions writing at once (career fairs): WAL lets readers
+# run next to the single writer, busy_timeout makes writers queue up
+# instead of failing. "safe" is SQLite's stock rollback journal.
+PRAGMA_PROFILES = {
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # ms
+        "cache_size": -20000,  # negative = KiB, so ~20 MB
+        "mmap_size": 268435456,  # 256 MB
+        "temp_store": "MEMORY",
+    },
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+DB_PROFILE = os.environ.get("ESB_DB_PROFILE", "performance")
+
+# Extra retries (with exponential backoff) when SQLite still reports the
+# database as busy/locked after busy_timeout.
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05  # seconds, doubled on every retry
+
+# Programs, employers and organizations change rarely but are read on every
+# Streamlit rerun, so keep them in memory for a while. Our own inserts
+# invalidate the affected entry right after they commit; the TTL bounds how
+# stale other worker processes can be.
+REFERENCE_CACHE_TTL = float(os.environ.get("ESB_REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = 64
+_reference_cache = TTLCache(maxsize=REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL)
+
+# Send the read helpers to the analytics snapshot (see snapshot.py) instead
+# of the live database. Per block with use_snapshot(), or for the whole
+# process with ESB_SNAPSHOT_READS=1.
+SNAPSHOT_READS = os.environ.get("ESB_SNAPSHOT_READS", "0") == "1"
+_snapshot_reads = contextvars.ContextVar("esb_snapshot_reads", default=None)
+
+# Pragmas for read-only snapshot connections: no journal or sync settings,
+# the file is never written.
+READONLY_PRAGMAS = {
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+def _profile_pragmas(profile):
+    if isinstance(profile, dict):
+        return profile
+    try:
+        return PRAGMA_PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown database profile {profile!r}; use one of {sorted(PRAGMA_PROFILES)}."
+        )
+
+
+# ---------- INSTRUMENTATION ----------
+# Every connection records statement timings, rows affected and commit
+# latency into metrics.py. Set ESB_DB_METRICS=0 to turn it off.
+METRICS_ENABLED = os.environ.get("ESB_DB_METRICS", "1") != "0"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_statement(sql, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_statement(sql, time.perf_counter() - started, self.rowcount)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    # The built-in shortcuts don't go through cursor(), so route them.
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            metrics.commit_seconds.observe(time.perf_counter() - started)
+
+
+def instrumented(func):
+    """Record end-to-end latency and errors of a public helper."""
+    if not METRICS_ENABLED:
+        return func
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except BaseException:
+            metrics.helper_errors.inc(helper=name)
+            raise
+        finally:
+            metrics.helper_seconds.observe(time.perf_counter() - started, helper=name)
+
+    return wrapper
+
+
+def _open_connection(db_path, profile=DB_PROFILE, readonly=False):
+    """
+    Open a new SQLite connection with foreign keys and the profile's pragmas.
+    readonly=True opens a file that nobody writes to (a snapshot) with
+    immutable=1, so SQLite skips locking and change detection entirely.
+    """
+    started = time.perf_counter()
+    factory = InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection
+    # check_same_thread=False: pooled connections may be handed to any
+    # Streamlit script thread, but only one thread uses a connection at a time.
+    if readonly:
+        uri = Path(db_path).resolve().as_uri() + "?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row
+    if readonly:
+        for name, value in READONLY_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        metrics.connect_seconds.observe(time.perf_counter() - started)
+        return conn
     conn.execute("PRAGMA foreign_keys = ON;")
+    for name, value in _profile_pragmas(profile).items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    # Create / upgrade tables the first time we see this file.
+    schema.bootstrap(conn)
+    metrics.connect_seconds.observe(time.perf_counter() - started)
     return conn
 
 
+class ConnectionPool:
+    """
+    Small thread-safe pool of SQLite connections.
+
+    Connections are opened lazily (up to `size`), get their pragmas once
+    when they are opened, and are health-checked every time they are
+    borrowed. Use `pool.connection()` as a context manager.
+    readonly=True pools serve a snapshot file (see _open_connection).
+    """
+
+    def __init__(
+        self, db_path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT, profile=DB_PROFILE,
+        readonly=False,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        _profile_pragmas(profile)  # fail early on a bad profile name
+        self.db_path = db_path
+        self.profile = profile
+        self.readonly = readonly
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool is not full."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        return _open_connection(self.db_path, self.profile, self.readonly)
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                waited = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No free database connection after {self.timeout} seconds."
+                    )
+                finally:
+                    metrics.pool_wait_seconds.observe(time.perf_counter() - waited)
+
+            if self._is_healthy(conn):
+                return conn
+            # Broken connection: drop it and try again.
+            self._discard(conn)
+
+    def release(self, conn):
+        """Give a connection back to the pool."""
+        if self._closed:
+            self._discard(conn)
+            return
+        # Never hand out a connection with a half-done transaction.
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections. Borrowed ones are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# One pool per tenant (school), opened the first time it is used.
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def init_pool(db_path=None, size=None, profile=None):
+    """
+    (Re)create the current tenant's pool, e.g. to point it at another file,
+    change its size or its pragma profile. Any previous pool is closed.
+    """
+    tenant = tenants.current_tenant()
+    if db_path is not None:
+        tenants.register_tenant(tenant, db_path)
+    with _pool_lock:
+        old = _pools.get(tenant)
+        pool = _pools[tenant] = ConnectionPool(
+            tenants.db_path(tenant),
+            size if size is not None else POOL_SIZE,
+            profile=profile if profile is not None else DB_PROFILE,
+        )
+    if old is not None:
+        old.close()
+    # Cached rows belong to the old database.
+    _reference_cache.clear()
+    return pool
+
+
+def get_pool():
+    """The current tenant's pool."""
+    tenant = tenants.current_tenant()
+    pool = _pools.get(tenant)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(tenant)
+            if pool is None:
+                pool = _pools[tenant] = ConnectionPool(tenants.db_path(tenant), POOL_SIZE)
+    return pool
+
+
+def get_conn():
+    """
+    Borrow a pooled connection (with foreign keys enabled):
+
+        with get_conn() as conn:
+            ...
+
+    The connection goes back to the pool at the end of the block. Any
+    transaction that was not committed is rolled back. With
+    ESB_DB_BACKEND=postgres it is a pooled Postgres connection that takes
+    the same SQL (see backends.py).
+    """
+    return backends.get_backend().connection()
+
+
+def _reading_snapshot():
+    enabled = _snapshot_reads.get()
+    return SNAPSHOT_READS if enabled is None else enabled
+
+
+@contextmanager
+def use_snapshot(enabled=True):
+    """
+    Run the block's read helpers against the current tenant's analytics
+    snapshot (see snapshot.py). Writes always go to the live database.
+    """
+    token = _snapshot_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _snapshot_reads.reset(token)
+
+
+def get_read_conn():
+    """
+    Borrow a connection for a read helper: a read-only snapshot connection
+    inside use_snapshot(), otherwise (or while there is no snapshot yet)
+    the same as get_conn().
+    """
+    if _reading_snapshot():
+        import snapshot
+
+        return snapshot.connection()
+    return get_conn()
+
+
+def reference_cache_stats():
+    """Hit/miss counters for the programs/employers/organizations cache."""
+    return _reference_cache.stats()
+
+
+def _cache_key(name, from_snapshot=None):
+    # Every school has its own programs and employers, and the snapshot
+    # may be behind the live database.
+    if from_snapshot is None:
+        from_snapshot = _reading_snapshot()
+    return (tenants.current_tenant(), name, bool(from_snapshot))
+
+
+def invalidate_reference_cache(*keys):
+    """
+    Drop the current tenant's cached reference data ("programs",
+    "employers", "organizations"), or everything cached.
+    """
+    if keys:
+        _reference_cache.invalidate(
+            *[_cache_key(k, s) for k in keys for s in (False, True)]
+        )
+    else:
+        _reference_cache.clear()
+
+
+def routed(func):
+    """
+    Run a helper against the tenant that owns its `program_id` argument.
+    Calls without a program_id use the current tenant.
+    """
+    # Where program_id sits among the positional parameters (no inspect:
+    # it is slow to import and bind_partial() is slow to call).
+    target = func
+    while hasattr(target, "__wrapped__"):
+        target = target.__wrapped__
+    code = target.__code__
+    position = code.co_varnames[:code.co_argcount].index("program_id")
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        program_id = args[position] if len(args) > position else kwargs.get("program_id")
+        if program_id is None:
+            return func(*args, **kwargs)
+        with tenants.use_tenant(tenants.tenant_for_program(program_id)):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _is_busy(error):
+    sqlstate = getattr(error, "sqlstate", None)
+    if sqlstate is not None:
+        # Postgres: serialization failure, deadlock, lock not available.
+        return sqlstate in ("40001", "40P01", "55P03")
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended codes (e.g. SQLITE_BUSY_SNAPSHOT) keep the base code in the low byte.
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(func):
+    """
+    Retry a write helper when the database is busy/locked, with
+    exponential backoff and a little jitter, so concurrent writers queue up
+    instead of surfacing "database is locked" to the user.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = BUSY_BACKOFF
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == BUSY_RETRIES or not _is_busy(e):
+                    raise
+                metrics.busy_retries.inc(helper=func.__name__)
+                pause = delay + random.uniform(0, delay)
+                metrics.lock_wait_seconds.observe(pause)
+                time.sleep(pause)
+                delay *= 2
+
+    return wrapper
+
+
 # ---------- FETCH HELPERS ----------
 
-def get_programs():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT program_id, program_name FROM programs ORDER BY program_id;")
-    rows = cur.fetchall()
-    conn.close()
+def _fetch_all(sql, params=(), model=None):
+    """All rows of one query, as `model` records (see models.py) when given."""
+    with get_read_conn() as conn:
+        cur = conn.cursor()
+        if model is not None:
+            cur.row_factory = row_factory(model)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
     return rows
 
 
+@instrumented
+def get_programs():
+    rows = _reference_cache.get_or_load(
+        _cache_key("programs"),
+        lambda: _fetch_all(
+            "SELECT program_id, program_name FROM programs ORDER BY program_id;", model=Program
+        ),
+    )
+    # A copy, so callers can't change what is cached.
+    return list(rows)
+
+
+@instrumented
 def get_students():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    return _fetch_all(
         """
         SELECT student_id, first_name, last_name, email
         FROM students
         ORDER BY first_name, last_name;
-        """
+        """,
+        model=Student,
     )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
 
 
+@instrumented
 def get_employers():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT employer_id, employer_name FROM employers ORDER BY employer_name;")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    rows = _reference_cache.get_or_load(
+        _cache_key("employers"),
+        lambda: _fetch_all(
+            "SELECT employer_id, employer_name FROM employers ORDER BY employer_name;",
+            model=Employer,
+        ),
+    )
+    return list(rows)
+
+
+def _fts_query(text):
+    """Turn what the user typed into an FTS5 prefix query: 'goo ll' -> '"goo"* "ll"*'."""
+    words = "".join(ch if ch.isalnum() else " " for ch in text).split()
+    return " ".join(f'"{w}"*' for w in words)
 
 
+@instrumented
+@routed
+def search_employers(text, limit=10, program_id=None):
+    """
+    Employers whose name matches what the user has typed so far, for the
+    employer typeahead in app.py. Every word is treated as a prefix, so
+    "goo" and "google ll" both find "Google LLC". Searches the school that
+    owns `program_id` (the student's program), or the current one.
+
+    Returns Employer records (all columns filled in); names starting with the typed text come first.
+    """
+    text = (text or "").strip()
+    query = _fts_query(text)
+    if not query:
+        return []
+
+    with get_read_conn() as conn:
+        has_fts = backends.get_backend().name == "sqlite" and conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'employers_fts';"
+        ).fetchone()
+        cur = conn.cursor()
+        cur.row_factory = row_factory(Employer)
+        # Names that start with the typed text first, from the prefix range
+        # on idx_employers_lower_name, so an exact or prefix match is never
+        # crowded out by other matches.
+        cur.execute(
+            """
+            SELECT employer_id, employer_name, industry,
+                   city, state, country, website
+            FROM employers
+            WHERE LOWER(employer_name) COLLATE BINARY >= LOWER(?)
+              AND LOWER(employer_name) COLLATE BINARY < LOWER(?)
+            ORDER BY LOWER(employer_name) COLLATE BINARY, employer_id
+            LIMIT ?;
+            """,
+            (text, text + "\U0010ffff", limit),
+        )
+        rows = cur.fetchall()
+        if has_fts and len(rows) < limit:
+            # Then the best-ranked word matches ("ll" in "Google LLC"). The
+            # rank is only computed when the prefix range did not fill the
+            # list, so a common prefix like "in" never pays for it.
+            cur.execute(
+                """
+                SELECT e.employer_id, e.employer_name, e.industry,
+                       e.city, e.state, e.country, e.website
+                FROM (
+                    SELECT rowid FROM employers_fts
+                    WHERE employers_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ) f
+                JOIN employers e ON e.rowid = f.rowid;
+                """,
+                (query, limit + len(rows)),
+            )
+            seen = {r.employer_id for r in rows}
+            rows += [r for r in cur.fetchall() if r.employer_id not in seen]
+
+    lowered = text.lower()
+    rows.sort(
+        key=lambda r: (
+            not (r.employer_name or "").lower().startswith(lowered),
+            len(r.employer_name or ""),
+            r.employer_name or "",
+        )
+    )
+    return rows[:limit]
+
+
+@instrumented
 def get_internships_for_student(student_id):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    return _fetch_all(
         """
         SELECT internship_id, title
         FROM internships
         WHERE student_id = ?;
         """,
         (student_id,),
+        model=Internship,
     )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
 
 
+@instrumented
 def get_organizations():
-    conn = get_conn()
+    rows = _reference_cache.get_or_load(
+        _cache_key("organizations"),
+        lambda: _fetch_all(
+            "SELECT org_id, org_name FROM organizations ORDER BY org_name;", model=Organization
+        ),
+    )
+    return list(rows)
+
+
+# ---------- STUDENT JOURNEYS ----------
+# A whole timeline (student, program, internships, jobs, organizations) in
+# four queries per JOURNEY_BATCH students, however many rows each has.
+
+JOURNEY_BATCH = 500
+
+
+def _load_journeys(conn, student_ids):
+    marks = ", ".join("?" * len(student_ids))
     cur = conn.cursor()
-    cur.execute("SELECT org_id, org_name FROM organizations ORDER BY org_name;")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    # Plain tuples, turned straight into records.
+    cur.row_factory = None
+    journeys = {}
 
+    cur.execute(
+        f"""
+        SELECT s.student_id, s.program_id, s.first_name, s.last_name, s.email,
+               s.entry_term, s.grad_term, s.status, s.citizenship_country, s.linkedin_url,
+               p.program_id, p.program_name, p.level, p.department
+        FROM students s
+        LEFT JOIN programs p ON p.program_id = s.program_id
+        WHERE s.student_id IN ({marks});
+        """,
+        student_ids,
+    )
+    for row in cur:
+        program = Program(*row[10:]) if row[10] is not None else None
+        journeys[row[0]] = Journey(Student(*row[:10]), program)
 
-# ---------- INSERT HELPERS ----------
+    employers = {}
 
+    def add_employer(journey, row):
+        if row[0] is None:
+            return
+        employer = employers.get(row[0])
+        if employer is None:
+            employer = employers[row[0]] = Employer(*row)
+        journey.employers[employer.employer_id] = employer
 
-def add_program(program_id, program_name, level, department):
+    cur.execute(
+        f"""
+        SELECT i.internship_id, i.student_id, i.employer_id, i.title, i.mode,
+               i.city, i.state, i.country, i.start_date, i.end_date, i.is_related_to_program,
+               e.employer_id, e.employer_name, e.industry, e.city, e.state, e.country, e.website
+        FROM internships i
+        LEFT JOIN employers e ON e.employer_id = i.employer_id
+        WHERE i.student_id IN ({marks});
+        """,
+        student_ids,
+    )
+    for row in cur:
+        journey = journeys[row[1]]
+        journey.internships.append(Internship(*row[:11]))
+        add_employer(journey, row[11:])
+
+    cur.execute(
+        f"""
+        SELECT j.job_id, j.student_id, j.employer_id, j.title, j.job_level, j.job_type,
+               j.employment_status, j.city, j.state, j.country, j.start_date, j.end_date,
+               j.job_sequence, j.source_internship_id,
+               e.employer_id, e.employer_name, e.industry, e.city, e.state, e.country, e.website
+        FROM jobs j
+        LEFT JOIN employers e ON e.employer_id = j.employer_id
+        WHERE j.student_id IN ({marks});
+        """,
+        student_ids,
+    )
+    for row in cur:
+        journey = journeys[row[1]]
+        journey.jobs.append(Job(*row[:14]))
+        add_employer(journey, row[14:])
+
+    cur.execute(
+        f"""
+        SELECT so.student_id, so.student_org_id, so.org_id, o.org_name, o.org_type,
+               so.role, so.start_date, so.end_date
+        FROM student_organizations so
+        JOIN organizations o ON o.org_id = so.org_id
+        WHERE so.student_id IN ({marks});
+        """,
+        student_ids,
+    )
+    for row in cur:
+        journeys[row[0]].organizations.append(Membership(*row[1:]))
+
+    # Timeline order. Sorting here keeps the queries on their indexes.
+    for journey in journeys.values():
+        journey.internships.sort(key=lambda i: (i.start_date or "", i.internship_id))
+        journey.jobs.sort(
+            key=lambda j: (j.job_sequence is None, j.job_sequence or 0, j.start_date or "", j.job_id)
+        )
+        journey.organizations.sort(key=lambda m: (m.start_date or "", m.org_name))
+    return journeys
+
+
+@instrumented
+def get_journeys(student_ids):
     """
-    Insert a program. If it already exists, ignore (no error).
+    {student_id: Journey} for the given students; unknown IDs are left out.
+    See models.Journey for what a journey holds.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+    ids = list(dict.fromkeys(student_ids))
+    journeys = {}
+    with get_read_conn() as conn:
+        for start in range(0, len(ids), JOURNEY_BATCH):
+            journeys.update(_load_journeys(conn, ids[start:start + JOURNEY_BATCH]))
+    return journeys
+
+
+@instrumented
+def get_student_journey(student_id):
+    """One student's Journey, or None if there is no such student."""
+    with get_read_conn() as conn:
+        return _load_journeys(conn, [student_id]).get(student_id)
+
+
+# ---------- PAGED LISTINGS ----------
+# Keyset ("seek") pagination: each page continues right after the sort key
+# of the previous page's last row, so fetching page 1000 costs the same as
+# page 1 and only one page of rows is ever in memory. The cursor handed
+# back to the caller is that sort key, base64-encoded.
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor.")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid page cursor.")
+    return values
+
+
+def _fetch_page(model, select, where, params, order_by, key_columns, limit):
+    """Run one page query. Returns (records, next_cursor or None)."""
+    if limit < 1:
+        raise ValueError("limit must be at least 1.")
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order_by} LIMIT ?;"
+
+    # One extra row tells us whether there is a next page.
+    rows = _fetch_all(sql, tuple(params) + (limit + 1,), model)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], c) for c in key_columns])
+
+
+@instrumented
+@routed
+def get_students_page(limit=PAGE_SIZE, cursor=None, program_id=None, status=None, grad_term=None):
+    """
+    One page of students ordered by first_name, last_name (like
+    get_students), optionally filtered. Returns (students, next_cursor); pass
+    next_cursor back in to get the following page. It is None on the last page.
+    """
+    where, params = [], []
+    if program_id is not None:
+        where.append("program_id = ?")
+        params.append(program_id)
+    if status is not None:
+        where.append("status = ?")
+        params.append(status)
+    if grad_term is not None:
+        # The "+" keeps SQLite from picking idx_students_grad_term, which
+        # would mean sorting the whole term; we want a name-ordered index.
+        where.append("+grad_term = ?")
+        params.append(grad_term)
+    if cursor:
+        where.append("(first_name, last_name, student_id) > (?, ?, ?)")
+        params.extend(decode_cursor(cursor, 3))
+
+    return _fetch_page(
+        Student,
         """
-        INSERT OR IGNORE INTO programs (program_id, program_name, level, department)
-        VALUES (?, ?, ?, ?);
+        SELECT student_id, first_name, last_name, email, program_id, grad_term, status
+        FROM students
         """,
-        (program_id, program_name, level, department),
+        where,
+        params,
+        "first_name, last_name, student_id",
+        ("first_name", "last_name", "student_id"),
+        limit,
+    )
+
+
+# Employer pages sort on this, not on employer_name: SQLite puts NULLs
+# first and Postgres last, and Postgres compares text by locale unless told
+# otherwise (idx_employers_sort_name, schema migration 8).
+_EMPLOYER_SORT = "COALESCE(employer_name, '') COLLATE BINARY"
+
+
+@instrumented
+def get_employers_page(limit=PAGE_SIZE, cursor=None):
+    """
+    One page of employers ordered by employer_name (unnamed ones first).
+    Returns (employers, next_cursor).
+    """
+    where, params = [], []
+    if cursor:
+        name, employer_id = decode_cursor(cursor, 2)
+        name = name or ""
+        # Spelled out instead of a row value, so SQLite seeks on the
+        # expression index instead of scanning it.
+        where.append(f"{_EMPLOYER_SORT} >= ? AND ({_EMPLOYER_SORT} > ? OR employer_id > ?)")
+        params.extend([name, name, employer_id])
+
+    return _fetch_page(
+        Employer,
+        "SELECT employer_id, employer_name FROM employers",
+        where,
+        params,
+        f"{_EMPLOYER_SORT}, employer_id",
+        ("employer_name", "employer_id"),
+        limit,
     )
-    conn.commit()
-    conn.close()
 
 
+@instrumented
+def get_internships_page(limit=PAGE_SIZE, cursor=None, student_id=None, employer_id=None):
+    """One page of internships ordered by internship_id. Returns (internships, next_cursor)."""
+    where, params = [], []
+    if student_id is not None:
+        where.append("student_id = ?")
+        params.append(student_id)
+    if employer_id is not None:
+        where.append("employer_id = ?")
+        params.append(employer_id)
+    if cursor:
+        where.append("internship_id > ?")
+        params.extend(decode_cursor(cursor, 1))
+
+    return _fetch_page(
+        Internship,
+        """
+        SELECT internship_id, student_id, employer_id, title, start_date, end_date
+        FROM internships
+        """,
+        where,
+        params,
+        "internship_id",
+        ("internship_id",),
+        limit,
+    )
+
+
+# ---------- DASHBOARD HELPERS ----------
+# These read the small precomputed tables maintained by analytics.py, never
+# the fact tables.
+
+_PLACEMENT_SQL = """
+    SELECT program_id, grad_term, students, alumni, with_internship,
+           placed, from_internship,
+           ROUND(1.0 * placed / students, 3) AS placement_rate,
+           CASE WHEN with_internship > 0
+                THEN ROUND(1.0 * from_internship / with_internship, 3)
+           END AS conversion_rate
+    FROM {table}
+    {where}
+    ORDER BY program_id, grad_term
+"""
+
+
+@instrumented
+@routed
+def get_placement_summary(program_id=None):
+    """
+    One PlacementSummary per (program_id, grad_term) cohort with its counts, plus
+    placement_rate (share of students with a job) and conversion_rate
+    (share of interns whose job came from an internship).
+    """
+    if program_id is None:
+        sql = _PLACEMENT_SQL.format(table="placement_summary", where="")
+        return _fetch_all(sql, model=PlacementSummary)
+    sql = _PLACEMENT_SQL.format(table="placement_summary", where="WHERE program_id = ?")
+    return _fetch_all(sql, (program_id,), PlacementSummary)
+
+
+@instrumented
+def get_top_employers(grad_term, limit=10):
+    """Employers that hired the most students of one graduating term."""
+    return _fetch_all(
+        """
+        SELECT c.employer_id, e.employer_name, c.hires, c.interns
+        FROM employer_cohort_summary c
+        LEFT JOIN employers e ON e.employer_id = c.employer_id
+        WHERE c.grad_term IS ?
+        ORDER BY c.hires DESC
+        LIMIT ?;
+        """,
+        (grad_term, limit),
+        TopEmployer,
+    )
+
+
+# ---------- ACROSS TENANTS ----------
+# SQLite attaches at most 10 databases to one connection by default.
+ATTACH_LIMIT = 10
+
+
+def fan_out(sql, params=(), tenant_names=None, model=None):
+    """
+    Run one read-only query against every tenant's database and return all
+    rows, each with the tenant name as its first column.
+
+    `sql` names its tables as "{db}.table"; the placeholder becomes the
+    schema name of the attached tenant file. The files are attached
+    read-only to a scratch connection, ATTACH_LIMIT at a time, so the
+    tenants' own pools and write locks are never touched. Tenants whose
+    file does not exist yet are skipped. Inside use_snapshot() the
+    tenants' snapshot files are read where they exist. On Postgres the
+    tenants are schemas and this is a single UNION ALL query.
+    """
+    backend = backends.get_backend()
+    if backend.name != "sqlite":
+        return backend.fan_out(sql, params, tenant_names, model)
+    paths = {}
+    for name in tenant_names or tenants.names():
+        uri = _fan_out_uri(name)
+        if uri is not None:
+            paths[name] = uri
+    names = list(paths)
+    sql = sql.strip().rstrip(";")
+    hub = sqlite3.connect(":memory:", uri=True)
+    try:
+        if model is not None:
+            hub.row_factory = row_factory(model)
+        rows = []
+        for start in range(0, len(names), ATTACH_LIMIT):
+            group = list(enumerate(names[start:start + ATTACH_LIMIT]))
+            for i, name in group:
+                hub.execute(f"ATTACH DATABASE ? AS shard{i};", (paths[name],))
+            union = " UNION ALL ".join(
+                f"SELECT * FROM (SELECT ? AS tenant, * FROM ({sql.format(db=f'shard{i}')}))"
+                for i, _ in group
+            )
+            group_params = []
+            for _, name in group:
+                group_params.append(name)
+                group_params.extend(params)
+            rows.extend(hub.execute(union, group_params).fetchall())
+            for i, _ in group:
+                hub.execute(f"DETACH DATABASE shard{i};")
+        return rows
+    finally:
+        hub.close()
+
+
+def _fan_out_uri(name):
+    """Read-only URI of the file fan_out() reads for a tenant, or None."""
+    if _reading_snapshot():
+        import snapshot
+
+        path = snapshot.snapshot_path(name)
+        if path.exists():
+            return path.resolve().as_uri() + "?mode=ro&immutable=1"
+    path = tenants.db_path(name)
+    if not path.exists():
+        return None
+    return path.resolve().as_uri() + "?mode=ro"
+
+
+@instrumented
+def get_placement_summary_all(program_id=None):
+    """get_placement_summary() for every tenant, with PlacementSummary.tenant set."""
+    table = "{db}.placement_summary"
+    if program_id is None:
+        rows = fan_out(_PLACEMENT_SQL.format(table=table, where=""), model=PlacementSummary)
+    else:
+        sql = _PLACEMENT_SQL.format(table=table, where="WHERE program_id = ?")
+        rows = fan_out(sql, (program_id,), model=PlacementSummary)
+    return sorted(rows, key=lambda r: (r.tenant, r.program_id, r.grad_term or ""))
+
+
+@instrumented
+def get_top_employers_all(grad_term, limit=10):
+    """
+    get_top_employers() across every tenant. An employer that hires from
+    several schools is counted once, with its hires and interns summed, so
+    each school's full list is read rather than its top `limit`.
+    """
+    rows = fan_out(
+        """
+        SELECT c.employer_id, e.employer_name, c.hires, c.interns
+        FROM {db}.employer_cohort_summary c
+        LEFT JOIN {db}.employers e ON e.employer_id = c.employer_id
+        WHERE c.grad_term IS ?;
+        """,
+        (grad_term,),
+    )
+    merged = {}
+    for _tenant, employer_id, employer_name, hires, interns in rows:
+        top = merged.get(employer_id)
+        if top is None:
+            merged[employer_id] = TopEmployer(employer_id, employer_name, hires, interns)
+        else:
+            top.employer_name = top.employer_name or employer_name
+            top.hires += hires
+            top.interns += interns
+    return sorted(merged.values(), key=lambda r: (-r.hires, r.employer_id))[:limit]
+
+
+# ---------- WARM-UP ----------
+# A new worker pays for opening connections (pragmas, schema check), for
+# SQLite parsing the schema on each of them and for reading cold pages.
+# warm_up() does all that once at boot (app.py runs it in the background),
+# so the first users after a scale-up don't.
+
+# Connections opened per tenant by warm_up().
+WARM_CONNECTIONS = int(os.environ.get("ESB_WARM_CONNECTIONS", "2"))
+
+
+def _warm_tenant(connections, sqlite):
+    timings = {}
+
+    def timed(step, func):
+        started = time.perf_counter()
+        func()
+        timings[step] = round((time.perf_counter() - started) * 1000, 2)
+
+    def open_connections():
+        # Borrow them all at once, so the pool really opens that many.
+        with ExitStack() as stack:
+            for _ in range(connections):
+                conn = stack.enter_context(get_conn())
+                # The first statement on a SQLite connection parses the schema.
+                conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master;" if sqlite else "SELECT 1;"
+                ).fetchone()
+
+    def first_pages():
+        get_students_page()
+        get_placement_summary()
+        search_employers("a")
+
+    timed("connections", open_connections)
+    timed("reference data", lambda: (get_programs(), get_employers(), get_organizations()))
+    timed("first pages", first_pages)
+    return timings
+
+
+def warm_up(tenant_names=None, connections=WARM_CONNECTIONS):
+    """
+    Open `connections` pooled connections per tenant and load its reference
+    caches and the pages the first screens read. Tenants whose SQLite file
+    does not exist yet are skipped. Returns {tenant: {step: milliseconds}}.
+    """
+    sqlite = backends.get_backend().name == "sqlite"
+    connections = max(1, min(connections, POOL_SIZE))
+    timings = {}
+    for name in tenant_names or tenants.names():
+        if sqlite and not tenants.db_path(name).exists():
+            continue
+        with tenants.use_tenant(name):
+            timings[name] = _warm_tenant(connections, sqlite)
+    return timings
+
+
+# ---------- WRITE HELPERS ----------
+# Every write is an upsert, so a resubmitted survey (an alum adding a
+# second job) updates the rows that are already there instead of failing
+# on the primary key. A column whose value is None is left as stored; ""
+# clears it (writes NULL). Only given values that differ from what is
+# stored are written, so a resubmission that changes nothing does not
+# touch the row at all. Triggers (schema migration 7)
+# append every insert/update/delete to change_log.
+#
+# Each _upsert_* function runs one statement on a cursor the caller owns,
+# so several of them can share a single transaction (see save_journey).
+
+
+@functools.lru_cache(maxsize=None)
+def _upsert_sql(table, key, columns, updates):
+    insert = f"""
+        INSERT INTO {table} AS t ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+    """
+    if not updates:
+        return insert + f"ON CONFLICT ({key}) DO NOTHING;"
+    return insert + f"""
+        ON CONFLICT ({key}) DO UPDATE SET
+            {", ".join(f"{c} = excluded.{c}" for c in updates)}
+        WHERE {" OR ".join(f"excluded.{c} IS NOT t.{c}" for c in updates)};
+    """
+
+
+def _upsert(cur, table, key, row):
+    """
+    Insert `row` (column -> value), or merge it into the row with the same key:
+    columns given as None keep their stored value, "" sets them to NULL.
+    """
+    updates = tuple(c for c, value in row.items() if c != key and value is not None)
+    cur.execute(
+        _upsert_sql(table, key, tuple(row), updates),
+        [None if value == "" else value for value in row.values()],
+    )
+
+
+def _upsert_program(cur, program_id, program_name, level, department):
+    _upsert(cur, "programs", "program_id", {
+        "program_id": program_id,
+        "program_name": program_name,
+        "level": level,
+        "department": department,
+    })
+
+
+def _upsert_student(
+    cur,
+    student_id,
+    program_id,
+    first_name,
+    last_name,
+    email,
+    entry_term,
+    grad_term,
+    status,
+    citizenship_country,
+    linkedin_url,
+):
+    _upsert(cur, "students", "student_id", {
+        "student_id": student_id,
+        "program_id": program_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": email,
+        "entry_term": entry_term,
+        "grad_term": grad_term,
+        "status": status,
+        "citizenship_country": citizenship_country,
+        "linkedin_url": linkedin_url,
+    })
+
+
+def _upsert_employer(cur, employer_id, employer_name, industry, city, state, country, website):
+    _upsert(cur, "employers", "employer_id", {
+        "employer_id": employer_id,
+        "employer_name": employer_name,
+        "industry": industry,
+        "city": city,
+        "state": state,
+        "country": country,
+        "website": website,
+    })
+
+
+def _upsert_internship(
+    cur,
+    internship_id,
+    student_id,
+    employer_id,
+    title,
+    mode,
+    city,
+    state,
+    country,
+    start_date,
+    end_date,
+    is_related,
+):
+    _upsert(cur, "internships", "internship_id", {
+        "internship_id": internship_id,
+        "student_id": student_id,
+        "employer_id": employer_id,
+        "title": title,
+        "mode": mode,
+        "city": city,
+        "state": state,
+        "country": country,
+        "start_date": start_date,
+        "end_date": end_date,
+        "is_related_to_program": None if is_related is None else int(is_related),
+    })
+
+
+def _upsert_job(
+    cur,
+    job_id,
+    student_id,
+    employer_id,
+    title,
+    job_level,
+    job_type,
+    employment_status,
+    city,
+    state,
+    country,
+    start_date,
+    end_date,
+    job_sequence,
+    source_internship_id,
+):
+    _upsert(cur, "jobs", "job_id", {
+        "job_id": job_id,
+        "student_id": student_id,
+        "employer_id": employer_id,
+        "title": title,
+        "job_level": job_level,
+        "job_type": job_type,
+        "employment_status": employment_status,
+        "city": city,
+        "state": state,
+        "country": country,
+        "start_date": start_date,
+        "end_date": end_date,
+        "job_sequence": job_sequence,
+        "source_internship_id": source_internship_id,
+    })
+
+
+@instrumented
+@routed
+@retry_on_busy
+def add_program(program_id, program_name, level, department):
+    """
+    Insert a program, or update the stored one. None keeps a stored value, "" clears it.
+    """
+    with get_conn() as conn:
+        _upsert_program(conn.cursor(), program_id, program_name, level, department)
+        conn.commit()
+    invalidate_reference_cache("programs")
+
+
+@instrumented
+@routed
+@retry_on_busy
 def add_student(
     student_id,
     program_id,
@@ -107,16 +1273,11 @@ def add_student(
     citizenship_country,
     linkedin_url,
 ):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO students
-        (student_id, program_id, first_name, last_name, email,
-         entry_term, grad_term, status, citizenship_country, linkedin_url)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """,
-        (
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        before = analytics.snapshot_students(conn, [student_id])
+        _upsert_student(
+            conn.cursor(),
             student_id,
             program_id,
             first_name,
@@ -127,30 +1288,33 @@ def add_student(
             status,
             citizenship_country,
             linkedin_url,
-        ),
-    )
-    conn.commit()
-    conn.close()
+        )
+        analytics.apply_changes(conn, before, analytics.snapshot_students(conn, [student_id]))
+        conn.commit()
 
 
-def add_employer(employer_id, employer_name, industry, city, state, country, website):
+@instrumented
+@routed
+@retry_on_busy
+def add_employer(
+    employer_id, employer_name, industry, city, state, country, website, program_id=None
+):
     """
-    Insert employer. If same employer_id already exists, ignore.
+    Insert an employer, or update the stored one. None keeps a stored value, "" clears it.
+    Like the other add_* helpers it writes to the school that owns
+    `program_id`, or to the current one.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT OR IGNORE INTO employers
-        (employer_id, employer_name, industry, city, state, country, website)
-        VALUES (?, ?, ?, ?, ?, ?, ?);
-        """,
-        (employer_id, employer_name, industry, city, state, country, website),
-    )
-    conn.commit()
-    conn.close()
+    with get_conn() as conn:
+        _upsert_employer(
+            conn.cursor(), employer_id, employer_name, industry, city, state, country, website
+        )
+        conn.commit()
+    invalidate_reference_cache("employers")
 
 
+@instrumented
+@routed
+@retry_on_busy
 def add_internship(
     internship_id,
     student_id,
@@ -163,17 +1327,13 @@ def add_internship(
     start_date,
     end_date,
     is_related,
+    program_id=None,
 ):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO internships
-        (internship_id, student_id, employer_id, title, mode,
-         city, state, country, start_date, end_date, is_related_to_program)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """,
-        (
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        before = analytics.snapshot_students(conn, [student_id])
+        _upsert_internship(
+            conn.cursor(),
             internship_id,
             student_id,
             employer_id,
@@ -184,13 +1344,15 @@ def add_internship(
             country,
             start_date,
             end_date,
-            int(is_related),
-        ),
-    )
-    conn.commit()
-    conn.close()
+            is_related,
+        )
+        analytics.apply_changes(conn, before, analytics.snapshot_students(conn, [student_id]))
+        conn.commit()
 
 
+@instrumented
+@routed
+@retry_on_busy
 def add_job(
     job_id,
     student_id,
@@ -206,18 +1368,13 @@ def add_job(
     end_date,
     job_sequence,
     source_internship_id,
+    program_id=None,
 ):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO jobs
-        (job_id, student_id, employer_id, title, job_level, job_type,
-         employment_status, city, state, country,
-         start_date, end_date, job_sequence, source_internship_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """,
-        (
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        before = analytics.snapshot_students(conn, [student_id])
+        _upsert_job(
+            conn.cursor(),
             job_id,
             student_id,
             employer_id,
@@ -232,36 +1389,187 @@ def add_job(
             end_date,
             job_sequence,
             source_internship_id,
-        ),
-    )
-    conn.commit()
-    conn.close()
+        )
+        analytics.apply_changes(conn, before, analytics.snapshot_students(conn, [student_id]))
+        conn.commit()
 
 
-def add_organization(org_id, org_name, org_type):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO organizations (org_id, org_name, org_type)
-        VALUES (?, ?, ?);
-        """,
-        (org_id, org_name, org_type),
-    )
-    conn.commit()
-    conn.close()
+@instrumented
+@routed
+@retry_on_busy
+def add_organization(org_id, org_name, org_type, program_id=None):
+    with get_conn() as conn:
+        _upsert(conn.cursor(), "organizations", "org_id", {
+            "org_id": org_id,
+            "org_name": org_name,
+            "org_type": org_type,
+        })
+        conn.commit()
+    invalidate_reference_cache("organizations")
 
 
-def add_student_org_link(student_org_id, student_id, org_id, role, start_date, end_date):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO student_organizations
-        (student_org_id, student_id, org_id, role, start_date, end_date)
-        VALUES (?, ?, ?, ?, ?, ?);
-        """,
-        (student_org_id, student_id, org_id, role, start_date, end_date),
+@instrumented
+@routed
+@retry_on_busy
+def add_student_org_link(
+    student_org_id, student_id, org_id, role, start_date, end_date, program_id=None
+):
+    with get_conn() as conn:
+        _upsert(conn.cursor(), "student_organizations", "student_org_id", {
+            "student_org_id": student_org_id,
+            "student_id": student_id,
+            "org_id": org_id,
+            "role": role,
+            "start_date": start_date,
+            "end_date": end_date,
+        })
+        conn.commit()
+
+
+# ---------- JOURNEY (ONE TRANSACTION) ----------
+
+def _write_journey(cur, student, internship=None, job=None):
+    """
+    Run every write (upsert) for one survey submission on `cur`. The caller owns
+    the transaction. Returns how many statements were executed.
+    """
+    statements = 0
+    conn = cur.connection
+    # What this student counted for in the dashboard before this submission.
+    before = analytics.snapshot_students(conn, [student["student_id"]])
+
+    # 1) Program
+    _upsert_program(
+        cur,
+        student["program_id"],
+        student["program_name"],
+        None,
+        "Eberhardt School of Business",
     )
-    conn.commit()
-    conn.close()
+    statements += 1
+
+    # 2) Student
+    _upsert_student(
+        cur,
+        student["student_id"],
+        student["program_id"],
+        student["first_name"],
+        student["last_name"],
+        student["email"],
+        student["entry_term"],
+        student["grad_term"],
+        student["status_value"],
+        student["citizenship"],
+        student["linkedin"],
+    )
+    statements += 1
+
+    # 3) Internship (optional). A blank employer detail means "not given",
+    # not "clear it": the employer row is shared by every student who
+    # worked there.
+    if internship:
+        _upsert_employer(
+            cur,
+            internship["employer_id"],
+            internship["employer_name"],
+            internship["industry"] or None,
+            internship["city"] or None,
+            internship["state"] or None,
+            internship["country"] or None,
+            internship["website"] or None,
+        )
+        _upsert_internship(
+            cur,
+            internship["internship_id"],
+            student["student_id"],
+            internship["employer_id"],
+            internship["title"],
+            internship["mode"],
+            internship["city"],
+            internship["state"],
+            internship["country"],
+            internship["start_date"],
+            internship["end_date"],
+            internship["is_related"],
+        )
+        statements += 2
+
+    # 4) Job (optional). The form describes the whole job, so one that did
+    # not come from an internship clears a source recorded earlier.
+    if job:
+        _upsert_employer(
+            cur,
+            job["employer_id"],
+            job["employer_name"],
+            job["industry"] or None,
+            job["city"] or None,
+            job["state"] or None,
+            job["country"] or None,
+            job["website"] or None,
+        )
+        _upsert_job(
+            cur,
+            job["job_id"],
+            student["student_id"],
+            job["employer_id"],
+            job["title"],
+            job["job_level"],
+            job["job_type"],
+            job["employment_status"],
+            job["city"],
+            job["state"],
+            job["country"],
+            job["start_date"],
+            job["end_date"],
+            job["sequence"],
+            job["source_internship_id"] or "",
+        )
+        statements += 2
+
+    # Keep the dashboard aggregates current (adds only this student's change).
+    analytics.apply_changes(conn, before, analytics.snapshot_students(conn, [student["student_id"]]))
+
+    return statements
+
+
+@instrumented
+@retry_on_busy
+def save_journey(student, internship=None, job=None):
+    """
+    Save a whole survey submission (program, student, optional internship
+    and job with their employers) in ONE transaction with a single commit.
+
+    `student`, `internship` and `job` are the dicts the Streamlit steps
+    build. If any insert fails, nothing is written.
+
+    Returns timing stats in milliseconds, e.g.
+    {"statements": 6, "write_ms": 1.2, "commit_ms": 3.4, "total_ms": 4.9}
+
+    The journey is written to the tenant that owns student["program_id"].
+    """
+    with tenants.use_tenant(tenants.tenant_for_program(student.get("program_id"))):
+        return _save_journey(student, internship, job)
+
+
+def _save_journey(student, internship, job):
+    started = time.perf_counter()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE;")
+            statements = _write_journey(cur, student, internship, job)
+            written = time.perf_counter()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finished = time.perf_counter()
+    # The submission may have added a program and employers.
+    invalidate_reference_cache("programs", "employers")
+
+    return {
+        "statements": statements,
+        "write_ms": round((written - started) * 1000, 3),
+        "commit_ms": round((finished - written) * 1000, 3),
+        "total_ms": round((finished - started) * 1000, 3),
+    }
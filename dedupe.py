@@ -0,0 +1,467 @@
+"""
+Find and merge duplicate employers and students.
+
+"Google", "Google LLC" and "google inc" end up as three employers because
+add_employer() only checks the ID. Comparing every pair of names is
+O(n²); instead candidates come from:
+
+    1. a normalized key (lowercase, no accents/punctuation, legal suffixes
+       such as LLC / Inc / Corp dropped): equal keys are duplicates;
+    2. MinHash LSH over character 3-grams of the keys: names that share a
+       band bucket are compared with their exact 3-gram Jaccard similarity.
+
+Both steps are a pass over the table plus a dict of buckets, so the work
+grows with the number of rows, not the number of pairs. Matches are
+clustered with union-find; in each cluster the record referenced most
+often is kept. Students are matched on email, or on name within a program.
+
+Merging rewrites internships/jobs (and student_organizations) in bulk,
+fills empty fields of the kept row from its duplicates, deletes the
+duplicates and refreshes the dashboard summaries, in one transaction.
+Merging is SQLite only; on Postgres it refuses before touching anything.
+
+    python dedupe.py employers                       # report clusters
+    python dedupe.py employers --plan merges.json    # write a merge plan to review
+    python dedupe.py employers --apply merges.json   # apply a (reviewed) plan
+    python dedupe.py students
+"""
+
+import argparse
+import json
+import hashlib
+import random
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+
+import analytics
+import backends
+import tenants
+from db import get_conn, invalidate_reference_cache, retry_on_busy
+
+# Words that don't tell two companies apart.
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "lp", "ltd", "limited", "corp",
+    "corporation", "co", "company", "plc", "gmbh", "ag", "sa", "bv", "pc", "the",
+}
+
+NGRAM = 3
+NUM_PERM = 48
+BANDS = 12  # 12 bands of 4 rows: pairs from about 0.55 Jaccard become candidates
+SIMILARITY = 0.6  # exact 3-gram Jaccard needed to call two names duplicates
+FULL_NAME_SIMILARITY = 0.4  # ... and what the whole names need on top
+# A word in at least this share of employer names (and at least
+# COMMON_MIN names) is too common to tell employers apart.
+COMMON_SHARE = 0.005
+COMMON_MIN = 10
+# Buckets bigger than this only hold names sharing very common 3-grams
+# ("ban", "ics"); comparing all their pairs would be quadratic again.
+MAX_BUCKET = 50
+
+# Foreign keys rewritten when a record is merged into another.
+REFERENCES = {
+    "employer": [("internships", "employer_id"), ("jobs", "employer_id")],
+    "student": [
+        ("internships", "student_id"),
+        ("jobs", "student_id"),
+        ("student_organizations", "student_id"),
+    ],
+}
+
+TABLES = {
+    "employer": ("employers", "employer_id"),
+    "student": ("students", "student_id"),
+}
+
+
+# ---------- NORMALIZING ----------
+
+def normalize_name(name, drop_suffixes=True):
+    """'Google, LLC.' -> 'google'; 'Café Rouge Inc' -> 'cafe rouge'."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = text.replace("&", " and ")
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    if not drop_suffixes:
+        return " ".join(words)
+    kept = [w for w in words if w not in LEGAL_SUFFIXES]
+    # A company called just "The Company" keeps its words.
+    return " ".join(kept or words)
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def ngrams(key, n=NGRAM):
+    padded = f" {key} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def common_words(keys):
+    counts = defaultdict(int)
+    for key in keys:
+        for word in set(key.split()):
+            counts[word] += 1
+    cutoff = max(COMMON_MIN, COMMON_SHARE * len(keys))
+    return {word for word, n in counts.items() if n >= cutoff}
+
+
+def numbers(key):
+    """'studio 54 nyc' -> {'54'}: names that differ in a number are different places."""
+    return {w for w in key.split() if not w.isalpha()}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# ---------- MINHASH LSH ----------
+
+class MinHashLSH:
+    """
+    Banded MinHash index: two sets land in the same bucket of some band
+    with a probability that rises steeply with their Jaccard similarity.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=1, max_bucket=MAX_BUCKET):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        rng = random.Random(seed)
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.max_bucket = max_bucket
+        # XOR with a random 64-bit mask permutes the (well mixed) gram hashes.
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        self._gram_hashes = {}
+        self._buckets = defaultdict(list)
+
+    def _hash(self, gram):
+        h = self._gram_hashes.get(gram)
+        if h is None:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            h = self._gram_hashes[gram] = int.from_bytes(digest, "little")
+        return h
+
+    def signature(self, grams):
+        hashes = [self._hash(g) for g in grams]
+        return [min(h ^ mask for h in hashes) for mask in self._masks]
+
+    def add(self, item, grams):
+        signature = self.signature(grams)
+        for band in range(self.bands):
+            start = band * self.rows
+            self._buckets[(band, tuple(signature[start:start + self.rows]))].append(item)
+
+    def candidate_pairs(self):
+        pairs = set()
+        for items in self._buckets.values():
+            if len(items) > self.max_bucket:
+                continue
+            for i in range(len(items)):
+                for j in range(i + 1, len(items)):
+                    pairs.add((items[i], items[j]) if items[i] < items[j] else (items[j], items[i]))
+        return pairs
+
+
+class UnionFind:
+    def __init__(self):
+        self._parent = {}
+
+    def find(self, x):
+        parent = self._parent
+        parent.setdefault(x, x)
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self._parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for x in self._parent:
+            groups[self.find(x)].append(x)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+# ---------- FINDING DUPLICATES ----------
+
+def _reference_counts(conn, kind):
+    counts = defaultdict(int)
+    for table, column in REFERENCES[kind]:
+        for key, n in conn.execute(
+            f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column};"
+        ):
+            counts[key] += n
+    return counts
+
+
+def _clusters(kind, members_by_id, uf, scores, refs):
+    """Turn union-find groups into [{"keep", "merge", "records", "score"}]."""
+    clusters = []
+    for ids in uf.groups():
+        # Keep the record most references point at; then the smallest ID.
+        ids.sort(key=lambda i: (-refs.get(i, 0), i))
+        clusters.append({
+            "kind": kind,
+            "keep": ids[0],
+            "merge": ids[1:],
+            "records": [members_by_id[i] for i in ids],
+            "score": round(min(scores.get(i, 1.0) for i in ids), 3),
+        })
+    clusters.sort(key=lambda c: (-len(c["merge"]), c["keep"]))
+    return clusters
+
+
+def find_employer_duplicates(conn, threshold=SIMILARITY):
+    """Clusters of employers that are probably the same company."""
+    employers = {}
+    by_key = defaultdict(list)
+    for employer_id, name in conn.execute("SELECT employer_id, employer_name FROM employers;"):
+        employers[employer_id] = {"id": employer_id, "name": name}
+        key = normalize_name(name)
+        if key:
+            by_key[key].append(employer_id)
+
+    uf = UnionFind()
+    scores = {}
+    # 1) Same normalized key.
+    for ids in by_key.values():
+        for other in ids[1:]:
+            uf.union(ids[0], other)
+
+    # 2) Similar keys: LSH over the distinct keys, verified with Jaccard.
+    # Words shared by many employers ("bank", "analytics") would make
+    # "Acme Analytics" look like "Apex Analytics", so the LSH compares the
+    # rest of the name, and the full names must still be fairly close.
+    keys = sorted(by_key)
+    common = common_words(keys)
+    lsh = MinHashLSH()
+    grams = {}
+    full_grams = {}
+    digits = {}
+    for index, key in enumerate(keys):
+        digits[index] = numbers(key)
+        full_grams[index] = ngrams(key)
+        distinctive = " ".join(w for w in key.split() if w not in common)
+        grams[index] = ngrams(distinctive) if distinctive else full_grams[index]
+        lsh.add(index, grams[index])
+    for a, b in lsh.candidate_pairs():
+        if digits[a] != digits[b]:
+            continue
+        score = jaccard(grams[a], grams[b])
+        if score < threshold or jaccard(full_grams[a], full_grams[b]) < FULL_NAME_SIMILARITY:
+            continue
+        first, second = by_key[keys[a]][0], by_key[keys[b]][0]
+        uf.union(first, second)
+        for employer_id in (first, second):
+            scores[employer_id] = min(scores.get(employer_id, 1.0), score)
+
+    return _clusters("employer", employers, uf, scores, _reference_counts(conn, "employer"))
+
+
+def find_student_duplicates(conn):
+    """Clusters of student rows with the same email, or the same name in one program."""
+    students = {}
+    uf = UnionFind()
+    first_by_key = {}
+    for student_id, first, last, email, program_id in conn.execute(
+        "SELECT student_id, first_name, last_name, email, program_id FROM students;"
+    ):
+        students[student_id] = {
+            "id": student_id,
+            "name": f"{first} {last}",
+            "email": email,
+            "program_id": program_id,
+        }
+        keys = [("name", program_id, normalize_name(f"{first} {last}", drop_suffixes=False))]
+        if normalize_email(email):
+            keys.append(("email", normalize_email(email)))
+        for key in keys:
+            if key in first_by_key:
+                uf.union(first_by_key[key], student_id)
+            else:
+                first_by_key[key] = student_id
+
+    return _clusters("student", students, uf, {}, _reference_counts(conn, "student"))
+
+
+def find_duplicates(kind, threshold=SIMILARITY):
+    with get_conn() as conn:
+        if kind == "employer":
+            return find_employer_duplicates(conn, threshold)
+        return find_student_duplicates(conn)
+
+
+# ---------- MERGING ----------
+
+def _affected_students(conn, kind):
+    """Students whose dashboard numbers a merge can change."""
+    if kind == "student":
+        return [row[0] for row in conn.execute(
+            """
+            SELECT old FROM temp.merge_map UNION SELECT new FROM temp.merge_map;
+            """
+        )]
+    students = set()
+    for table, column in REFERENCES[kind]:
+        students.update(row[0] for row in conn.execute(
+            f"""
+            SELECT DISTINCT student_id FROM {table}
+            WHERE {column} IN (SELECT old FROM temp.merge_map);
+            """
+        ))
+    return students
+
+
+@retry_on_busy
+def merge(kind, mapping):
+    """
+    Merge duplicates into the records they map to ({duplicate_id: keep_id})
+    in one transaction. Returns {"merged": n, "references": rows rewritten}.
+    SQLite only (PRAGMA table_info, a temp table); raises RuntimeError on Postgres.
+    """
+    if backends.get_backend().name != "sqlite":
+        raise RuntimeError(
+            "dedupe merges are SQLite only; "
+            f"ESB_DB_BACKEND is {backends.get_backend().name!r}."
+        )
+    table, key = TABLES[kind]
+    mapping = {old: new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return {"merged": 0, "references": 0}
+    if set(mapping) & set(mapping.values()):
+        raise ValueError("A record cannot be both merged away and kept.")
+
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS merge_map (old TEXT PRIMARY KEY, new TEXT NOT NULL);"
+        )
+        conn.execute("DELETE FROM temp.merge_map;")
+        conn.executemany("INSERT INTO temp.merge_map (old, new) VALUES (?, ?);", mapping.items())
+
+        missing = conn.execute(
+            f"""
+            SELECT COUNT(*) FROM temp.merge_map m
+            WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{key} = m.new);
+            """
+        ).fetchone()[0]
+        if missing:
+            raise ValueError(f"{missing} merge targets do not exist in {table}.")
+
+        students = _affected_students(conn, kind)
+        cohorts = analytics.cohorts_for_students(conn, students)
+
+        # Keep whatever the duplicates know that the kept row doesn't.
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table});") if row[1] != key]
+        for column in columns:
+            conn.execute(
+                f"""
+                UPDATE {table}
+                SET {column} = (
+                    SELECT d.{column} FROM {table} d
+                    JOIN temp.merge_map m ON m.old = d.{key}
+                    WHERE m.new = {table}.{key} AND d.{column} IS NOT NULL AND d.{column} != ''
+                    ORDER BY d.{key} LIMIT 1
+                )
+                WHERE {key} IN (SELECT new FROM temp.merge_map)
+                  AND ({column} IS NULL OR {column} = '')
+                  AND EXISTS (
+                    SELECT 1 FROM {table} d JOIN temp.merge_map m ON m.old = d.{key}
+                    WHERE m.new = {table}.{key} AND d.{column} IS NOT NULL AND d.{column} != ''
+                  );
+                """
+            )
+
+        rewritten = 0
+        for ref_table, column in REFERENCES[kind]:
+            cur = conn.execute(
+                f"""
+                UPDATE {ref_table}
+                SET {column} = (SELECT new FROM temp.merge_map WHERE old = {ref_table}.{column})
+                WHERE {column} IN (SELECT old FROM temp.merge_map);
+                """
+            )
+            rewritten += cur.rowcount
+
+        cur = conn.execute(f"DELETE FROM {table} WHERE {key} IN (SELECT old FROM temp.merge_map);")
+        merged = cur.rowcount
+        # Merged students leave their old cohort; employers leave the top lists.
+        analytics.refresh_cohorts(conn, cohorts | analytics.cohorts_for_students(conn, students))
+        conn.execute("DELETE FROM temp.merge_map;")
+        conn.commit()
+
+    invalidate_reference_cache()
+    return {"merged": merged, "references": rewritten}
+
+
+def plan_mapping(clusters):
+    """{duplicate_id: keep_id} for a list of clusters (e.g. a reviewed plan file)."""
+    return {old: cluster["keep"] for cluster in clusters for old in cluster["merge"]}
+
+
+# ---------- CLI ----------
+
+def _describe(record):
+    if "email" in record:
+        return f"{record['id']} {record['name']} <{record['email'] or ''}> [{record['program_id']}]"
+    return f"{record['id']} {record['name']!r}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and merge duplicate ESB records.")
+    parser.add_argument("kind", choices=["employers", "students"])
+    parser.add_argument("--threshold", type=float, default=SIMILARITY,
+                        help="3-gram Jaccard similarity for employer names (0-1)")
+    parser.add_argument("--plan", help="write the clusters to this JSON file for review")
+    parser.add_argument("--apply", help="merge the clusters in this (reviewed) JSON file")
+    parser.add_argument("--tenant", help="school to work on (see tenants.py); default: the default school")
+    args = parser.parse_args(argv)
+    try:
+        with tenants.use_tenant(args.tenant or tenants.current_tenant()):
+            return _run(args)
+    except RuntimeError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+
+
+def _run(args):
+    kind = args.kind[:-1]
+
+    if args.apply:
+        with open(args.apply, encoding="utf-8") as f:
+            clusters = json.load(f)
+        result = merge(kind, plan_mapping(c for c in clusters if c["kind"] == kind))
+        print(f"Merged {result['merged']} {args.kind}, rewrote {result['references']} references.")
+        return 0
+
+    clusters = find_duplicates(kind, args.threshold)
+    for cluster in clusters:
+        print(f"keep {_describe(cluster['records'][0])}  (similarity >= {cluster['score']})")
+        for record in cluster["records"][1:]:
+            print(f"    merge {_describe(record)}")
+    print(f"{len(clusters)} clusters, {sum(len(c['merge']) for c in clusters)} duplicates.")
+
+    if args.plan:
+        with open(args.plan, "w", encoding="utf-8") as f:
+            json.dump(clusters, f, indent=2)
+        print(f"Plan written to {args.plan}; edit it, then run with --apply {args.plan}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Full journey export for the institutional research (IR) office.
+
+One output row per journey event: every internship and every job of a
+student, joined with the student, program and employer. Students with
+neither get one row with record_type empty. Rows are streamed from a
+cursor in fixed-size batches (a server-side cursor on Postgres) and
+written out as they arrive, so memory use does not grow with the size of
+the database.
+
+Formats: CSV (built in), Parquet and Arrow IPC (need `pip install pyarrow`).
+
+With --since, only the students whose journey changed after that
+change_log position are exported (see changelog.py); the export prints
+the position to pass next time. A position whose changes have been
+pruned since exports everyone.
+
+With --snapshot, the export reads the latest analytics snapshot (see
+snapshot.py) instead of the live database, and --since positions refer to
+what that snapshot contains.
+
+    python export.py journeys_fall2025.csv
+    python export.py journeys_fall2025.parquet --batch-size 20000
+    python export.py changes.csv --since 18240
+    python export.py journeys.csv --snapshot
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+import backends
+import changelog
+import tenants
+from db import get_read_conn, use_snapshot
+
+BATCH_SIZE = 5000
+
+STUDENT_COLUMNS = """
+    s.student_id, s.first_name, s.last_name, s.email,
+    s.program_id, p.program_name, s.entry_term, s.grad_term, s.status,
+    s.citizenship_country, s.linkedin_url
+"""
+
+# Limits an export to the students listed in the export_students temp table.
+LISTED_STUDENTS = "s.student_id IN (SELECT student_id FROM export_students)"
+
+
+def journey_sql(student_filter=None):
+    """
+    The journey query. The same column list for all three parts of the
+    UNION, so every row has the same shape. `student_filter` is an extra
+    condition on s, added to each part so that it can use the indexes.
+    """
+    where = f"WHERE {student_filter}" if student_filter else ""
+    and_filter = f"AND {student_filter}" if student_filter else ""
+    return f"""
+    SELECT {STUDENT_COLUMNS},
+           'internship' AS record_type, i.internship_id AS record_id, i.title,
+           i.employer_id, e.employer_name, e.industry,
+           i.mode, NULL AS job_level, NULL AS job_type, NULL AS employment_status,
+           i.city, i.state, i.country, i.start_date, i.end_date,
+           i.is_related_to_program, NULL AS job_sequence, NULL AS source_internship_id
+    FROM internships i
+    JOIN students s ON s.student_id = i.student_id
+    LEFT JOIN programs p ON p.program_id = s.program_id
+    LEFT JOIN employers e ON e.employer_id = i.employer_id
+    {where}
+
+    UNION ALL
+
+    SELECT {STUDENT_COLUMNS},
+           'job', j.job_id, j.title,
+           j.employer_id, e.employer_name, e.industry,
+           NULL, j.job_level, j.job_type, j.employment_status,
+           j.city, j.state, j.country, j.start_date, j.end_date,
+           NULL, j.job_sequence, j.source_internship_id
+    FROM jobs j
+    JOIN students s ON s.student_id = j.student_id
+    LEFT JOIN programs p ON p.program_id = s.program_id
+    LEFT JOIN employers e ON e.employer_id = j.employer_id
+    {where}
+
+    UNION ALL
+
+    SELECT {STUDENT_COLUMNS},
+           NULL, NULL, NULL,
+           NULL, NULL, NULL,
+           NULL, NULL, NULL, NULL,
+           NULL, NULL, NULL, NULL, NULL,
+           NULL, NULL, NULL
+    FROM students s
+    LEFT JOIN programs p ON p.program_id = s.program_id
+    WHERE NOT EXISTS (SELECT 1 FROM internships i WHERE i.student_id = s.student_id)
+      AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.student_id = s.student_id)
+      {and_filter};
+"""
+
+
+JOURNEY_SQL = journey_sql()
+
+COLUMNS = [
+    "student_id", "first_name", "last_name", "email",
+    "program_id", "program_name", "entry_term", "grad_term", "status",
+    "citizenship_country", "linkedin_url",
+    "record_type", "record_id", "title",
+    "employer_id", "employer_name", "industry",
+    "mode", "job_level", "job_type", "employment_status",
+    "city", "state", "country", "start_date", "end_date",
+    "is_related_to_program", "job_sequence", "source_internship_id",
+]
+
+INT_COLUMNS = {"is_related_to_program", "job_sequence"}
+
+
+def iter_journey_batches(batch_size=BATCH_SIZE, student_ids=None):
+    """
+    Yield lists of up to `batch_size` journey rows (plain tuples), for
+    every student or only for `student_ids`.
+    """
+    with get_read_conn() as conn:
+        sql = JOURNEY_SQL
+        if student_ids is not None:
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS export_students (student_id TEXT PRIMARY KEY);"
+            )
+            conn.execute("DELETE FROM export_students;")
+            conn.executemany(
+                "INSERT INTO export_students (student_id) VALUES (?);",
+                [(student_id,) for student_id in student_ids],
+            )
+            conn.commit()
+            sql = journey_sql(LISTED_STUDENTS)
+        # Plain tuples: no need for sqlite3.Row objects per row here.
+        yield from backends.get_backend().stream(conn, sql, (), batch_size)
+
+
+# ---------- WRITERS ----------
+
+class CSVWriter:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, batch):
+        self._writer.writerows(batch)
+
+    def close(self):
+        self._file.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError(
+            "Parquet/Arrow export needs pyarrow. Install it with: pip install pyarrow"
+        )
+    return pyarrow
+
+
+class _ArrowWriterBase:
+    """Turns each batch of row tuples into an Arrow record batch."""
+
+    def __init__(self):
+        pa = self._pa = _import_pyarrow()
+        self.schema = pa.schema(
+            [(name, pa.int64() if name in INT_COLUMNS else pa.string()) for name in COLUMNS]
+        )
+
+    def _record_batch(self, batch):
+        columns = list(zip(*batch))
+        arrays = [
+            self._pa.array(values, type=field.type)
+            for values, field in zip(columns, self.schema)
+        ]
+        return self._pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class ParquetWriter(_ArrowWriterBase):
+    def __init__(self, path):
+        super().__init__()
+        import pyarrow.parquet as pq
+
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, batch):
+        # One row group per batch.
+        self._writer.write_batch(self._record_batch(batch))
+
+    def close(self):
+        self._writer.close()
+
+
+class ArrowWriter(_ArrowWriterBase):
+    def __init__(self, path):
+        super().__init__()
+        self._sink = self._pa.OSFile(str(path), "wb")
+        self._writer = self._pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, batch):
+        self._writer.write_batch(self._record_batch(batch))
+
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+
+
+WRITERS = {
+    "csv": CSVWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowWriter,
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+
+def export_journeys(path, fmt=None, batch_size=BATCH_SIZE, out=sys.stdout, since=None):
+    """
+    Stream all journey rows into `path`, or with `since` (a change_log
+    position) only those of students that changed after it. The format
+    comes from `fmt` or the file extension. Returns {"rows", "seconds",
+    "rows_per_sec", "path", "format", "last_change_id"}.
+    """
+    path = Path(path)
+    fmt = fmt or EXTENSIONS.get(path.suffix.lower())
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format for {path.name}; use one of {sorted(WRITERS)}.")
+
+    student_ids = None
+    with get_read_conn() as conn:
+        last_change_id = changelog.last_change_id(conn)
+        if since is not None and not changelog.covers(conn, since):
+            print(f"Changes since {since} have been pruned; exporting every student.", file=out)
+        elif since is not None:
+            student_ids, complete = changelog.affected_students(conn, since)
+            print(f"{len(student_ids):,} students changed since {since}.", file=out)
+            if not complete:
+                print("Some changes were deletes; their students are not in this export.", file=out)
+
+    writer = WRITERS[fmt](path)
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for batch in iter_journey_batches(batch_size, student_ids):
+            writer.write(batch)
+            rows += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"{rows:,} rows written ({rows / elapsed:,.0f} rows/sec)", file=out)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "path": str(path),
+        "format": fmt,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "last_change_id": last_change_id,
+    }
+    print(
+        f"Exported {rows:,} journey rows to {path} in {elapsed:.2f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec)",
+        file=out,
+    )
+    print(f"Next incremental export: --since {last_change_id}", file=out)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export full ESB student journeys for IR.")
+    parser.add_argument("output", help="output file (.csv, .parquet, .arrow)")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="override the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--since", type=int,
+                        help="only students changed after this change_log position")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="read the analytics snapshot instead of the live database")
+    parser.add_argument("--tenant", help="school to work on (see tenants.py); default: the default school")
+    args = parser.parse_args(argv)
+
+    try:
+        with tenants.use_tenant(args.tenant or tenants.current_tenant()), \
+                use_snapshot(args.snapshot):
+            export_journeys(args.output, args.format, args.batch_size, since=args.since)
+    except (RuntimeError, ValueError, KeyError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Bulk importer for historical alumni records (registrar / career-services
+exports).
+
+Files are streamed row by row through a small generator pipeline:
+
+    read_rows -> clean_rows -> validate_rows -> batched -> load_batch
+
+Each batch is written with one bulk load inside its own transaction
+(executemany on SQLite, COPY on Postgres; see backends.py), so memory
+stays flat no matter how large the file is. Rows that fail the same
+validation rules the Streamlit steps use (see validation.py: formats, date
+order, choices, and IDs that must already exist), or that the database
+rejects (duplicate IDs), are written to a JSONL reject file instead of
+stopping the import.
+
+Usage:
+    python importer.py --students students.csv --employers employers.csv \
+        --internships internships.jsonl --jobs jobs.csv --rejects rejects.jsonl
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+import analytics
+import backends
+import changelog
+import tenants
+from db import get_conn, invalidate_reference_cache
+from validation import KnownIds, validator
+
+BATCH_SIZE = 1000
+
+# Columns we read for each kind, in table order. Extra columns in the file
+# are ignored; missing ones are loaded as NULL.
+COLUMNS = {
+    "student": [
+        "student_id", "program_id", "first_name", "last_name", "email",
+        "entry_term", "grad_term", "status", "citizenship_country", "linkedin_url",
+    ],
+    "employer": [
+        "employer_id", "employer_name", "industry", "city", "state", "country", "website",
+    ],
+    "internship": [
+        "internship_id", "student_id", "employer_id", "title", "mode",
+        "city", "state", "country", "start_date", "end_date", "is_related_to_program",
+    ],
+    "job": [
+        "job_id", "student_id", "employer_id", "title", "job_level", "job_type",
+        "employment_status", "city", "state", "country",
+        "start_date", "end_date", "job_sequence", "source_internship_id",
+    ],
+}
+
+TABLES = {
+    "student": "students",
+    "employer": "employers",
+    "internship": "internships",
+    "job": "jobs",
+}
+
+# Load order, so foreign keys already exist when a row refers to them.
+LOAD_ORDER = ["employer", "student", "internship", "job"]
+
+
+def _insert_sql(kind):
+    cols = COLUMNS[kind]
+    return (
+        f"INSERT INTO {TABLES[kind]} ({', '.join(cols)}) "
+        f"VALUES ({', '.join(':' + c for c in cols)});"
+    )
+
+
+# Parent rows a file may carry along (e.g. program_name in a student
+# export). They are inserted OR IGNORE, just like the Streamlit submit does.
+PARENT_SQL = {
+    "student": (
+        "program_name",
+        "INSERT OR IGNORE INTO programs (program_id, program_name, level, department) "
+        "VALUES (:program_id, :program_name, NULL, 'Eberhardt School of Business');",
+    ),
+    "internship": (
+        "employer_name",
+        "INSERT OR IGNORE INTO employers (employer_id, employer_name) "
+        "VALUES (:employer_id, :employer_name);",
+    ),
+    "job": (
+        "employer_name",
+        "INSERT OR IGNORE INTO employers (employer_id, employer_name) "
+        "VALUES (:employer_id, :employer_name);",
+    ),
+}
+
+
+# ---------- PIPELINE STAGES ----------
+
+def read_rows(path):
+    """Yield (line_number, dict) from a .csv or .jsonl file."""
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            # Line 1 is the header.
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+
+
+def clean_rows(rows):
+    """Strip text values and turn empty strings into NULL."""
+    for line_no, row in rows:
+        cleaned = {}
+        for key, value in row.items():
+            if key is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip() or None
+            cleaned[key.strip()] = value
+        yield line_no, cleaned
+
+
+def validate_rows(kind, rows, rejects, known=None):
+    """
+    Yield only rows that pass validation; send the rest to `rejects`.
+    References are checked against `known` (a validation.KnownIds).
+    """
+    check = validator(kind)
+    known = known if known is not None else KnownIds()
+    for line_no, row in rows:
+        errors = check(row, known)
+        if errors:
+            rejects.write(kind, line_no, errors, row)
+        else:
+            yield line_no, row
+
+
+def batched(rows, size):
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------- LOADING ----------
+
+class RejectWriter:
+    """Append rejected rows to a JSONL file (or just count them)."""
+
+    def __init__(self, path=None):
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8") if path else None
+
+    def write(self, kind, line_no, errors, row):
+        self.count += 1
+        if self._file:
+            record = {"kind": kind, "line": line_no, "errors": errors, "row": row}
+            self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def _params(kind, row):
+    params = {c: row.get(c) for c in COLUMNS[kind]}
+    parent = PARENT_SQL.get(kind)
+    if parent:
+        params[parent[0]] = row.get(parent[0])
+    return params
+
+
+def load_batch(conn, kind, batch, rejects):
+    """
+    Insert one batch in a single transaction. Returns rows inserted.
+
+    The fast path is one bulk load (backend.copy_rows). If the database
+    refuses any row, the batch is retried row by row (each under a
+    savepoint) so only the bad rows are rejected.
+    """
+    backend = backends.get_backend()
+    sql = _insert_sql(kind)
+    parent = PARENT_SQL.get(kind)
+    params = [_params(kind, row) for _, row in batch]
+    cur = conn.cursor()
+
+    try:
+        cur.execute("BEGIN;")
+        if parent:
+            cur.executemany(parent[1], [p for p in params if p.get(parent[0])])
+        columns = COLUMNS[kind]
+        backend.copy_rows(conn, TABLES[kind], columns, [[p[c] for c in columns] for p in params])
+        conn.commit()
+        return len(batch)
+    except backend.IntegrityError:
+        conn.rollback()
+
+    inserted = 0
+    cur.execute("BEGIN;")
+    for (line_no, row), p in zip(batch, params):
+        cur.execute("SAVEPOINT import_row;")
+        try:
+            if parent and p.get(parent[0]):
+                cur.execute(parent[1], p)
+            cur.execute(sql, p)
+            cur.execute("RELEASE import_row;")
+            inserted += 1
+        except backend.IntegrityError as e:
+            cur.execute("ROLLBACK TO import_row;")
+            cur.execute("RELEASE import_row;")
+            rejects.write(kind, line_no, [str(e)], row)
+    conn.commit()
+    return inserted
+
+
+def import_file(kind, path, rejects, batch_size=BATCH_SIZE, out=sys.stdout, known=None):
+    """Stream one file into the database. Returns rows inserted."""
+    rows = validate_rows(kind, clean_rows(read_rows(path)), rejects, known)
+    total = 0
+    started = time.perf_counter()
+
+    with get_conn() as conn:
+        for number, batch in enumerate(batched(rows, batch_size), start=1):
+            batch_started = time.perf_counter()
+            inserted = load_batch(conn, kind, batch, rejects)
+            elapsed = time.perf_counter() - batch_started
+            total += inserted
+            rate = inserted / elapsed if elapsed else 0.0
+            print(
+                f"[{kind}] batch {number}: {inserted}/{len(batch)} rows "
+                f"({rate:,.0f} rows/sec), {total} loaded so far",
+                file=out,
+            )
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0.0
+    print(f"[{kind}] done: {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=out)
+    return total
+
+
+def run_import(files, reject_path=None, batch_size=BATCH_SIZE, out=sys.stdout):
+    """
+    Import several files. `files` maps kind ("student", "employer",
+    "internship", "job") to a path. Returns {kind: rows_inserted, "rejected": n}.
+    """
+    rejects = RejectWriter(reject_path)
+    # ID sets are read when first needed, i.e. after the files they
+    # depend on (LOAD_ORDER) have been loaded.
+    known = KnownIds()
+    summary = {}
+    with get_conn() as conn:
+        since = changelog.last_change_id(conn)
+    try:
+        for kind in LOAD_ORDER:
+            if files.get(kind):
+                summary[kind] = import_file(kind, files[kind], rejects, batch_size, out, known)
+    finally:
+        rejects.close()
+        # New programs/employers should show up in the app right away.
+        invalidate_reference_cache()
+
+    # Refresh the dashboard aggregates once here rather than per batch,
+    # and only for the cohorts the change log says this import touched.
+    if any(summary.get(kind) for kind in ("student", "internship", "job")):
+        with get_conn() as conn:
+            cohorts = analytics.refresh_changed(conn, since)
+            conn.commit()
+        which = "all cohorts" if cohorts is None else f"{cohorts} cohorts"
+        print(f"Dashboard summaries refreshed ({which}).", file=out)
+    summary["rejected"] = rejects.count
+    if rejects.count:
+        where = f" (see {reject_path})" if reject_path else ""
+        print(f"{rejects.count} rows rejected{where}", file=out)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import historical ESB alumni records.")
+    parser.add_argument("--students", help="CSV/JSONL of students (program_name adds new programs)")
+    parser.add_argument("--employers", help="CSV/JSONL of employers")
+    parser.add_argument("--internships", help="CSV/JSONL of internships")
+    parser.add_argument("--jobs", help="CSV/JSONL of jobs")
+    parser.add_argument("--rejects", default="rejects.jsonl", help="where to write bad rows")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--tenant", help="school to work on (see tenants.py); default: the default school")
+    args = parser.parse_args(argv)
+
+    files = {
+        "student": args.students,
+        "employer": args.employers,
+        "internship": args.internships,
+        "job": args.jobs,
+    }
+    if not any(files.values()):
+        parser.error("give at least one of --students/--employers/--internships/--jobs")
+
+    with tenants.use_tenant(args.tenant or tenants.current_tenant()):
+        summary = run_import(files, args.rejects, args.batch_size)
+    return 1 if summary["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Locks between processes, on lock files next to the data they protect.
+
+Several Streamlit processes share each tenant's files, so work that only
+one of them may do at a time (taking a snapshot, owning a writer spool)
+takes an OS lock first:
+
+    with FileLock(path.with_name(path.name + ".lock")):
+        ...                                  # waits for other processes
+
+    lock = FileLock(spool_lock)
+    if not lock.acquire(blocking=False):    # someone else has it
+        ...
+
+The OS drops the lock when the process exits, even on a crash, so a lock
+file left on disk never blocks anyone.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """An exclusive lock on `path` held by this process (also across threads)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = None
+        # flock() locks are per open file, so threads of one process would
+        # not exclude each other without this.
+        self._thread_lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def acquire(self, blocking=True):
+        """Take the lock. Returns False if blocking=False and another holder has it."""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            self._thread_lock.release()
+            if blocking:
+                raise
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
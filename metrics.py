@@ -0,0 +1,320 @@
+"""
+In-process metrics for the database layer: counters, histograms, a slow
+query log and an optional Prometheus text endpoint.
+
+db.py records into the module-level REGISTRY:
+
+    esb_db_connect_seconds        opening a connection (pragmas + schema check)
+    esb_db_pool_wait_seconds      waiting for a free pooled connection
+    esb_db_statement_seconds      each execute/executemany, by statement kind
+                                  (for SELECTs: time to the first row)
+    esb_db_rows_affected_total    rows written, by statement kind
+    esb_db_lock_wait_seconds      waiting for the write lock (BEGIN IMMEDIATE, busy retries)
+    esb_db_busy_retries_total     retries after SQLITE_BUSY
+    esb_db_commit_seconds         commit() latency (the fsync)
+    esb_db_helper_seconds         each public db.py helper, end to end
+    esb_db_helper_errors_total    helpers that raised
+    esb_writer_batch_size         journeys per background-writer group commit
+    esb_writer_delay_seconds      submit() to commit, for background writes
+    esb_snapshot_seconds          copying the live database into its snapshot
+    esb_snapshot_lag_seconds      age of the analytics snapshot, by tenant
+    esb_snapshot_lag_changes      change_log rows the snapshot is behind, by tenant
+
+    python -c "import metrics; print(metrics.render_prometheus())"
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Statements slower than this are logged and kept in slow_queries().
+SLOW_QUERY_MS = float(os.environ.get("ESB_SLOW_QUERY_MS", "100"))
+
+# Latency buckets in seconds (upper bounds), from 50 µs to 10 s.
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+slow_log = logging.getLogger("esb.db.slow")
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}.")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, like Prometheus' own."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{labels: {"count", "sum", "buckets": [(upper_bound, cumulative), ...]}}"""
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        result = {}
+        for key, values in series.items():
+            cumulative = 0
+            buckets = []
+            for bound, n in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += n
+                buckets.append((bound, cumulative))
+            result[key] = {"count": cumulative, "sum": values[-1], "buckets": buckets}
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.snapshot().items()):
+            for bound, cumulative in data["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, ("le", le))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {data['sum']}")
+            lines.append(f"{self.name}_count{labels} {data['count']}")
+        return lines
+
+
+class Gauge:
+    """A value that goes up and down (last one set wins)."""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def render_prometheus(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+connect_seconds = REGISTRY.histogram(
+    "esb_db_connect_seconds", "Time to open a connection incl. pragmas and schema check."
+)
+pool_wait_seconds = REGISTRY.histogram(
+    "esb_db_pool_wait_seconds", "Time spent waiting to borrow a pooled connection."
+)
+statement_seconds = REGISTRY.histogram(
+    "esb_db_statement_seconds", "Statement execution time.", ("kind",)
+)
+rows_affected = REGISTRY.counter(
+    "esb_db_rows_affected_total", "Rows inserted/updated/deleted.", ("kind",)
+)
+lock_wait_seconds = REGISTRY.histogram(
+    "esb_db_lock_wait_seconds", "Time spent waiting for the database write lock."
+)
+busy_retries = REGISTRY.counter(
+    "esb_db_busy_retries_total", "Helper retries after SQLITE_BUSY/LOCKED.", ("helper",)
+)
+commit_seconds = REGISTRY.histogram("esb_db_commit_seconds", "commit() latency.")
+helper_seconds = REGISTRY.histogram(
+    "esb_db_helper_seconds", "End-to-end latency of db.py helpers.", ("helper",)
+)
+helper_errors = REGISTRY.counter(
+    "esb_db_helper_errors_total", "db.py helper calls that raised.", ("helper",)
+)
+writer_batch_size = REGISTRY.histogram(
+    "esb_writer_batch_size", "Journeys per background-writer commit.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+writer_delay_seconds = REGISTRY.histogram(
+    "esb_writer_delay_seconds", "Time from submit() to the commit that saved the journey."
+)
+snapshot_seconds = REGISTRY.histogram(
+    "esb_snapshot_seconds", "Time to copy the live database into the analytics snapshot."
+)
+snapshot_lag_seconds = REGISTRY.gauge(
+    "esb_snapshot_lag_seconds", "Age of the analytics snapshot.", ("tenant",)
+)
+snapshot_lag_changes = REGISTRY.gauge(
+    "esb_snapshot_lag_changes", "change_log rows written since the snapshot was taken.",
+    ("tenant",),
+)
+
+
+# ---------- SLOW QUERY LOG ----------
+
+_slow_queries = deque(maxlen=200)
+
+
+def record_statement(sql, seconds, rowcount):
+    """Called by the instrumented cursor for every execute/executemany."""
+    words = sql.split(None, 1)
+    kind = words[0].lower().rstrip(";") if words else "other"
+    if kind not in ("select", "insert", "update", "delete", "begin", "pragma"):
+        kind = "other"
+    statement_seconds.observe(seconds, kind=kind)
+    if kind == "begin" and "IMMEDIATE" in sql.upper():
+        # BEGIN IMMEDIATE returns once we hold the write lock, so its time
+        # is the time spent queued behind other writers.
+        lock_wait_seconds.observe(seconds)
+    if kind in ("insert", "update", "delete") and rowcount and rowcount > 0:
+        rows_affected.inc(rowcount, kind=kind)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        text = " ".join(sql.split())
+        # SQL only, never the parameters: they hold student data.
+        entry = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ms": round(seconds * 1000, 3),
+            "rows": rowcount,
+            "sql": text[:500],
+        }
+        _slow_queries.append(entry)
+        slow_log.warning("slow query (%.1f ms): %s", entry["ms"], entry["sql"])
+
+
+def slow_queries():
+    """Most recent slow statements, newest last."""
+    return list(_slow_queries)
+
+
+def render_prometheus():
+    return REGISTRY.render_prometheus()
+
+
+# ---------- PROMETHEUS ENDPOINT ----------
+
+_server = None
+
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """
+    Serve /metrics in Prometheus text format from a daemon thread.
+    Calling it again returns the server that is already running.
+    """
+    global _server
+    if _server is not None:
+        return _server
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name="esb-metrics", daemon=True).start()
+    return _server
@@ -0,0 +1,181 @@
+"""
+Typed records returned by the db.py read helpers.
+
+Plain dataclasses with __slots__: a fixed set of attributes, no per-object
+__dict__, so they are small and a typo in a field name fails loudly.
+Field order matches the column order of the table, so a row tuple can be
+turned into a record with Model(*row).
+
+row_factory(Model) builds records straight from a cursor; a helper that
+selects only some columns gets None in the other fields.
+"""
+
+from dataclasses import dataclass, field, fields
+from operator import itemgetter
+
+
+@dataclass(slots=True)
+class Program:
+    program_id: str
+    program_name: str
+    level: str | None = None
+    department: str | None = None
+
+
+@dataclass(slots=True)
+class Student:
+    student_id: str
+    program_id: str
+    first_name: str
+    last_name: str
+    email: str | None = None
+    entry_term: str | None = None
+    grad_term: str | None = None
+    status: str | None = None
+    citizenship_country: str | None = None
+    linkedin_url: str | None = None
+
+
+@dataclass(slots=True)
+class Employer:
+    employer_id: str
+    employer_name: str | None = None
+    industry: str | None = None
+    city: str | None = None
+    state: str | None = None
+    country: str | None = None
+    website: str | None = None
+
+
+@dataclass(slots=True)
+class Internship:
+    internship_id: str
+    student_id: str
+    employer_id: str
+    title: str
+    mode: str | None = None
+    city: str | None = None
+    state: str | None = None
+    country: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    is_related_to_program: int | None = None
+
+
+@dataclass(slots=True)
+class Job:
+    job_id: str
+    student_id: str
+    employer_id: str
+    title: str
+    job_level: str | None = None
+    job_type: str | None = None
+    employment_status: str | None = None
+    city: str | None = None
+    state: str | None = None
+    country: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+    job_sequence: int | None = None
+    source_internship_id: str | None = None
+
+
+@dataclass(slots=True)
+class Organization:
+    org_id: str
+    org_name: str
+    org_type: str | None = None
+
+
+@dataclass(slots=True)
+class Membership:
+    """A student's role in an organization (student_organizations + organizations)."""
+
+    student_org_id: str
+    org_id: str
+    org_name: str
+    org_type: str | None = None
+    role: str | None = None
+    start_date: str | None = None
+    end_date: str | None = None
+
+
+@dataclass(slots=True)
+class Journey:
+    """Everything we know about one student, in timeline order."""
+
+    student: Student
+    program: Program | None = None
+    internships: list = field(default_factory=list)
+    jobs: list = field(default_factory=list)
+    organizations: list = field(default_factory=list)
+    # employer_id -> Employer, for every employer of the internships and jobs.
+    employers: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class PlacementSummary:
+    """One (program_id, grad_term) cohort row of get_placement_summary()."""
+
+    program_id: str
+    grad_term: str | None
+    students: int
+    alumni: int
+    with_internship: int
+    placed: int
+    from_internship: int
+    placement_rate: float
+    conversion_rate: float | None = None
+    # Set by get_placement_summary_all().
+    tenant: str | None = None
+
+
+@dataclass(slots=True)
+class TopEmployer:
+    employer_id: str
+    employer_name: str | None
+    hires: int
+    interns: int
+
+
+# ---------- ROW FACTORY ----------
+
+_field_names = {}
+
+
+def _builder(cls, columns):
+    names = _field_names.get(cls)
+    if names is None:
+        names = _field_names[cls] = tuple(f.name for f in fields(cls))
+    if tuple(columns) == names:
+        return lambda row: cls(*row)
+
+    unknown = set(columns) - set(names)
+    if unknown:
+        raise ValueError(f"{cls.__name__} has no field(s) {sorted(unknown)}.")
+    # Position of each field in the row; missing fields read the None
+    # appended after the last column.
+    missing = len(columns)
+    getter = itemgetter(*[columns.index(n) if n in columns else missing for n in names])
+    return lambda row: cls(*getter(row + (None,)))
+
+
+def row_factory(cls):
+    """
+    A sqlite3 row_factory that returns `cls` records. The columns are
+    matched to fields once per query (cursor.description stays the same
+    object while the query's rows are read), not once per row. Use a new
+    one per cursor:
+
+        cur.row_factory = row_factory(Student)
+    """
+    last = [None, None]  # description, builder
+
+    def factory(cursor, row):
+        description = cursor.description
+        if description is not last[0]:
+            last[0] = description
+            last[1] = _builder(cls, [d[0] for d in description])
+        return last[1](row)
+
+    return factory
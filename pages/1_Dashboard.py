@@ -0,0 +1,140 @@
+import time
+
+import snapshot
+import streamlit as st
+import tenants
+from db import (
+    get_placement_summary,
+    get_placement_summary_all,
+    get_top_employers,
+    get_top_employers_all,
+    use_snapshot,
+)
+
+# ---------- PAGE SETUP ----------
+st.set_page_config(page_title="ESB Placement Dashboard", layout="wide")
+
+st.title("📊 ESB Placement Dashboard")
+st.caption(
+    "Placement and internship-to-job conversion by program and graduating term. "
+    "Numbers come from precomputed summaries, read from a snapshot of the database "
+    "that is refreshed every minute or so, so the dashboard never holds up the survey."
+)
+
+
+@st.cache_resource
+def snapshot_refresher():
+    # One refresher thread per server process, shared by every session.
+    return snapshot.start_refresher()
+
+
+snapshot_refresher()
+
+# ---------- SCHOOL ----------
+ALL_SCHOOLS = "All schools"
+school = tenants.current_tenant()
+if len(tenants.names()) > 1:
+    school = st.selectbox("School", [ALL_SCHOOLS] + tenants.names())
+
+with use_snapshot():
+    if school == ALL_SCHOOLS:
+        summary = get_placement_summary_all()
+    else:
+        with tenants.use_tenant(school):
+            summary = get_placement_summary()
+
+# ---------- SNAPSHOT LAG ----------
+lags = [snapshot.lag(name) for name in tenants.names()] if school == ALL_SCHOOLS \
+    else [snapshot.lag(school)]
+lags = [lag for lag in lags if lag is not None]
+if lags:
+    oldest = min(lag["taken_at"] for lag in lags)
+    behind = sum(lag["changes"] for lag in lags)
+    st.caption(
+        f"Data as of {time.strftime('%H:%M:%S', time.localtime(oldest))} "
+        f"({behind:,} newer changes not shown yet)."
+    )
+
+if not summary:
+    st.info("No student journeys saved yet. Submit the survey first, then come back here.")
+    st.stop()
+
+# ---------- FILTERS ----------
+def program_label(row):
+    # The same program can run at two schools: name the school in "All schools".
+    return f"{row.tenant} · {row.program_id}" if row.tenant else row.program_id
+
+
+programs = sorted({program_label(row) for row in summary})
+terms = sorted({row.grad_term for row in summary}, key=lambda t: t or "")
+
+fc1, fc2 = st.columns(2)
+with fc1:
+    program_filter = st.multiselect("Programs", programs, default=programs)
+with fc2:
+    term = st.selectbox(
+        "Graduating term (top employers)",
+        terms,
+        format_func=lambda t: t or "(no term given)",
+    )
+
+rows = [row for row in summary if program_label(row) in program_filter]
+
+# ---------- HEADLINE NUMBERS ----------
+students = sum(row.students for row in rows)
+placed = sum(row.placed for row in rows)
+interns = sum(row.with_internship for row in rows)
+converted = sum(row.from_internship for row in rows)
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Students", students)
+m2.metric("Placement rate", f"{placed / students:.0%}" if students else "–")
+m3.metric("Did an internship", interns)
+m4.metric("Internship → job", f"{converted / interns:.0%}" if interns else "–")
+
+# ---------- BY PROGRAM & TERM ----------
+st.subheader("Placement rate by program and term")
+chart = {
+    "cohort": [f"{program_label(row)} · {row.grad_term or '–'}" for row in rows],
+    "placement rate": [row.placement_rate for row in rows],
+    "internship conversion": [row.conversion_rate or 0 for row in rows],
+}
+st.bar_chart(chart, x="cohort", y=["placement rate", "internship conversion"])
+
+st.dataframe(
+    [
+        {
+            "Program": program_label(row),
+            "Grad term": row.grad_term,
+            "Students": row.students,
+            "Alumni": row.alumni,
+            "With internship": row.with_internship,
+            "Placed": row.placed,
+            "Job from internship": row.from_internship,
+            "Placement rate": row.placement_rate,
+            "Conversion rate": row.conversion_rate,
+        }
+        for row in rows
+    ],
+    width="stretch",
+)
+
+# ---------- TOP EMPLOYERS ----------
+st.subheader(f"Top employers · {term or '(no term given)'}")
+with use_snapshot():
+    if school == ALL_SCHOOLS:
+        top = get_top_employers_all(term, limit=10)
+    else:
+        with tenants.use_tenant(school):
+            top = get_top_employers(term, limit=10)
+if top:
+    st.bar_chart(
+        {
+            "employer": [row.employer_name or row.employer_id for row in top],
+            "hires": [row.hires for row in top],
+        },
+        x="employer",
+        y="hires",
+    )
+else:
+    st.write("No hires recorded for this term yet.")
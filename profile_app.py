@@ -0,0 +1,143 @@
+"""
+Server CPU per survey session, for comparing versions of app.py.
+
+Plays one complete session (student + internship + job) through
+Streamlit's AppTest harness, the way a user fills the form: one edit per
+field. Edits to widgets outside an st.form trigger a rerun straight away;
+edits inside a form cost nothing until the form is submitted. The CPU time
+(time.process_time) of all reruns is added up.
+
+    python profile_app.py                       # the current app.py
+    git show HEAD~1:app.py > /tmp/app_before.py
+    python profile_app.py /tmp/app_before.py    # an older version
+
+Runs against a throw-away database unless ESB_DB_PATH is set.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DATES = {"Start Date": "2024-06-01", "End Date": "2024-08-31"}
+TERMS = {"Entry Term": "Fall 2024", "Graduation Term": "Spring 2026"}
+
+
+def field_value(label, session):
+    """A value that passes validation for the input with this label."""
+    for prefix, value in (DATES | TERMS).items():
+        if prefix in label:
+            return value
+    if "LinkedIn" in label:
+        return f"https://www.linkedin.com/in/student{session}"
+    if "Website" in label:
+        return "https://example.com"
+    if "Email" in label:
+        return f"student{session}@u.pacific.edu"
+    if "Job ID" in label:
+        return f"JOB-P{session}"
+    if "Internship ID" in label:
+        return f"INT-P{session}"
+    if "Student ID" in label:
+        return f"STU-P{session}"
+    if "Employer ID" in label:
+        return "EMP-P1"
+    return "Test"
+
+
+class Session:
+    def __init__(self, app_path, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.reruns = 0
+        self.cpu = 0.0
+
+    def run(self, action=None):
+        started = time.process_time()
+        (action or self.at).run()
+        self.cpu += time.process_time() - started
+        self.reruns += 1
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def fill(self, session):
+        """Type into every text input on the page, one rerun per edit outside a form."""
+        for index in range(len(self.at.text_input)):
+            # Look the widget up again: every rerun builds a new element tree.
+            widget = self.at.text_input[index]
+            if widget.label.startswith("Search existing") or widget.disabled:
+                continue
+            widget.set_value(field_value(widget.label, session))
+            if not getattr(widget, "form_id", ""):
+                self.run()
+
+    def choose(self, label_start, value):
+        for widget in self.at.radio:
+            if widget.label.startswith(label_start):
+                widget.set_value(value)
+                if not getattr(widget, "form_id", ""):
+                    self.run()
+                return
+
+    def click(self, label_end):
+        for widget in self.at.button:
+            if widget.label.strip().endswith(label_end):
+                self.run(widget.click())
+                return
+        raise RuntimeError(f"No button ending in {label_end!r} on this page.")
+
+
+def play_session(app_path, session, timeout):
+    s = Session(app_path, timeout)
+    s.run()
+    s.fill(session)
+    s.click("Next ➜")
+
+    s.choose("Did you complete", "Yes")
+    s.fill(session)
+    s.click("Next ➜")
+
+    s.choose("Do you currently have", "Yes")
+    s.fill(session)
+    s.click("Submit to ESB Database")
+
+    if not any("Record saved" in el.value for el in s.at.success):
+        raise RuntimeError("The session did not end with a saved record.")
+    return s.reruns, s.cpu
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure server CPU per survey session.")
+    parser.add_argument("app", nargs="?", default="app.py")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("profile_app.py needs streamlit: pip install streamlit", file=sys.stderr)
+        return 1
+
+    if "ESB_DB_PATH" not in os.environ:
+        os.environ["ESB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "profile.db")
+
+    reruns = []
+    cpu = []
+    for session in range(args.sessions):
+        n, seconds = play_session(args.app, session, args.timeout)
+        reruns.append(n)
+        cpu.append(seconds)
+
+    print(f"{args.app}: {args.sessions} sessions")
+    print(f"  reruns per session:   {statistics.mean(reruns):.0f}")
+    print(f"  CPU ms per session:   {statistics.mean(cpu) * 1000:.1f} (median {statistics.median(cpu) * 1000:.1f})")
+    print(f"  CPU ms per rerun:     {sum(cpu) / sum(reruns) * 1000:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,621 @@
+"""
+Database schema and migrations.
+
+The schema version is kept in SQLite's `PRAGMA user_version`. Every
+migration below runs once, in order, inside a transaction; `bootstrap()`
+brings any database file (including an empty esb.db) up to date.
+
+To change the schema, append a new (version, description, statements)
+entry to MIGRATIONS. Never edit one that has already shipped. A statement
+can also be a function taking the connection, for steps that depend on
+what this SQLite build supports.
+
+    python schema.py            # create / upgrade esb.db
+    python schema.py --check    # fail if a db.py helper does a full table scan
+"""
+
+import sqlite3
+import sys
+
+import analytics
+
+
+def has_fts5(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x);")
+        conn.execute("DROP TABLE temp._fts5_probe;")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _create_employer_search(conn):
+    """
+    Full-text index over employer_name for the typeahead in app.py.
+
+    It is an external-content FTS5 table (no second copy of the names),
+    with prefix indexes so "goo" finds "Google LLC" without scanning.
+    Triggers keep it in sync with every insert/update/delete on employers,
+    whichever code path does the write. If this SQLite build has no FTS5
+    (or the database is Postgres, see backends.py), search_employers()
+    falls back to a prefix range on idx_employers_lower_name.
+    """
+    if not isinstance(conn, sqlite3.Connection) or not has_fts5(conn):
+        return
+
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS employers_fts USING fts5(
+            employer_name,
+            content='employers',
+            content_rowid='rowid',
+            prefix='2 3',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS employers_fts_insert AFTER INSERT ON employers BEGIN
+            INSERT INTO employers_fts (rowid, employer_name)
+            VALUES (new.rowid, new.employer_name);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS employers_fts_delete AFTER DELETE ON employers BEGIN
+            INSERT INTO employers_fts (employers_fts, rowid, employer_name)
+            VALUES ('delete', old.rowid, old.employer_name);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS employers_fts_update
+        AFTER UPDATE OF employer_name ON employers BEGIN
+            INSERT INTO employers_fts (employers_fts, rowid, employer_name)
+            VALUES ('delete', old.rowid, old.employer_name);
+            INSERT INTO employers_fts (rowid, employer_name)
+            VALUES (new.rowid, new.employer_name);
+        END;
+        """
+    )
+    # Index employers that were there before this migration.
+    conn.execute("INSERT INTO employers_fts (employers_fts) VALUES ('rebuild');")
+
+
+# Tables whose changes go to change_log: table -> (key column, columns).
+CHANGE_TRACKED = {
+    "programs": ("program_id", ["program_id", "program_name", "level", "department"]),
+    "students": ("student_id", [
+        "student_id", "program_id", "first_name", "last_name", "email",
+        "entry_term", "grad_term", "status", "citizenship_country", "linkedin_url",
+    ]),
+    "employers": ("employer_id", [
+        "employer_id", "employer_name", "industry", "city", "state", "country", "website",
+    ]),
+    "internships": ("internship_id", [
+        "internship_id", "student_id", "employer_id", "title", "mode",
+        "city", "state", "country", "start_date", "end_date", "is_related_to_program",
+    ]),
+    "jobs": ("job_id", [
+        "job_id", "student_id", "employer_id", "title", "job_level", "job_type",
+        "employment_status", "city", "state", "country",
+        "start_date", "end_date", "job_sequence", "source_internship_id",
+    ]),
+    "organizations": ("org_id", ["org_id", "org_name", "org_type"]),
+    "student_organizations": ("student_org_id", [
+        "student_org_id", "student_id", "org_id", "role", "start_date", "end_date",
+    ]),
+}
+
+
+def _create_change_log(conn):
+    """
+    change_log: one compact row per inserted, updated or deleted row of the
+    CHANGE_TRACKED tables, written by triggers so that every code path
+    (app, importer, dedupe merges, the background writer) is covered.
+    `columns` lists what an update changed. Readers keep the last
+    change_id they processed (see changelog.py).
+    """
+    if not isinstance(conn, sqlite3.Connection):
+        _create_change_log_postgres(conn)
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            change_id  INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id     TEXT NOT NULL,
+            op         TEXT NOT NULL,
+            columns    TEXT,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    for table, (key, columns) in CHANGE_TRACKED.items():
+        changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in columns)
+        names = " || ".join(
+            f"CASE WHEN old.{c} IS NOT new.{c} THEN '{c},' ELSE '' END" for c in columns
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_log_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', new.{key}, 'insert');
+            END;
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_log_update AFTER UPDATE ON {table}
+            WHEN {changed} BEGIN
+                INSERT INTO change_log (table_name, row_id, op, columns)
+                VALUES ('{table}', new.{key}, 'update', rtrim({names}, ','));
+            END;
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_log_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', old.{key}, 'delete');
+            END;
+            """
+        )
+
+
+def _create_change_log_postgres(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            change_id  BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id     TEXT NOT NULL,
+            op         TEXT NOT NULL,
+            columns    TEXT,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    # One trigger function for every table; the key column is its argument.
+    conn.execute(
+        """
+        CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+        DECLARE
+            changed TEXT;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES (TG_TABLE_NAME, to_jsonb(NEW) ->> TG_ARGV[0], 'insert');
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES (TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0], 'delete');
+            ELSE
+                SELECT string_agg(n.key, ',') INTO changed
+                FROM jsonb_each(to_jsonb(NEW)) n
+                JOIN jsonb_each(to_jsonb(OLD)) o ON o.key = n.key
+                WHERE n.value IS DISTINCT FROM o.value;
+                IF changed IS NOT NULL THEN
+                    INSERT INTO change_log (table_name, row_id, op, columns)
+                    VALUES (TG_TABLE_NAME, to_jsonb(NEW) ->> TG_ARGV[0], 'update', changed);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    for table, (key, _columns) in CHANGE_TRACKED.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_log ON {table};")
+        conn.execute(
+            f"""
+            CREATE TRIGGER {table}_log AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION log_change('{key}');
+            """
+        )
+
+
+MIGRATIONS = [
+    (
+        1,
+        "base tables",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS programs (
+                program_id   TEXT PRIMARY KEY,
+                program_name TEXT NOT NULL,
+                level        TEXT,
+                department   TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS students (
+                student_id          TEXT PRIMARY KEY,
+                program_id          TEXT NOT NULL REFERENCES programs (program_id),
+                first_name          TEXT NOT NULL,
+                last_name           TEXT NOT NULL,
+                email               TEXT,
+                entry_term          TEXT,
+                grad_term           TEXT,
+                status              TEXT,
+                citizenship_country TEXT,
+                linkedin_url        TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS employers (
+                employer_id   TEXT PRIMARY KEY,
+                employer_name TEXT,
+                industry      TEXT,
+                city          TEXT,
+                state         TEXT,
+                country       TEXT,
+                website       TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS internships (
+                internship_id         TEXT PRIMARY KEY,
+                student_id            TEXT NOT NULL REFERENCES students (student_id),
+                employer_id           TEXT NOT NULL REFERENCES employers (employer_id),
+                title                 TEXT NOT NULL,
+                mode                  TEXT,
+                city                  TEXT,
+                state                 TEXT,
+                country               TEXT,
+                start_date            TEXT,
+                end_date              TEXT,
+                is_related_to_program INTEGER
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id               TEXT PRIMARY KEY,
+                student_id           TEXT NOT NULL REFERENCES students (student_id),
+                employer_id          TEXT NOT NULL REFERENCES employers (employer_id),
+                title                TEXT NOT NULL,
+                job_level            TEXT,
+                job_type             TEXT,
+                employment_status    TEXT,
+                city                 TEXT,
+                state                TEXT,
+                country              TEXT,
+                start_date           TEXT,
+                end_date             TEXT,
+                job_sequence         INTEGER,
+                source_internship_id TEXT REFERENCES internships (internship_id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS organizations (
+                org_id   TEXT PRIMARY KEY,
+                org_name TEXT NOT NULL,
+                org_type TEXT
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS student_organizations (
+                student_org_id TEXT PRIMARY KEY,
+                student_id     TEXT NOT NULL REFERENCES students (student_id),
+                org_id         TEXT NOT NULL REFERENCES organizations (org_id),
+                role           TEXT,
+                start_date     TEXT,
+                end_date       TEXT
+            );
+            """,
+        ],
+    ),
+    (
+        2,
+        "indexes for helper queries and foreign keys",
+        [
+            # get_students: ORDER BY first_name, last_name (covering)
+            """
+            CREATE INDEX IF NOT EXISTS idx_students_name
+            ON students (first_name, last_name, student_id, email);
+            """,
+            # get_employers: ORDER BY employer_name (covering)
+            """
+            CREATE INDEX IF NOT EXISTS idx_employers_name
+            ON employers (employer_name, employer_id);
+            """,
+            # get_organizations: ORDER BY org_name (covering)
+            """
+            CREATE INDEX IF NOT EXISTS idx_organizations_name
+            ON organizations (org_name, org_id);
+            """,
+            # get_internships_for_student: WHERE student_id = ? (covering)
+            """
+            CREATE INDEX IF NOT EXISTS idx_internships_student
+            ON internships (student_id, internship_id, title);
+            """,
+            # Foreign keys (used by joins and by ON DELETE checks)
+            "CREATE INDEX IF NOT EXISTS idx_students_program ON students (program_id);",
+            "CREATE INDEX IF NOT EXISTS idx_internships_employer ON internships (employer_id);",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_student ON jobs (student_id);",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_employer ON jobs (employer_id);",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_source_internship ON jobs (source_internship_id);",
+            """
+            CREATE INDEX IF NOT EXISTS idx_student_orgs_student
+            ON student_organizations (student_id);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_student_orgs_org
+            ON student_organizations (org_id);
+            """,
+        ],
+    ),
+    (
+        3,
+        "employer name search index (FTS5)",
+        [
+            _create_employer_search,
+        ],
+    ),
+    (
+        4,
+        "placement summary tables for the dashboard",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS placement_summary (
+                program_id      TEXT NOT NULL,
+                grad_term       TEXT,
+                students        INTEGER NOT NULL,
+                alumni          INTEGER NOT NULL,
+                with_internship INTEGER NOT NULL,
+                placed          INTEGER NOT NULL,
+                from_internship INTEGER NOT NULL
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_placement_summary_cohort
+            ON placement_summary (program_id, grad_term);
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS employer_cohort_summary (
+                grad_term   TEXT,
+                employer_id TEXT NOT NULL,
+                hires       INTEGER NOT NULL,
+                interns     INTEGER NOT NULL
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_employer_cohort_summary_hires
+            ON employer_cohort_summary (grad_term, hires DESC, employer_id);
+            """,
+            # Refreshing one cohort looks students up by program + term, or
+            # by term alone for the employer summary.
+            """
+            CREATE INDEX IF NOT EXISTS idx_students_cohort
+            ON students (program_id, grad_term);
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_students_grad_term ON students (grad_term);",
+            analytics.rebuild_summaries,
+        ],
+    ),
+    (
+        5,
+        "indexes for keyset-paginated listings",
+        [
+            # get_students_page(program_id=...): filter and sort from one index.
+            """
+            CREATE INDEX IF NOT EXISTS idx_students_program_name
+            ON students (program_id, first_name, last_name, student_id);
+            """,
+            # Covered by idx_students_cohort / idx_students_program_name.
+            "DROP INDEX IF EXISTS idx_students_program;",
+            # get_internships_page(employer_id=...) pages by internship_id.
+            """
+            CREATE INDEX IF NOT EXISTS idx_internships_employer_page
+            ON internships (employer_id, internship_id);
+            """,
+            "DROP INDEX IF EXISTS idx_internships_employer;",
+        ],
+    ),
+    (
+        6,
+        "spool tickets applied by the background writer",
+        [
+            # Written in the same transaction as the journey, so a spooled
+            # submission replayed after a crash is never saved twice.
+            """
+            CREATE TABLE IF NOT EXISTS writer_applied (
+                ticket     TEXT PRIMARY KEY,
+                error      TEXT,
+                applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID;
+            """,
+        ],
+    ),
+    (
+        7,
+        "change log for upserts, incremental refreshes and exports",
+        [
+            _create_change_log,
+        ],
+    ),
+    (
+        8,
+        "employer name orders that are the same on SQLite and Postgres",
+        [
+            # get_employers_page: unnamed employers first ('' instead of
+            # NULL, which the two databases sort at opposite ends), in code
+            # point order (COLLATE BINARY, "C" on Postgres).
+            """
+            CREATE INDEX IF NOT EXISTS idx_employers_sort_name
+            ON employers ((COALESCE(employer_name, '') COLLATE BINARY), employer_id);
+            """,
+            # search_employers without FTS5: case-insensitive prefix range.
+            """
+            CREATE INDEX IF NOT EXISTS idx_employers_lower_name
+            ON employers ((LOWER(employer_name) COLLATE BINARY), employer_id);
+            """,
+        ],
+    ),
+    (
+        9,
+        "change log readers' positions, so old changes can be pruned",
+        [
+            # One row per reader of change_log (see changelog.prune()).
+            """
+            CREATE TABLE IF NOT EXISTS change_log_consumers (
+                consumer  TEXT PRIMARY KEY,
+                change_id BIGINT NOT NULL,
+                seen_at   REAL NOT NULL
+            ) WITHOUT ROWID;
+            """,
+        ],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def bootstrap(conn):
+    """
+    Apply any migrations newer than the database's user_version.
+    Returns the list of versions that were applied (empty if up to date).
+    """
+    if get_version(conn) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    # IMMEDIATE: if two workers start at once, the second waits here and
+    # then sees the first one's version bump.
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        current = get_version(conn)
+        for version, _description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for sql in statements:
+                if callable(sql):
+                    sql(conn)
+                else:
+                    conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(version)};")
+            applied.append(version)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return applied
+
+
+# ---------- QUERY PLAN CHECK ----------
+
+def plan_problems(conn, sql):
+    """
+    Run EXPLAIN QUERY PLAN for one statement and return the steps that are
+    full table scans or temporary sorts. An empty list means the plan is OK.
+    """
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    except sqlite3.ProgrammingError:
+        # Un-expanded "?" placeholders: bind NULLs, the plan is the same.
+        rows = conn.execute(
+            "EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")
+        ).fetchall()
+
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            problems.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_helper_plans():
+    """
+    Call every db.py fetch helper against a fresh, empty database, capture
+    the SQL it actually runs, and check each SELECT's plan.
+
+    Returns {helper_name: [(sql, problems), ...]} for helpers with problems.
+    """
+    import tempfile
+    from pathlib import Path
+
+    import db
+
+    # (helper, args, kwargs). Paged helpers are checked with each filter,
+    # both on the first page and with a continuation cursor.
+    helpers = [
+        ("get_programs", (), {}),
+        ("get_students", (), {}),
+        ("get_employers", (), {}),
+        ("get_internships_for_student", ("S1",), {}),
+        ("get_organizations", (), {}),
+        ("get_student_journey", ("S1",), {}),
+        ("get_journeys", (["S1", "S2"],), {}),
+        ("get_placement_summary", (), {}),
+        ("get_top_employers", ("Spring 2026",), {}),
+        ("get_students_page", (), {}),
+        ("get_students_page", (), {"cursor": db.encode_cursor(["Ann", "Lee", "S1"])}),
+        ("get_students_page", (), {"program_id": "MSBA", "status": "Alumni"}),
+        ("get_students_page", (), {"grad_term": "Spring 2026"}),
+        ("get_employers_page", (), {}),
+        ("get_employers_page", (), {"cursor": db.encode_cursor(["Google", "E1"])}),
+        ("get_employers_page", (), {"cursor": db.encode_cursor([None, "E1"])}),
+        ("get_internships_page", (), {}),
+        ("get_internships_page", (), {"student_id": "S1", "cursor": db.encode_cursor(["I1"])}),
+        ("get_internships_page", (), {"employer_id": "E1", "cursor": db.encode_cursor(["I1"])}),
+    ]
+
+    failures = {}
+    old_pool = db.get_pool()
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = db.init_pool(Path(tmp) / "plan_check.db", size=1)
+        try:
+            statements = []
+            with pool.connection() as conn:
+                conn.set_trace_callback(statements.append)
+
+            for name, args, kwargs in helpers:
+                statements.clear()
+                getattr(db, name)(*args, **kwargs)
+                captured = [
+                    sql for sql in statements
+                    if sql.lstrip().upper().startswith("SELECT") and sql.strip() != "SELECT 1;"
+                ]
+                with pool.connection() as conn:
+                    for sql in captured:
+                        problems = plan_problems(conn, sql)
+                        if problems:
+                            failures.setdefault(name, []).append((sql.strip(), problems))
+        finally:
+            pool.close()
+            db.init_pool(old_pool.db_path, old_pool.size, old_pool.profile)
+    return failures
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if "--check" in argv:
+        failures = check_helper_plans()
+        if not failures:
+            print("OK: no db.py helper falls back to a full table scan.")
+            return 0
+        for name, items in failures.items():
+            for sql, problems in items:
+                print(f"{name}: {' | '.join(problems)}\n    {' '.join(sql.split())}")
+        return 1
+
+    import db
+
+    with db.get_conn() as conn:
+        print(f"Schema version {get_version(conn)} (latest {LATEST_VERSION}) at {db.DB_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Read-only analytics snapshots of the live database.
+
+Dashboards and exports read a lot of rows. Against the live file a long
+read keeps WAL checkpoints from finishing (the -wal file grows and every
+survey commit gets slower). So we periodically copy each tenant's database
+with SQLite's backup API into a snapshot file next to it:
+
+    esb.db  ->  esb.snapshot.db
+
+and send heavy reads there (db.use_snapshot(), or ESB_SNAPSHOT_READS=1).
+The copy runs on a read transaction of the live file, which in WAL mode
+never blocks a writer. It is written to a temporary file and renamed into
+place, so readers always see a whole snapshot; connections to the
+snapshot are opened with immutable=1 and take no locks at all.
+
+Each snapshot records when it was taken and the last change_log row it
+contains, so lag() can tell how far behind it is in seconds and in
+changes. Postgres readers never block writers, so there snapshots are not
+needed and reads simply go to the live database.
+
+    python snapshot.py                 # take one snapshot of every tenant
+    python snapshot.py --every 60      # keep them fresh
+    python snapshot.py --lag           # how far behind they are
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import backends
+import changelog
+import db
+import locks
+import metrics
+import tenants
+
+# Seconds between snapshots taken by the refresher thread.
+SNAPSHOT_INTERVAL = float(os.environ.get("ESB_SNAPSHOT_SECONDS", "60"))
+# Read-only connections per tenant snapshot.
+READ_POOL_SIZE = int(os.environ.get("ESB_SNAPSHOT_POOL_SIZE", "4"))
+
+_lock = threading.Lock()
+_pools = {}  # tenant -> (pool, info) for the installed snapshot
+_file_locks = {}  # tenant -> locks.FileLock on its snapshot
+_refresher = None
+
+
+def snapshot_path(tenant=None):
+    """The snapshot file of a tenant: esb.db -> esb.snapshot.db."""
+    path = tenants.db_path(tenant)
+    return path.with_name(f"{path.stem}.snapshot{path.suffix}")
+
+
+def _available():
+    return backends.get_backend().name == "sqlite"
+
+
+def _read_info(conn):
+    taken_at, change_id = conn.execute(
+        "SELECT taken_at, change_id FROM snapshot_info;"
+    ).fetchone()
+    return {"taken_at": taken_at, "change_id": change_id}
+
+
+def _file_lock(tenant):
+    """The lock every process takes before writing a tenant's snapshot."""
+    with _lock:
+        lock = _file_locks.get(tenant)
+        if lock is None:
+            path = snapshot_path(tenant)
+            lock = _file_locks[tenant] = locks.FileLock(path.with_name(path.name + ".lock"))
+    return lock
+
+
+def _info_on_disk(path):
+    """snapshot_info of the snapshot file at `path`, or None."""
+    if not path.exists():
+        return None
+    conn = sqlite3.connect(path.resolve().as_uri() + "?mode=ro&immutable=1", uri=True)
+    try:
+        return _read_info(conn)
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def take(tenant=None, max_age=None):
+    """
+    Copy a tenant's live database into its snapshot file and start serving
+    reads from the new copy. Returns {"taken_at", "change_id", "seconds"}.
+
+    Only one process at a time writes a tenant's snapshot (a lock file next
+    to it). With max_age, a snapshot that another process took less than
+    max_age seconds ago is served as it is instead of copying again.
+    """
+    if not _available():
+        raise RuntimeError("Snapshots are only used with the SQLite backend.")
+    tenant = tenant or tenants.current_tenant()
+    path = snapshot_path(tenant)
+
+    with _file_lock(tenant):
+        if max_age is not None:
+            info = _info_on_disk(path)
+            if info is not None and time.time() - info["taken_at"] < max_age:
+                entry = _pools.get(tenant)
+                if entry is None or entry[1] != info:
+                    _install(tenant, info)
+                return dict(info, seconds=0.0)
+
+        started = time.perf_counter()
+        # A name of our own, so a crashed copy never collides with the next one.
+        fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+        os.close(fd)
+        tmp = Path(tmp)
+        try:
+            with tenants.use_tenant(tenant), db.get_conn() as src:
+                dst = sqlite3.connect(tmp)
+                try:
+                    # One step copies every page under a single read transaction:
+                    # a consistent copy, while writers carry on in the WAL.
+                    src.backup(dst)
+                    # Immutable readers must not look for a -wal file.
+                    dst.execute("PRAGMA journal_mode = DELETE;")
+                    change_id = changelog.last_change_id(dst)
+                    info = {"taken_at": time.time(), "change_id": change_id}
+                    dst.execute("DROP TABLE IF EXISTS snapshot_info;")
+                    dst.execute(
+                        "CREATE TABLE snapshot_info (taken_at REAL NOT NULL, change_id INTEGER NOT NULL);"
+                    )
+                    dst.execute("INSERT INTO snapshot_info VALUES (?, ?);", (info["taken_at"], change_id))
+                    dst.commit()
+                finally:
+                    dst.close()
+                # Readers of the previous snapshot are at most at its
+                # position, so prune before moving the position forward.
+                changelog.prune(src)
+                changelog.save_position(src, "snapshot", change_id)
+                src.commit()
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        info["seconds"] = time.perf_counter() - started
+        metrics.snapshot_seconds.observe(info["seconds"])
+        _install(tenant, {"taken_at": info["taken_at"], "change_id": info["change_id"]})
+    return info
+
+
+def _install(tenant, info):
+    """Serve reads from the file just renamed into place."""
+    pool = db.ConnectionPool(snapshot_path(tenant), READ_POOL_SIZE, readonly=True)
+    with _lock:
+        old = _pools.get(tenant)
+        _pools[tenant] = (pool, info)
+    if old is not None:
+        # Readers still holding the old file finish on it; it is closed
+        # when they give their connections back.
+        old[0].close()
+    with tenants.use_tenant(tenant):
+        db.invalidate_reference_cache("programs", "employers", "organizations")
+    _update_lag(tenant, info)
+
+
+def _installed(tenant):
+    """(pool, info) of a tenant's snapshot, opening one left by an earlier run."""
+    entry = _pools.get(tenant)
+    if entry is not None:
+        return entry
+    path = snapshot_path(tenant)
+    if not path.exists():
+        return None
+    with _lock:
+        entry = _pools.get(tenant)
+        if entry is None:
+            pool = db.ConnectionPool(path, READ_POOL_SIZE, readonly=True)
+            with pool.connection() as conn:
+                info = _read_info(conn)
+            entry = _pools[tenant] = (pool, info)
+    return entry
+
+
+def connection():
+    """
+    Borrow a read-only connection to the current tenant's snapshot, or a
+    live one (db.get_conn()) while there is no snapshot yet.
+    """
+    if not _available():
+        return db.get_conn()
+    entry = _installed(tenants.current_tenant())
+    if entry is None:
+        return db.get_conn()
+    return entry[0].connection()
+
+
+def info(tenant=None):
+    """{"taken_at", "change_id"} of a tenant's snapshot, or None."""
+    entry = _installed(tenant or tenants.current_tenant()) if _available() else None
+    return None if entry is None else dict(entry[1])
+
+
+def _update_lag(tenant, info, live_change_id=None):
+    seconds = max(0.0, time.time() - info["taken_at"])
+    metrics.snapshot_lag_seconds.set(round(seconds, 3), tenant=tenant)
+    changes = None
+    if live_change_id is not None:
+        changes = max(0, live_change_id - info["change_id"])
+        metrics.snapshot_lag_changes.set(changes, tenant=tenant)
+    return seconds, changes
+
+
+def lag(tenant=None):
+    """
+    How far a tenant's snapshot is behind the live database:
+    {"seconds", "changes", "taken_at"}, or None without a snapshot.
+    Also updates the esb_snapshot_lag_* gauges.
+    """
+    tenant = tenant or tenants.current_tenant()
+    snap = info(tenant)
+    if snap is None:
+        return None
+    with tenants.use_tenant(tenant), db.get_conn() as conn:
+        live_change_id = changelog.last_change_id(conn)
+    seconds, changes = _update_lag(tenant, snap, live_change_id)
+    return {"seconds": seconds, "changes": changes, "taken_at": snap["taken_at"]}
+
+
+def take_all(tenant_names=None, max_age=None):
+    """Snapshot every tenant whose database exists (see take()). Returns {tenant: info}."""
+    taken = {}
+    for name in tenant_names or tenants.names():
+        if tenants.db_path(name).exists():
+            taken[name] = take(name, max_age)
+    return taken
+
+
+class Refresher:
+    """Background thread that re-takes every tenant's snapshot on an interval."""
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL, tenant_names=None):
+        self.interval = interval
+        self.tenant_names = tenant_names
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="esb-snapshot", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Every process runs a refresher; whichever gets to a tenant
+                # first copies it, the others just switch to that copy.
+                take_all(self.tenant_names, max_age=self.interval / 2)
+                self.last_error = None
+            except Exception as e:  # keep the old snapshot and try again later
+                self.last_error = e
+            self._stop.wait(self.interval)
+
+
+def start_refresher(interval=SNAPSHOT_INTERVAL):
+    """Start the process-wide refresher once (no-op on Postgres). Returns it or None."""
+    global _refresher
+    if not _available():
+        return None
+    with _lock:
+        if _refresher is None:
+            _refresher = Refresher(interval).start()
+    return _refresher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Take read-only analytics snapshots.")
+    parser.add_argument("--tenant", help="only this school (default: all)")
+    parser.add_argument("--every", type=float, metavar="SECONDS",
+                        help="keep taking snapshots on this interval")
+    parser.add_argument("--lag", action="store_true", help="report snapshot lag and exit")
+    args = parser.parse_args(argv)
+
+    if not _available():
+        print("Snapshots are only used with the SQLite backend.", file=sys.stderr)
+        return 1
+    try:
+        names = [args.tenant] if args.tenant else None
+        if args.tenant:
+            tenants.db_path(args.tenant)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+
+    if args.lag:
+        for name in names or tenants.names():
+            behind = lag(name)
+            if behind is None:
+                print(f"{name}: no snapshot")
+            else:
+                print(f"{name}: {behind['seconds']:.0f} s, {behind['changes']} changes behind")
+        return 0
+
+    while True:
+        for name, taken in take_all(names).items():
+            print(f"{name}: snapshot at change {taken['change_id']} in {taken['seconds']:.2f} s")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
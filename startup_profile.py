@@ -0,0 +1,261 @@
+"""
+Cold-start profile of a Streamlit worker: where the time goes between a
+new process starting and its first page, and whether that stays in budget.
+
+    python startup_profile.py                          # report
+    python startup_profile.py --render-budget-ms 300   # exit 1 when over
+    python startup_profile.py --out startup.json
+
+Every phase is measured in fresh Python processes (the median of
+--repeat), so nothing is imported or cached yet:
+
+    imports       python -X importtime: streamlit, then app.py's own modules
+    first query   opening the pool and the first queries, cold and after
+                  db.warm_up() (what app.py runs at boot)
+    first render  app.py's first run through Streamlit's AppTest, after a
+                  throw-away page has started Streamlit (a server that is up
+                  but has not served anyone yet), and one rerun
+
+Runs against a throw-away database unless ESB_DB_PATH is set.
+tests/test_startup.py holds the first query and first render to the
+default budgets.
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Defaults for the budgets (ms); see --help.
+IMPORT_BUDGET_MS = 80
+QUERY_BUDGET_MS = 25
+RENDER_BUDGET_MS = 400
+
+
+def app_imports(app_path):
+    """Our own modules that app.py imports at the top."""
+    tree = ast.parse(Path(app_path).read_text(encoding="utf-8"))
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            found = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            found = [node.module]
+        else:
+            continue
+        names += [n for n in found if (BASE_DIR / f"{n}.py").exists() and n not in names]
+    return names
+
+
+def parse_importtime(stderr):
+    """[(name, depth, self_ms, cumulative_ms)] from python -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure_imports(modules):
+    """Import time (ms) of streamlit and of each of our modules on top of it."""
+    code = "import streamlit\n" + "".join(f"import {m}\n" for m in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Importing the app's modules failed:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    top = {name: cumulative for name, depth, _self, cumulative in rows if depth == 0}
+    ours = {
+        name: round(self_ms, 2) for name, _depth, self_ms, _cumulative in rows
+        if (BASE_DIR / f"{name}.py").exists()
+    }
+    return {
+        "streamlit": round(top.get("streamlit", 0.0), 1),
+        # Everything our modules pull in that streamlit did not already.
+        "app modules": round(sum(top.get(m, 0.0) for m in modules), 1),
+        "by module (self)": dict(sorted(ours.items(), key=lambda kv: -kv[1])),
+    }
+
+
+# ---------- CHILD PROCESSES ----------
+
+def _ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _child_queries(warm):
+    timings = {}
+    started = time.perf_counter()
+    import db
+
+    timings["import db"] = _ms(started)
+    if warm:
+        started = time.perf_counter()
+        db.warm_up()
+        timings["warm_up"] = _ms(started)
+    first = time.perf_counter()
+    started = time.perf_counter()
+    with db.get_conn() as conn:
+        conn.execute("SELECT 1;").fetchone()
+    timings["first connection"] = _ms(started)
+    started = time.perf_counter()
+    db.search_employers("a")
+    timings["search_employers"] = _ms(started)
+    started = time.perf_counter()
+    db.get_students_page()
+    timings["get_students_page"] = _ms(started)
+    started = time.perf_counter()
+    db.get_programs()
+    db.get_employers()
+    timings["reference data"] = _ms(started)
+    timings["first query"] = _ms(first)
+    return timings
+
+
+def _child_render(app_path, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Start Streamlit itself (component registry, caches) on an empty page.
+        empty = Path(tmp) / "empty.py"
+        empty.write_text("import streamlit as st\nst.empty()\n", encoding="utf-8")
+        AppTest.from_file(str(empty), default_timeout=timeout).run()
+
+    at = AppTest.from_file(str(Path(app_path).resolve()), default_timeout=timeout)
+    timings = {}
+    for step in ("first render", "rerun"):
+        started = time.perf_counter()
+        at.run()
+        timings[step] = _ms(started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return timings
+
+
+def run_child(*args):
+    """Run this file in a fresh interpreter and return the JSON it prints."""
+    result = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child", *args],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def median_of(runs):
+    """Per-key medians of a list of {step: ms} dicts."""
+    return {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+
+# ---------- REPORT ----------
+
+def profile(app_path="app.py", repeat=3, timeout=30):
+    """The whole startup profile: {"imports", "first query", "first render"}."""
+    modules = app_imports(app_path)
+    # One unmeasured run creates / migrates the database file.
+    run_child("queries", "cold")
+    imports = sorted(
+        (measure_imports(modules) for _ in range(repeat)), key=lambda run: run["app modules"]
+    )
+    return {
+        "imports": imports[len(imports) // 2],
+        "first query": {
+            "cold": median_of([run_child("queries", "cold") for _ in range(repeat)]),
+            "after warm_up": median_of([run_child("queries", "warm") for _ in range(repeat)]),
+        },
+        "first render": median_of(
+            [run_child("render", app_path, str(timeout)) for _ in range(repeat)]
+        ),
+    }
+
+
+def check_budgets(result, import_ms, query_ms, render_ms):
+    """(what, measured, budget) for every budget that was exceeded."""
+    checks = [
+        ("app module imports", result["imports"]["app modules"], import_ms),
+        ("first query after warm_up", result["first query"]["after warm_up"]["first query"], query_ms),
+        ("first render", result["first render"]["first render"], render_ms),
+    ]
+    return [(what, measured, budget) for what, measured, budget in checks if measured > budget]
+
+
+def print_report(result, out=sys.stdout):
+    imports = result["imports"]
+    print(f"imports (ms)       streamlit {imports['streamlit']:.0f}, "
+          f"app modules {imports['app modules']:.1f}", file=out)
+    for name, ms in list(imports["by module (self)"].items())[:8]:
+        print(f"  {name:<18} {ms:6.1f}", file=out)
+    for label, timings in result["first query"].items():
+        print(f"first query (ms), {label}", file=out)
+        for step, ms in timings.items():
+            print(f"  {step:<18} {ms:6.1f}", file=out)
+    print("first render (ms)", file=out)
+    for step, ms in result["first render"].items():
+        print(f"  {step:<18} {ms:6.1f}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a Streamlit worker's cold start.")
+    parser.add_argument("app", nargs="?", default="app.py")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per phase")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help="app.py's own modules on top of streamlit")
+    parser.add_argument("--query-budget-ms", type=float, default=QUERY_BUDGET_MS,
+                        help="first queries of a session after db.warm_up()")
+    parser.add_argument("--render-budget-ms", type=float, default=RENDER_BUDGET_MS,
+                        help="app.py's first render on a started server")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        kind, *rest = args.child
+        if kind == "queries":
+            print(json.dumps(_child_queries(rest == ["warm"])))
+        else:
+            print(json.dumps(_child_render(rest[0], float(rest[1]))))
+        return 0
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        print("startup_profile.py needs streamlit: pip install streamlit", file=sys.stderr)
+        return 1
+    if "ESB_DB_PATH" not in os.environ:
+        os.environ["ESB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "startup.db")
+
+    try:
+        result = profile(args.app, max(1, args.repeat), args.timeout)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print_report(result)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    over = check_budgets(result, args.import_budget_ms, args.query_budget_ms, args.render_budget_ms)
+    for what, measured, budget in over:
+        print(f"OVER BUDGET: {what} {measured:.1f} ms > {budget:.0f} ms", file=sys.stderr)
+    if over:
+        return 1
+    print("all startup budgets met")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Which database file each school (tenant) lives in.
+
+Every tenant has its own SQLite file, with its own connection pool and
+its own write lock, so a busy school never slows another one down. The
+programs a school runs are listed with it; helpers that get a program_id
+(add_program, add_student, save_journey, ...) are routed to the right
+file automatically. The helpers whose rows have no program (add_employer,
+add_internship, search_employers, ...) take an optional program_id for it. Everything else uses the current tenant:
+
+    with tenants.use_tenant("law"):
+        db.get_students()
+
+Without configuration there is one tenant, "esb", in db.DB_PATH, which is
+how the app has always worked. To run several schools, point
+ESB_TENANTS at a JSON file:
+
+    {
+      "default": "esb",
+      "tenants": {
+        "esb": {"db": "esb.db", "programs": ["MSBA", "MBA", "MSF"]},
+        "law": {"db": "shards/law.db", "programs": ["JD", "LLM"]}
+      }
+    }
+
+Relative paths are relative to this folder. A program that is not listed
+goes to the current tenant.
+"""
+
+import contextvars
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+DEFAULT_TENANT = "esb"
+
+_lock = threading.Lock()
+_paths = {}      # tenant -> database path
+_programs = {}   # program_id -> tenant
+_current = contextvars.ContextVar("esb_tenant", default=None)
+
+
+def _resolve(path):
+    path = Path(path)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def register_tenant(name, db_path, programs=()):
+    """Add a school (or move it to another file). Existing tenants are not touched."""
+    with _lock:
+        _paths[name] = _resolve(db_path)
+        for program_id in programs:
+            _programs[program_id] = name
+
+
+def load_config(path=None, default_path=None):
+    """Read the ESB_TENANTS file, or set up the single default tenant."""
+    global DEFAULT_TENANT
+    path = path or os.environ.get("ESB_TENANTS")
+    with _lock:
+        _paths.clear()
+        _programs.clear()
+    if not path:
+        register_tenant(DEFAULT_TENANT, default_path or BASE_DIR / "esb.db")
+        return
+
+    with open(_resolve(path), encoding="utf-8") as f:
+        config = json.load(f)
+    tenants = config.get("tenants") or {}
+    if not tenants:
+        raise ValueError(f"{path} lists no tenants.")
+    DEFAULT_TENANT = config.get("default") or next(iter(tenants))
+    if DEFAULT_TENANT not in tenants:
+        raise ValueError(f"Default tenant {DEFAULT_TENANT!r} is not in {path}.")
+    for name, entry in tenants.items():
+        register_tenant(name, entry["db"], entry.get("programs", ()))
+
+
+def names():
+    return list(_paths)
+
+
+def db_path(name=None):
+    name = name or current_tenant()
+    try:
+        return _paths[name]
+    except KeyError:
+        raise KeyError(f"Unknown tenant {name!r}; known: {sorted(_paths)}.")
+
+
+def current_tenant():
+    return _current.get() or DEFAULT_TENANT
+
+
+@contextmanager
+def use_tenant(name):
+    """Run the block against one tenant's database."""
+    if name not in _paths:
+        raise KeyError(f"Unknown tenant {name!r}; known: {sorted(_paths)}.")
+    token = _current.set(name)
+    try:
+        yield name
+    finally:
+        _current.reset(token)
+
+
+def tenant_for_program(program_id):
+    """The tenant that owns a program; the current tenant if it isn't listed."""
+    return _programs.get(program_id) or current_tenant()
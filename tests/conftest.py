@@ -0,0 +1,47 @@
+"""
+Shared fixtures. The modules live at the top of the repository, and every
+test gets its own database file as the default school.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Set before db is imported: never touch the repository's esb.db.
+os.environ["ESB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "esb.db")
+os.environ.pop("ESB_TENANTS", None)
+os.environ.pop("ESB_DB_BACKEND", None)
+os.environ["ESB_SNAPSHOT_READS"] = "0"
+
+import db  # noqa: E402
+import tenants  # noqa: E402
+
+
+@pytest.fixture
+def esb(tmp_path):
+    """The db module on a fresh, migrated database of its own."""
+    tenants.load_config(default_path=tmp_path / "esb.db")
+    pool = db.init_pool(tmp_path / "esb.db")
+    yield db
+    pool.close()
+
+
+def add_student(student_id, program_id="MSBA"):
+    db.add_program(program_id, program_id, None, None)
+    db.add_student(student_id, program_id, "Ann", "Lee", None, None, "Spring 2026", "Alumni", None, None)
+
+
+def add_internship(internship_id, student_id, employer_id, start_date=None):
+    db.add_employer(employer_id, employer_id, None, None, None, None, None)
+    db.add_internship(internship_id, student_id, employer_id, "Intern", None, None, None, None,
+                      start_date, None, None)
+
+
+def add_job(job_id, student_id, employer_id, sequence=None, source_internship_id=None, start_date=None):
+    db.add_employer(employer_id, employer_id, None, None, None, None, None)
+    db.add_job(job_id, student_id, employer_id, "Analyst", None, None, None, None, None, None,
+               start_date, None, sequence, source_internship_id)
@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+
+import backends
+import db
+import tenants
+
+
+@pytest.mark.parametrize("sqlite_sql, postgres_sql", backends.TRANSLATIONS)
+def test_translate(sqlite_sql, postgres_sql):
+    assert backends.translate(sqlite_sql) == postgres_sql
+
+
+def test_an_unknown_backend_is_refused(monkeypatch):
+    monkeypatch.setattr(backends, "BACKEND", "oracle")
+    monkeypatch.setattr(backends, "_backend", None)
+    with pytest.raises(ValueError, match="oracle"):
+        backends.get_backend()
+
+
+def test_sqlite_copy_rows_and_stream(esb):
+    backend = backends.get_backend()
+    rows = [(f"B{i:04d}", f"Bulk Employer {i}") for i in range(1200)]
+    with db.get_conn() as conn:
+        assert backend.copy_rows(conn, "employers", ["employer_id", "employer_name"], rows) == 1200
+        conn.commit()
+    with db.get_conn() as conn:
+        batches = list(backend.stream(conn, "SELECT employer_id, employer_name FROM employers;",
+                                      batch_size=500))
+    assert [len(batch) for batch in batches] == [500, 500, 200]
+    assert batches[0][0] == ("B0000", "Bulk Employer 0")
+
+
+@pytest.fixture
+def postgres(esb, monkeypatch):
+    """db.py on the Postgres backend, with a fake psycopg connection that records statements."""
+    raw = backends._FakeRaw()
+    monkeypatch.setattr(backends, "_backend", backends._fake_postgres_backend(raw))
+    return raw
+
+
+def test_a_journey_on_postgres_is_one_transaction(postgres):
+    db.save_journey(backends.SAMPLE_STUDENT, None, backends.SAMPLE_JOB)
+    words = [sql.split(None, 1)[0].rstrip(";").upper() for sql, _p, _c in postgres.statements]
+    first_write = next(i for i, word in enumerate(words) if word.lower() in backends._DML)
+    assert "BEGIN" in words[:first_write]
+    assert words[-1] == "COMMIT"
+    assert all("?" not in sql for sql, _p, _c in postgres.statements)
+
+
+def test_employer_search_on_postgres_uses_the_prefix_range(postgres):
+    db.search_employers("acme")
+    (sql, params, _c), = [s for s in postgres.statements if "FROM employers" in s[0]]
+    assert "employers_fts" not in sql
+    assert params[:2] == ("acme", "acme\U0010ffff")
+
+
+def test_the_postgres_code_path_offline(esb):
+    out = io.StringIO()
+    assert backends.postgres_offline_check(out) == 0, out.getvalue()
+
+
+@pytest.mark.skipif(
+    not os.environ.get("ESB_TEST_DATABASE_URL"),
+    reason="set ESB_TEST_DATABASE_URL to a scratch Postgres database",
+)
+def test_round_trip_on_a_live_postgres(esb, monkeypatch, tmp_path):
+    pytest.importorskip("psycopg")
+    backend = backends.PostgresBackend(os.environ["ESB_TEST_DATABASE_URL"])
+    monkeypatch.setattr(backends, "_backend", backend)
+    tenant = "esb_pytest"
+    tenants.register_tenant(tenant, tmp_path / "unused.db")
+    try:
+        with tenants.use_tenant(tenant):
+            out = io.StringIO()
+            assert backends._round_trip(backend, db, out) == 0, out.getvalue()
+    finally:
+        with backend.connection() as conn:
+            conn.execute(f'DROP SCHEMA IF EXISTS "{tenant}" CASCADE;')
+            conn.commit()
+        backend.close()
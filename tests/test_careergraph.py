@@ -0,0 +1,68 @@
+from careergraph import CareerGraph
+from conftest import add_internship, add_job, add_student
+
+
+def test_return_offer_is_a_stay_not_a_path(esb):
+    add_student("S1")
+    add_internship("I1", "S1", "ACME", start_date="2025-06-01")
+    add_job("J1", "S1", "ACME", sequence=1, source_internship_id="I1")
+
+    graph = CareerGraph().build()
+
+    assert graph.stayed("ACME") == 1
+    assert graph.top_paths("ACME") == []
+    assert graph.feeders("ACME") == []
+    assert graph.destinations("ACME") == []
+
+
+def test_paths_and_feeders_never_revisit_an_employer(esb):
+    # A -> B -> A -> C
+    add_student("S1")
+    add_job("J1", "S1", "A", sequence=1)
+    add_job("J2", "S1", "B", sequence=2)
+    add_job("J3", "S1", "A", sequence=3)
+    add_job("J4", "S1", "C", sequence=4)
+
+    graph = CareerGraph().build()
+
+    for _probability, path in graph.top_paths("A", length=4):
+        assert len(path) == len(set(path))
+    assert "A" not in dict(graph.feeders("A", hops=3))
+
+
+def test_recorded_source_internship_is_the_edge(esb):
+    # The job came from the first internship, not from the later one.
+    add_student("S1")
+    add_internship("I1", "S1", "A", start_date="2024-06-01")
+    add_internship("I2", "S1", "B", start_date="2025-06-01")
+    add_job("J1", "S1", "C", sequence=1, source_internship_id="I1")
+
+    graph = CareerGraph().build()
+
+    assert dict(graph.destinations("A")) == {"B": 0.5, "C": 0.5}
+    assert graph.feeders("C") == [("A", 1.0)]
+
+
+def test_undated_stints_join_only_through_a_source(esb):
+    add_student("S1")
+    add_internship("I1", "S1", "A")
+    add_internship("I2", "S1", "B")
+    add_job("J1", "S1", "C", sequence=1, source_internship_id="I2")
+
+    graph = CareerGraph().build()
+
+    assert graph.feeders("C") == [("B", 1.0)]
+    assert graph.destinations("A") == []
+
+
+def test_refresh_follows_a_new_source(esb):
+    add_student("S1")
+    add_internship("I1", "S1", "A", start_date="2024-06-01")
+    graph = CareerGraph().build()
+
+    add_job("J1", "S1", "A", sequence=1, source_internship_id="I1")
+    add_job("J2", "S1", "B", sequence=2)
+    graph.refresh()
+
+    assert graph.stayed("A") == 1
+    assert graph.destinations("A") == [("B", 1.0)]
@@ -0,0 +1,43 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db.ConnectionPool(tmp_path / "pool.db", size=1, timeout=0.1)
+    yield pool
+    pool.close()
+
+
+def test_a_broken_connection_is_replaced_when_borrowed(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (a);")
+    conn.close()  # e.g. closed behind the pool's back
+
+    with pool.connection() as fresh:
+        assert fresh is not conn
+        assert fresh.execute("SELECT COUNT(*) FROM t;").fetchone()[0] == 0
+    assert pool._opened == 1
+
+
+def test_connections_come_back_without_a_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (a);")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1);")
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t;").fetchone()[0] == 0
+
+
+def test_a_full_pool_times_out(pool):
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+
+
+def test_a_closed_pool_refuses_to_lend(pool):
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
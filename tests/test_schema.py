@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import db
+import schema
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def leading_columns(conn, table):
+    """The first two columns of every index on `table`."""
+    columns = set()
+    for index in conn.execute(f"PRAGMA index_list({table});"):
+        info = conn.execute(f"PRAGMA index_info({index[1]});").fetchall()
+        columns.add(tuple(name for _seq, _cid, name in info[:2]))
+    return columns
+
+
+def test_bootstrap_applies_every_migration_once(conn):
+    versions = [version for version, _description, _statements in schema.MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert schema.bootstrap(conn) == versions
+    assert schema.get_version(conn) == schema.LATEST_VERSION
+    assert schema.bootstrap(conn) == []
+
+
+def test_an_empty_database_file_is_migrated_on_first_use(esb):
+    with db.get_conn() as conn:
+        assert schema.get_version(conn) == schema.LATEST_VERSION
+
+
+def test_the_helpers_access_paths_are_indexed(conn):
+    schema.bootstrap(conn)
+    assert ("student_id",) in {c[:1] for c in leading_columns(conn, "internships")}
+    assert ("first_name", "last_name") in leading_columns(conn, "students")
+    assert {("student_id",), ("employer_id",)} <= {c[:1] for c in leading_columns(conn, "jobs")}
+    assert {("student_id",), ("org_id",)} <= {
+        c[:1] for c in leading_columns(conn, "student_organizations")
+    }
+
+
+def test_plan_problems_reports_a_full_table_scan(conn):
+    schema.bootstrap(conn)
+    assert schema.plan_problems(conn, "SELECT * FROM jobs WHERE student_id = ?;") == []
+    assert schema.plan_problems(conn, "SELECT * FROM jobs WHERE title = ?;") == ["SCAN jobs"]
+
+
+def test_no_helper_falls_back_to_a_full_table_scan(esb):
+    assert schema.check_helper_plans() == {}
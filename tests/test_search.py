@@ -0,0 +1,19 @@
+import db
+
+
+def test_an_exact_name_is_found_among_many_word_matches(esb):
+    for i in range(60):
+        db.add_employer(f"E{i}", f"Bay Area Tech {i}", None, None, None, None, None)
+    db.add_employer("T", "Tech", None, None, None, None, None)
+    db.add_employer("TC", "Techcorp", None, None, None, None, None)
+
+    names = [e.employer_name for e in db.search_employers("tech", limit=5)]
+    assert names[:2] == ["Tech", "Techcorp"]
+    assert len(names) == 5
+
+
+def test_every_word_is_a_prefix(esb):
+    db.add_employer("G", "Google LLC", None, None, None, None, None)
+    db.add_employer("O", "Goodwill", None, None, None, None, None)
+    assert [e.employer_id for e in db.search_employers("goo ll")] == ["G"]
+    assert [e.employer_id for e in db.search_employers("goo")] == ["O", "G"]
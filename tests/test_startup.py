@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import db
+import startup_profile
+import tenants
+from conftest import add_student
+
+
+def test_warm_up_opens_connections_and_fills_the_caches(esb):
+    add_student("S1")
+    db.invalidate_reference_cache()
+    pool = db.init_pool(tenants.db_path(), size=3)
+
+    timings = db.warm_up(connections=2)
+    assert set(timings) == {tenants.current_tenant()}
+    assert set(timings[tenants.current_tenant()]) == {"connections", "reference data", "first pages"}
+    assert pool._opened == 2 and pool._idle.qsize() == 2
+
+    misses = db.reference_cache_stats()["misses"]
+    assert [p.program_id for p in db.get_programs()] == ["MSBA"]
+    assert db.reference_cache_stats()["misses"] == misses
+
+
+def test_warm_up_skips_a_school_with_no_database_yet(esb, tmp_path):
+    add_student("S1")
+    tenants.register_tenant("law", tmp_path / "law.db")
+    assert set(db.warm_up()) == {tenants.current_tenant()}
+    assert not (tmp_path / "law.db").exists()
+
+
+@pytest.fixture
+def profile_db(tmp_path, monkeypatch):
+    """Fresh processes (startup_profile.run_child) on a database of their own."""
+    monkeypatch.setenv("ESB_DB_PATH", str(tmp_path / "startup.db"))
+    startup_profile.run_child("queries", "cold")  # creates / migrates the file
+
+
+def test_first_query_after_warm_up_is_in_budget(profile_db):
+    runs = [startup_profile.run_child("queries", "warm") for _ in range(3)]
+    first_query = startup_profile.median_of(runs)["first query"]
+    assert first_query <= startup_profile.QUERY_BUDGET_MS
+
+
+def test_first_render_is_in_budget(profile_db):
+    pytest.importorskip("streamlit.testing.v1")
+    app = os.path.join(startup_profile.BASE_DIR, "app.py")
+    runs = [startup_profile.run_child("render", app, "30") for _ in range(3)]
+    assert startup_profile.median_of(runs)["first render"] <= startup_profile.RENDER_BUDGET_MS
+
+
+def test_check_budgets_reports_what_is_over():
+    result = {
+        "imports": {"app modules": 20.0},
+        "first query": {"after warm_up": {"first query": 30.0}},
+        "first render": {"first render": 100.0},
+    }
+    assert startup_profile.check_budgets(result, 80, 25, 400) == [
+        ("first query after warm_up", 30.0, 25),
+    ]
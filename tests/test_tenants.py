@@ -0,0 +1,50 @@
+import pytest
+
+import db
+import tenants
+
+
+@pytest.fixture
+def law(esb, tmp_path):
+    """A second school, "law", that runs the JD program in its own file."""
+    tenants.register_tenant("law", tmp_path / "law.db", programs=["JD"])
+    with tenants.use_tenant("law"):
+        pool = db.init_pool()
+    yield "law"
+    pool.close()
+
+
+def student_ids(tenant):
+    with tenants.use_tenant(tenant):
+        return [s.student_id for s in db.get_students()]
+
+
+def test_helpers_with_a_program_go_to_the_school_that_runs_it(law):
+    db.add_program("JD", "Juris Doctor", None, None)
+    db.add_student("L1", "JD", "Ann", "Lee", None, None, "Spring 2026", "Alumni", None, None)
+    db.add_program("MSBA", "Business Analytics", None, None)
+    db.add_student("S1", "MSBA", "Bo", "Kim", None, None, "Spring 2026", "Alumni", None, None)
+
+    assert student_ids(law) == ["L1"]
+    assert student_ids(tenants.current_tenant()) == ["S1"]
+
+
+def test_program_id_routes_the_helpers_without_a_program_column(law):
+    db.add_employer("E1", "Lawfirm LLP", None, None, None, None, None, program_id="JD")
+    db.add_employer("E2", "Lawn Care", None, None, None, None, None)
+
+    assert [e.employer_id for e in db.search_employers("law", program_id="JD")] == ["E1"]
+    assert [e.employer_id for e in db.search_employers("law")] == ["E2"]
+
+
+def test_an_unlisted_program_stays_in_the_current_school(law):
+    assert tenants.tenant_for_program("JD") == "law"
+    assert tenants.tenant_for_program("NEW") == tenants.current_tenant()
+    with tenants.use_tenant(law):
+        assert tenants.tenant_for_program("NEW") == "law"
+
+
+def test_an_unknown_school_is_refused(esb):
+    with pytest.raises(KeyError, match="nowhere"):
+        with tenants.use_tenant("nowhere"):
+            pass
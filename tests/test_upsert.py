@@ -0,0 +1,55 @@
+import db
+from conftest import add_internship, add_job, add_student
+
+STUDENT = {
+    "student_id": "S1", "program_id": "MSBA", "program_name": "MS Business Analytics",
+    "first_name": "Ann", "last_name": "Lee", "email": "ann@example.edu", "entry_term": "",
+    "grad_term": "Spring 2026", "status_value": "Alumni", "citizenship": "",
+    "linkedin": "https://linkedin.com/in/ann",
+}
+JOB = {
+    "job_id": "J1", "employer_id": "E1", "employer_name": "Acme", "industry": "Tech",
+    "title": "Analyst", "job_level": "", "job_type": "", "employment_status": "",
+    "city": "", "state": "", "country": "", "start_date": "2026-06-01",
+    "end_date": "2027-01-31", "sequence": 1, "source_internship_id": "I1",
+    "website": "",
+}
+
+
+def row(sql, *params):
+    with db.get_conn() as conn:
+        return tuple(conn.execute(sql, params).fetchone())
+
+
+def test_none_keeps_a_stored_value_and_blank_clears_it(esb):
+    add_student("S1")
+    db.add_employer("E1", "Acme", "Tech", "Stockton", "CA", "USA", "acme.example")
+
+    db.add_employer("E1", "Acme", None, "", None, None, "")
+    assert row("SELECT industry, city, website FROM employers WHERE employer_id = ?", "E1") == (
+        "Tech", None, None,
+    )
+
+
+def test_an_edited_journey_can_clear_what_it_no_longer_says(esb):
+    add_student("S1")
+    add_internship("I1", "S1", "E0")
+    db.save_journey(STUDENT, job=JOB)
+    assert row("SELECT end_date, source_internship_id FROM jobs WHERE job_id = ?", "J1") == (
+        "2027-01-31", "I1",
+    )
+
+    db.save_journey(dict(STUDENT, linkedin=""), job=dict(JOB, end_date="", source_internship_id=None))
+    assert row("SELECT end_date, source_internship_id FROM jobs WHERE job_id = ?", "J1") == (None, None)
+    assert row("SELECT linkedin_url FROM students WHERE student_id = ?", "S1") == (None,)
+    # Blank employer details on the form do not wipe the shared employer row.
+    db.save_journey(STUDENT, job=dict(JOB, industry=""))
+    assert row("SELECT industry FROM employers WHERE employer_id = ?", "E1") == ("Tech",)
+
+
+def test_an_unchanged_resubmission_does_not_touch_the_row(esb):
+    add_student("S1")
+    add_job("J1", "S1", "E1", sequence=1)
+    changes = row("SELECT COUNT(*) FROM change_log")[0]
+    add_job("J1", "S1", "E1", sequence=1)
+    assert row("SELECT COUNT(*) FROM change_log")[0] == changes
@@ -0,0 +1,42 @@
+import io
+
+import importer
+from conftest import add_student
+from validation import FORM, KnownIds, validate
+
+STUDENT_ROW = {"student_id": "S2", "first_name": "Bo", "last_name": "Chan", "program_id": "MSBA"}
+
+
+def test_row_without_program_name_is_checked_against_programs(esb):
+    add_student("S1", program_id="MSBA")
+    known = KnownIds()
+
+    assert validate("student", dict(STUDENT_ROW), known=known) == []
+    assert validate("student", dict(STUDENT_ROW, program_id="NOPE"), known=known) == [
+        "Program ID 'NOPE' does not exist."
+    ]
+    # With a name the row creates the program.
+    assert validate("student", dict(STUDENT_ROW, program_id="NEW", program_name="New"), known=known) == []
+
+
+def test_form_still_needs_the_program_name():
+    form = {"student_id": "S2", "first_name": "Bo", "last_name": "Chan", "program_id": "MSBA",
+            "program_name": ""}
+    assert "Program name is required." in validate("student", form, FORM)
+
+
+def test_non_text_values_are_field_errors():
+    row = {"internship_id": "I1", "student_id": "S1", "employer_id": "E1", "title": "Intern",
+           "start_date": 20190101}
+    assert validate("internship", row) == ["Internship Start Date must be text."]
+
+
+def test_import_students_of_existing_programs(esb, tmp_path):
+    add_student("S1", program_id="MSBA")
+    students = tmp_path / "students.csv"
+    students.write_text("student_id,first_name,last_name,program_id\nS2,Bo,Chan,MSBA\nS3,Cy,Dee,NOPE\n")
+
+    summary = importer.run_import({"student": students}, batch_size=10, out=io.StringIO())
+
+    assert summary["student"] == 1
+    assert summary["rejected"] == 1
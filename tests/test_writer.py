@@ -0,0 +1,57 @@
+import pytest
+
+import db
+import writer
+
+STUDENT = {
+    "student_id": "S1", "program_id": "MSBA", "program_name": "MS Business Analytics",
+    "first_name": "Ann", "last_name": "Lee", "email": "", "entry_term": "", "grad_term": "",
+    "status_value": "Alumni", "citizenship": "", "linkedin": "",
+}
+
+
+@pytest.fixture
+def background(esb, tmp_path):
+    w = writer.BackgroundWriter(spool_path=tmp_path / "spool.jsonl").start()
+    yield w
+    w.close()
+
+
+def test_a_record_that_raises_fails_alone(background, monkeypatch):
+    write = db._write_journey
+
+    def flaky(cur, student, internship=None, job=None):
+        if student["student_id"] == "BAD":
+            raise ValueError("bad record")
+        return write(cur, student, internship, job)
+
+    monkeypatch.setattr(db, "_write_journey", flaky)
+    bad = background.submit(dict(STUDENT, student_id="BAD"))
+    good = background.submit(STUDENT)
+
+    assert background.wait(bad, 5) == {"state": "failed", "error": "bad record"}
+    assert background.wait(good, 5)["state"] == "saved"
+    assert background.alive
+
+
+def test_a_broken_batch_fails_its_tickets_and_the_writer_carries_on(background, monkeypatch):
+    def broken(batch):
+        background._conn.execute("BEGIN IMMEDIATE;")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(background, "_commit_batch", broken)
+    ticket = background.submit(STUDENT)
+    status = background.wait(ticket, 5)
+    assert status["state"] == "failed" and "boom" in status["error"]
+    assert background.alive
+    assert not background._conn.in_transaction
+
+    monkeypatch.undo()
+    assert background.wait(background.submit(STUDENT), 5)["state"] == "saved"
+
+
+def test_a_stopped_writer_refuses_submissions(background):
+    background.close()
+    assert not background.alive
+    with pytest.raises(writer.WriterStopped):
+        background.submit(STUDENT)
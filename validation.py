@@ -0,0 +1,399 @@
+"""
+Validation rules shared by the Streamlit steps (app.py) and the bulk
+importer (importer.py), so both paths accept and reject the same records.
+
+Every record kind (student, employer, internship, job) is described once
+as a list of Fields: what each value must look like (an ID, a date, a
+term, one of a few choices, ...), whether it is required, which other
+date or term it must not come before, and which table it has to exist
+in. validator() turns such a list into a Validator once, a flat list of
+small check functions, so checking a record is just calling them:
+
+    errors = validate("internship", internship_data, FORM)
+    errors = validate("job", row, known=known_ids)
+
+Records come in two shapes. ROW uses the table's column names (flat
+files, the database). FORM uses the keys of app.py's session dicts, where
+a few fields have other names and the student is implied by Step 1.
+
+Reference checks (an internship's student must exist, a student row
+without a program_name must name an existing program, ...) only run when
+a KnownIds is passed: it reads each ID column once into a set, so a bulk
+import checks 100k rows without 100k queries. Booleans and whole numbers
+are normalized in place ("yes" -> 1, "3" -> 3).
+"""
+
+import functools
+import re
+from dataclasses import dataclass
+from datetime import date
+
+ROW, FORM = "row", "form"
+
+# Value kinds.
+TEXT, ID, EMAIL, URL, DATE, TERM, INT, BOOL, CHOICE = (
+    "text", "id", "email", "url", "date", "term", "int", "bool", "choice",
+)
+
+STATUSES = ("Current", "Alumni")
+MODES = ("Virtual", "In-Person", "Hybrid")
+SEASONS = ("spring", "summer", "fall", "winter")
+
+
+@dataclass(frozen=True, slots=True)
+class Field:
+    """One value of a record and the rules it must follow."""
+
+    name: str
+    label: str
+    kind: str = TEXT
+    # True, or a shape (ROW / FORM) it is only required in.
+    required: bool | str = False
+    choices: tuple = ()
+    minimum: int | None = None
+    max_length: int = 200
+    # Key in app.py's dicts: "" = same as name, None = not asked in the form.
+    form: str | None = ""
+    # False for values that only the form has (the employer's details on
+    # an internship or job).
+    row: bool = True
+    # (table, column) the value must exist in ...
+    references: tuple | None = None
+    # ... unless this field is filled in too (the row creates the parent).
+    unless: str | None = None
+    # Must not come before this field (same kind).
+    after: str | None = None
+
+
+ENTITIES = {
+    "student": [
+        Field("student_id", "Student ID", ID, required=True),
+        Field("first_name", "First name", required=True),
+        Field("last_name", "Last name", required=True),
+        Field("program_id", "Program ID", ID, required=True,
+              references=("programs", "program_id"), unless="program_name"),
+        # The form creates the program, so it needs the name; an imported
+        # row may just point at a program that exists (checked above).
+        Field("program_name", "Program name", required=FORM),
+        Field("email", "Email", EMAIL),
+        Field("entry_term", "Entry term", TERM),
+        Field("grad_term", "Graduation term", TERM, after="entry_term"),
+        Field("status", "Status", CHOICE, choices=STATUSES, form="status_value"),
+        Field("citizenship_country", "Citizenship country", form="citizenship"),
+        Field("linkedin_url", "LinkedIn URL", URL, form="linkedin"),
+    ],
+    "employer": [
+        Field("employer_id", "Employer ID", ID, required=True),
+        Field("employer_name", "Employer name"),
+        Field("industry", "Industry"),
+        Field("website", "Website", URL),
+    ],
+    "internship": [
+        Field("internship_id", "Internship ID", ID, required=True),
+        # In the form the student comes from Step 1.
+        Field("student_id", "Student ID", ID, required=True, form=None,
+              references=("students", "student_id")),
+        Field("employer_id", "Internship Employer ID", ID, required=True,
+              references=("employers", "employer_id"), unless="employer_name"),
+        Field("title", "Internship Title", required=True),
+        Field("mode", "Internship Mode", CHOICE, choices=MODES),
+        Field("start_date", "Internship Start Date", DATE),
+        Field("end_date", "Internship End Date", DATE, after="start_date"),
+        Field("is_related_to_program", "Related to program", BOOL, form="is_related"),
+        Field("website", "Internship Employer Website", URL, row=False),
+    ],
+    "job": [
+        Field("job_id", "Job ID", ID, required=True),
+        Field("student_id", "Student ID", ID, required=True, form=None,
+              references=("students", "student_id")),
+        Field("employer_id", "Job Employer ID", ID, required=True,
+              references=("employers", "employer_id"), unless="employer_name"),
+        Field("title", "Job Title", required=True),
+        Field("start_date", "Job Start Date", DATE),
+        Field("end_date", "Job End Date", DATE, after="start_date"),
+        Field("job_sequence", "Job Sequence", INT, minimum=1, form="sequence"),
+        Field("source_internship_id", "Source internship ID", ID,
+              references=("internships", "internship_id")),
+        Field("website", "Job Employer Website", URL, row=False),
+    ],
+}
+
+# Parent tables the importer inserts into (see importer.PARENT_SQL).
+_PARENTS = {"programs", "employers"}
+
+
+# ---------- VALUE PARSERS ----------
+# Each returns the (normalized) value or raises ValueError with the
+# message to show, "{label}" filled in later.
+
+_EMAIL = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+_URL = re.compile(r"(https?://)?[^\s/.]+(\.[^\s/.]+)+(/\S*)?", re.IGNORECASE)
+_TERM = re.compile(r"(spring|summer|fall|winter)\s*(\d{4})", re.IGNORECASE)
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n"}
+
+
+def _text(value, field):
+    if len(value if value.__class__ is str else str(value)) > field.max_length:
+        raise ValueError(f"{{label}} must be at most {field.max_length} characters.")
+    return value
+
+
+def _id(value, field):
+    value = str(value)
+    if len(value) > 64:
+        raise ValueError("{label} must be at most 64 characters.")
+    if not value.isprintable() or " " in value:
+        raise ValueError("{label} must not contain spaces.")
+    return value
+
+
+def _email(value, field):
+    if value.__class__ is not str:
+        raise ValueError("{label} must be text.")
+    if not _EMAIL.fullmatch(value):
+        raise ValueError("{label} is not a valid email address.")
+    return value
+
+
+def _url(value, field):
+    if value.__class__ is not str:
+        raise ValueError("{label} must be text.")
+    if not _URL.fullmatch(value):
+        raise ValueError("{label} is not a valid web address.")
+    return value
+
+
+def _date(value, field):
+    if isinstance(value, date):
+        return value
+    if value.__class__ is not str:
+        # A JSON 20240531 is a number, not a date.
+        raise ValueError("{label} must be text.")
+    # fromisoformat() also takes 20240531 and week dates; we store YYYY-MM-DD.
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError("{label} must be a date like 2024-05-31.")
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError("{label} is not a real date.")
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_term(value):
+    # A few dozen distinct terms make up every file, so this is cached.
+    match = _TERM.fullmatch(value.strip())
+    if not match:
+        return None
+    return int(match.group(2)), SEASONS.index(match.group(1).lower())
+
+
+def _term(value, field):
+    term = _parse_term(str(value))
+    if term is None:
+        raise ValueError("{label} must be a term like Fall 2024.")
+    return term
+
+
+def _int(value, field):
+    if not isinstance(value, int) or isinstance(value, bool):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("{label} must be a whole number.")
+    if field.minimum is not None and value < field.minimum:
+        raise ValueError(f"{{label}} must be at least {field.minimum}.")
+    return value
+
+
+def _bool(value, field):
+    if isinstance(value, (bool, int)):
+        return int(bool(value))
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ValueError("{label} must be yes or no.")
+
+
+def _choice(value, field):
+    if value not in field.choices:
+        raise ValueError(f"{{label}} must be one of: {', '.join(field.choices)}.")
+    return value
+
+
+PARSERS = {
+    TEXT: _text, ID: _id, EMAIL: _email, URL: _url, DATE: _date,
+    TERM: _term, INT: _int, BOOL: _bool, CHOICE: _choice,
+}
+# Kinds whose parsed value replaces the one in the record.
+_NORMALIZED = {INT, BOOL}
+
+
+# ---------- REFERENCES ----------
+
+class KnownIds:
+    """
+    IDs that exist in the database, for reference checks. Each (table,
+    column) is read into a set the first time it is needed and kept for
+    the life of this object (one import run, say).
+    """
+
+    def __init__(self, conn=None):
+        self._conn = conn
+        self._sets = {}
+        self._added = {}
+
+    def _load(self, table, column):
+        sql = f"SELECT {column} FROM {table};"
+        if self._conn is not None:
+            return {row[0] for row in self._conn.execute(sql)}
+        import db
+
+        with db.get_conn() as conn:
+            return {row[0] for row in conn.execute(sql)}
+
+    def contains(self, table, column, value):
+        ids = self._sets.get((table, column))
+        if ids is None:
+            ids = self._load(table, column) | self._added.pop((table, column), set())
+            self._sets[(table, column)] = ids
+        return value in ids
+
+    def seed(self, table, column, ids):
+        """Use these IDs for (table, column) instead of reading the table (cached data, say)."""
+        self._sets[(table, column)] = set(ids) | self._added.pop((table, column), set())
+
+    def add(self, table, column, value):
+        """Record an ID that an accepted row is about to write."""
+        ids = self._sets.get((table, column))
+        if ids is None:
+            # Not read yet: keep it until it is (the row isn't written yet either).
+            ids = self._added.setdefault((table, column), set())
+        ids.add(value)
+
+
+# ---------- COMPILING ----------
+
+def _key(field, shape):
+    if shape == FORM:
+        return None if field.form is None else (field.form or field.name)
+    return field.name if field.row else None
+
+
+def _compile_field(field, key, keep, shape):
+    parse = PARSERS[field.kind]
+    label = field.label
+    name = field.name
+    is_required = field.required is True or field.required == shape
+    required = f"{label} is required."
+    normalize = field.kind in _NORMALIZED
+    references = field.references
+    unless = field.unless
+
+    def check(record, errors, known, parsed_values):
+        value = record.get(key)
+        if value is None or value == "" or (value.__class__ is str and value.isspace()):
+            if is_required:
+                errors.append(required)
+            return
+        try:
+            parsed = parse(value, field)
+        except ValueError as e:
+            errors.append(str(e).format(label=label))
+            return
+        if normalize:
+            record[key] = parsed
+        if keep:
+            parsed_values[name] = parsed
+        if (
+            references is not None
+            and known is not None
+            and not (unless and record.get(unless))
+            and not known.contains(references[0], references[1], value)
+        ):
+            errors.append(f"{label} {value!r} does not exist.")
+
+    return check
+
+
+def _compile_order(field, other):
+    name, other_name = field.name, other.name
+    message = f"{field.label} must not be before {other.label}."
+
+    def check(record, errors, known, parsed_values):
+        # Both were parsed by their own checks (missing when blank or bad).
+        first, second = parsed_values.get(other_name), parsed_values.get(name)
+        if first is not None and second is not None and second < first:
+            errors.append(message)
+
+    return check
+
+
+class Validator:
+    """All the checks of one record kind and shape, compiled once (see validator())."""
+
+    def __init__(self, kind, shape=ROW):
+        if kind not in ENTITIES:
+            raise ValueError(f"Unknown record kind {kind!r}; use one of {sorted(ENTITIES)}.")
+        self.kind = kind
+        self.shape = shape
+        fields = {f.name: f for f in ENTITIES[kind]}
+        keys = {name: _key(f, shape) for name, f in fields.items()}
+        ordered = [
+            f for f in fields.values()
+            if f.after and keys[f.name] is not None and keys[f.after] is not None
+        ]
+        kept = {f.name for f in ordered} | {f.after for f in ordered}
+        self._checks = [
+            _compile_field(f, keys[f.name], f.name in kept, shape)
+            for f in fields.values() if keys[f.name] is not None
+        ]
+        self._checks += [_compile_order(f, fields[f.after]) for f in ordered]
+        # Parents an accepted row creates, so later rows may refer to them.
+        self._creates = [
+            (f.references, keys[f.name]) for f in fields.values()
+            if f.unless and f.references[0] in _PARENTS and keys[f.name] is not None
+        ]
+
+    def __call__(self, record, known=None):
+        """The list of problems with `record` (empty when it is fine)."""
+        errors = []
+        parsed = {}
+        for check in self._checks:
+            check(record, errors, known, parsed)
+        if known is not None and not errors:
+            for (table, column), key in self._creates:
+                if record.get(key):
+                    known.add(table, column, record[key])
+        return errors
+
+    def check_many(self, records, known=None):
+        """Batch mode: {index: errors} for the records that fail."""
+        failed = {}
+        checks = self._checks
+        creates = self._creates
+        for i, record in enumerate(records):
+            errors = []
+            parsed = {}
+            for check in checks:
+                check(record, errors, known, parsed)
+            if errors:
+                failed[i] = errors
+            elif known is not None:
+                for (table, column), key in creates:
+                    if record.get(key):
+                        known.add(table, column, record[key])
+        return failed
+
+
+@functools.lru_cache(maxsize=None)
+def validator(kind, shape=ROW):
+    """The compiled Validator of a record kind ("student", ...) and shape (ROW or FORM)."""
+    return Validator(kind, shape)
+
+
+def validate(kind, record, shape=ROW, known=None):
+    """The list of problems with one record (empty when it is fine)."""
+    return validator(kind, shape)(record, known)
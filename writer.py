@@ -0,0 +1,423 @@
+"""
+Optional background writer for survey submissions.
+
+Instead of running the inserts in the user's Streamlit session, the
+submit handler hands the journey to one writer thread and gets a ticket
+back straight away:
+
+    ticket = writer.get_writer().submit(student, internship, job)
+    writer.get_writer().status(ticket)   # {"state": "queued" | "saved" | "failed", ...}
+
+Durability: submit() appends the journey to a local spool file and fsyncs
+it before returning, so an acknowledged submission survives a crash. On
+start the writer replays whatever is still in the spool. The ticket is
+stored in `writer_applied` in the same transaction as the journey, so a
+replay never saves a journey twice.
+
+Throughput: the thread owns its own write connection and drains the queue
+in group commits: up to MAX_BATCH journeys, each in its own savepoint, one
+BEGIN IMMEDIATE and one commit (fsync) for the batch. A journey that fails
+(e.g. a job pointing at an unknown internship) is rolled back alone and
+reported as failed.
+
+Each tenant (see tenants.py) gets its own writer, spool and connection:
+
+    writer.get_writer(tenants.tenant_for_program(student["program_id"]))
+
+A spool belongs to one process: the writer holds an OS lock on it (see
+locks.py) for as long as it runs, and get_writer() raises SpoolInUse in
+every other process, which then saves in the session. When the owner
+exits, the next process to submit takes the spool over and replays it.
+
+Enabled in app.py with ESB_ASYNC_WRITES=1. It is for SQLite's single
+writer; with ESB_DB_BACKEND=postgres sessions write directly.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import backends
+import db
+import locks
+import metrics
+import tenants
+
+ASYNC_WRITES = os.environ.get("ESB_ASYNC_WRITES", "0") == "1" and backends.BACKEND == "sqlite"
+
+SPOOL_PATH = Path(os.environ.get("ESB_WRITE_SPOOL", db.BASE_DIR / "write_spool.jsonl"))
+# Submissions waiting for the writer; submit() raises queue.Full beyond this.
+MAX_QUEUE = int(os.environ.get("ESB_WRITER_QUEUE", "1000"))
+MAX_BATCH = 100
+# How long the writer waits for more submissions before committing a batch.
+MAX_DELAY = float(os.environ.get("ESB_WRITER_DELAY_MS", "5")) / 1000
+# Rewrite the spool without the saved journeys once it is this big.
+SPOOL_COMPACT_BYTES = 1 << 20
+# Finished tickets remembered in memory for status().
+STATUS_KEEP = 10000
+
+_STOP = object()
+
+
+class SpoolInUse(RuntimeError):
+    """Another process's writer owns the spool."""
+
+
+class WriterStopped(RuntimeError):
+    """The writer is closed or its thread has died; save in the session instead."""
+
+
+class BackgroundWriter:
+    def __init__(self, db_path=None, spool_path=SPOOL_PATH, max_queue=MAX_QUEUE,
+                 max_batch=MAX_BATCH, max_delay=MAX_DELAY, tenant=None):
+        self.tenant = tenant or tenants.current_tenant()
+        self.db_path = db_path
+        self.spool_path = Path(spool_path)
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._unsaved = OrderedDict()  # ticket -> spool line, until committed
+        self._status = OrderedDict()   # ticket -> status dict
+        self._spool = None
+        self._spool_lock = locks.FileLock(self.spool_path.with_name(self.spool_path.name + ".lock"))
+        self._done = []  # tickets in the spool finished since the last compaction
+        self._conn = None
+        self._thread = None
+        self._closed = False
+        self.last_error = None  # what made the last batch fail as a whole
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self):
+        """
+        Lock the spool, open the write connection, replay the spool and start
+        the thread. Raises SpoolInUse if another process's writer has the spool.
+        """
+        if not self._spool_lock.acquire(blocking=False):
+            raise SpoolInUse(f"{self.spool_path} is in use by another process's writer.")
+        try:
+            self._open()
+        except BaseException:
+            if self._conn is not None:
+                self._conn.close()
+            self._spool_lock.release()
+            raise
+        self._thread = threading.Thread(target=self._run, name="esb-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _open(self):
+        if self.db_path is None:
+            with tenants.use_tenant(self.tenant):
+                pool = db.get_pool()
+            self._conn = db._open_connection(pool.db_path, pool.profile)
+        else:
+            self._conn = db._open_connection(self.db_path)
+        self._replay()
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def close(self, timeout=30):
+        """Write out everything queued so far, then stop the thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._spool is not None:
+            self._spool.close()
+        if self._conn is not None:
+            self._conn.close()
+        self._spool_lock.release()
+
+    def _replay(self):
+        if not self.spool_path.exists():
+            return
+        records = []
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append((json.loads(line), line))
+                except ValueError:
+                    # A line cut short by a crash was never acknowledged.
+                    continue
+
+        applied = self._applied([record["ticket"] for record, _ in records])
+        for record, line in records:
+            ticket = record["ticket"]
+            if ticket in applied:
+                self._finish(ticket, applied[ticket])
+                continue
+            if ticket in self._unsaved:
+                continue
+            self._unsaved[ticket] = line
+            self._status[ticket] = {"state": "queued", "error": None}
+            self._queue.put(record)
+
+    def _applied(self, tickets):
+        """{ticket: error or None} for the tickets already in writer_applied."""
+        found = {}
+        for start in range(0, len(tickets), 500):
+            chunk = tickets[start:start + 500]
+            rows = self._conn.execute(
+                f"""
+                SELECT ticket, error FROM writer_applied
+                WHERE ticket IN ({", ".join("?" * len(chunk))});
+                """,
+                chunk,
+            ).fetchall()
+            found.update((row[0], row[1]) for row in rows)
+        return found
+
+    # ---------- SUBMITTING ----------
+
+    def submit(self, student, internship=None, job=None):
+        """
+        Spool one journey (fsync'd) and queue it for the writer thread.
+        Returns its ticket. Raises queue.Full when MAX_QUEUE journeys are
+        already waiting, so the caller can fall back to db.save_journey().
+        """
+        ticket = uuid.uuid4().hex
+        record = {
+            "ticket": ticket,
+            "submitted_at": time.time(),
+            "student": student,
+            "internship": internship,
+            "job": job,
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            if not self.alive:
+                raise WriterStopped("Background writer is not running.")
+            if len(self._unsaved) >= self.max_queue:
+                raise queue.Full(f"{len(self._unsaved)} submissions are already waiting.")
+            self._spool.write(line)
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self._unsaved[ticket] = line
+            self._status[ticket] = {"state": "queued", "error": None}
+        self._queue.put(record)
+        return ticket
+
+    def status(self, ticket):
+        """{"state": "queued" | "saved" | "failed" | "unknown", "error": str or None}"""
+        with self._lock:
+            status = self._status.get(ticket)
+            if status is not None:
+                return dict(status)
+        return {"state": "unknown", "error": None}
+
+    def wait(self, ticket, timeout=None):
+        """Block until the ticket is saved or failed; returns its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self._status.get(ticket, {}).get("state") == "queued":
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.status(ticket)
+
+    @property
+    def alive(self):
+        """True while the writer thread is running and taking submissions."""
+        return not self._closed and self._thread is not None and self._thread.is_alive()
+
+    def pending(self):
+        with self._lock:
+            return len(self._unsaved)
+
+    # ---------- WRITER THREAD ----------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            # Group commit: take what is waiting, up to max_batch, and give
+            # other sessions max_delay to join the batch.
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    record = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            try:
+                self._write_batch(batch)
+            except Exception as e:  # the one writer thread must not die
+                self._fail_batch(batch, e)
+
+    def _write_batch(self, batch):
+        delay = db.BUSY_BACKOFF
+        while True:
+            try:
+                results = self._commit_batch(batch)
+                break
+            except sqlite3.OperationalError as e:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                if not db._is_busy(e):
+                    results = {record["ticket"]: str(e) for record in batch}
+                    break
+                # Everything is spooled, so keep retrying rather than fail.
+                metrics.busy_retries.inc(helper="background_writer")
+                metrics.lock_wait_seconds.observe(delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+        # Committed: record the outcome before anything else can go wrong.
+        with self._lock:
+            for ticket, error in results.items():
+                self._unsaved.pop(ticket, None)
+                self._finish(ticket, error)
+        if any(error is None for error in results.values()):
+            with tenants.use_tenant(self.tenant):
+                db.invalidate_reference_cache("programs", "employers")
+        with self._lock:
+            self._changed.notify_all()
+            self._compact_spool()
+
+        metrics.writer_batch_size.observe(len(batch))
+        now = time.time()
+        for record in batch:
+            metrics.writer_delay_seconds.observe(now - record["submitted_at"])
+
+    def _fail_batch(self, batch, error):
+        """Roll back a batch that broke the writer and fail its tickets not yet finished."""
+        self.last_error = error
+        try:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        except sqlite3.Error:
+            pass
+        message = f"Background writer error: {error!r}"
+        with self._lock:
+            for record in batch:
+                if self._unsaved.pop(record["ticket"], None) is not None:
+                    self._finish(record["ticket"], message)
+            self._changed.notify_all()
+
+    def _commit_batch(self, batch):
+        """One transaction for the batch; returns {ticket: error or None}."""
+        conn = self._conn
+        cur = conn.cursor()
+        results = {}
+        conn.execute("BEGIN IMMEDIATE;")
+        applied = self._applied([record["ticket"] for record in batch])
+        for record in batch:
+            ticket = record["ticket"]
+            if ticket in applied:
+                results[ticket] = applied[ticket]
+                continue
+            conn.execute("SAVEPOINT journey;")
+            try:
+                db._write_journey(cur, record["student"], record["internship"], record["job"])
+                error = None
+            except sqlite3.OperationalError as e:
+                if db._is_busy(e):
+                    raise
+                error = str(e)
+            except Exception as e:  # a bad record fails alone
+                error = str(e) or repr(e)
+            if error is not None:
+                conn.execute("ROLLBACK TO journey;")
+            conn.execute(
+                "INSERT INTO writer_applied (ticket, error) VALUES (?, ?);", (ticket, error)
+            )
+            conn.execute("RELEASE journey;")
+            results[ticket] = error
+        conn.commit()
+        return results
+
+    def _finish(self, ticket, error):
+        self._done.append(ticket)
+        self._status[ticket] = {
+            "state": "saved" if error is None else "failed",
+            "error": error,
+        }
+        self._status.move_to_end(ticket)
+        while len(self._status) > STATUS_KEEP:
+            oldest, status = next(iter(self._status.items()))
+            if status["state"] == "queued":
+                break
+            del self._status[oldest]
+
+    def _compact_spool(self):
+        """Drop saved journeys from the spool (caller holds the lock)."""
+        if self._unsaved:
+            if os.fstat(self._spool.fileno()).st_size < SPOOL_COMPACT_BYTES:
+                return
+            tmp = self.spool_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(self._unsaved.values())
+                f.flush()
+                os.fsync(f.fileno())
+            self._spool.close()
+            os.replace(tmp, self.spool_path)
+            self._spool = open(self.spool_path, "a", encoding="utf-8")
+        else:
+            self._spool.truncate(0)
+            os.fsync(self._spool.fileno())
+        # The finished journeys are out of the spool, so their replay markers
+        # can go. Only this spool's own markers: the table is not ours alone.
+        done, self._done = self._done, []
+        for start in range(0, len(done), 500):
+            chunk = done[start:start + 500]
+            self._conn.execute(
+                f"""
+                DELETE FROM writer_applied
+                WHERE ticket IN ({", ".join("?" * len(chunk))});
+                """,
+                chunk,
+            )
+        self._conn.commit()
+
+
+_writers = {}
+_writer_lock = threading.Lock()
+
+
+def spool_path(tenant):
+    """SPOOL_PATH for the default tenant, write_spool.<tenant>.jsonl for the others."""
+    if tenant == tenants.DEFAULT_TENANT:
+        return SPOOL_PATH
+    return SPOOL_PATH.with_name(f"{SPOOL_PATH.stem}.{tenant}{SPOOL_PATH.suffix}")
+
+
+def get_writer(tenant=None):
+    """
+    The process-wide background writer of a tenant, started on first use
+    and again if its thread has died. Raises SpoolInUse while another
+    process's writer owns the tenant's spool.
+    """
+    tenant = tenant or tenants.current_tenant()
+    with _writer_lock:
+        writer = _writers.get(tenant)
+        if writer is not None and not writer.alive:
+            # Its thread died: free the spool and let a new writer replay it.
+            writer.close(timeout=0)
+            writer = None
+        if writer is None:
+            writer = _writers[tenant] = BackgroundWriter(
+                spool_path=spool_path(tenant), tenant=tenant
+            ).start()
+            atexit.register(writer.close)
+    return writer